@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+from __future__ import division, absolute_import
+"""Benchmark closed-loop guiding against an emulated LCO TCC
+
+Usage: benchGuide.py [--out=<json file>] [--cycles=<n>] [--cadence=<sec>] [--dist=normal|uniform]
+    [--ra=<arcsec>] [--dec=<arcsec>] [--rot=<arcsec>] [--focus=<um>] [--scale=<fraction>]
+    [--guiderot=<arcsec>] [--noguiderot] [--seed=<n>] [--virtual] [--tcp] [--profile=<file>]
+
+Starts the same fake controllers and actor as emulateLCOTCC.py (in-process), runs a synthetic
+guider that sends guideoffset (and optionally "offset guide") corrections at a fixed cadence,
+and writes the results as JSON (to stdout by default).
+"""
+import argparse
+import sys
+
+import RO.Comm.Generic
+RO.Comm.Generic.setFramework("twisted")
+from twisted.internet import reactor
+
+from tcc.bench import BenchEmulator, GuideBench, DefaultOffsetScales, writeResults
+from tcc.dev import loadLinkProfiles
+from tcc.utils.clock import VirtualClock
+
+parser = argparse.ArgumentParser(description="Benchmark closed-loop guiding against an emulated LCO TCC")
+parser.add_argument("--out", default="-", help="output JSON file; - for stdout")
+parser.add_argument("--cycles", type=int, default=50, help="number of guide cycles")
+parser.add_argument("--cadence", type=float, default=5., help="time between guide cycles (sec)")
+parser.add_argument("--dist", choices=("normal", "uniform"), default="normal", help="distribution of corrections")
+for term, units in (("ra", "arcsec"), ("dec", "arcsec"), ("rot", "arcsec"), ("focus", "um"), ("scale", "fraction")):
+    parser.add_argument("--%s" % (term,), type=float, default=DefaultOffsetScales[term],
+        help="scale of %s corrections (%s); 0 to omit" % (term, units))
+parser.add_argument("--guiderot", type=float, default=DefaultOffsetScales["guideRot"],
+    help="scale of \"offset guide\" rotator corrections (arcsec); 0 to omit")
+parser.add_argument("--noguiderot", action="store_true", help="leave guide rotator corrections disabled")
+parser.add_argument("--seed", type=int, default=0, help="random number seed")
+parser.add_argument("--virtual", action="store_true", help="run device timing on a virtual clock")
+parser.add_argument("--tcp", action="store_true", help="connect devices to the fakes over TCP instead of in-process")
+parser.add_argument("--profile", help="JSON file of link profiles for the fake controllers")
+args = parser.parse_args()
+
+emulator = BenchEmulator(
+    loopback = not args.tcp,
+    linkProfiles = loadLinkProfiles(args.profile) if args.profile else None,
+    clock = VirtualClock() if args.virtual else None,
+)
+guideBench = GuideBench(
+    nCycle = args.cycles,
+    cadence = args.cadence,
+    offsetScales = dict(ra=args.ra, dec=args.dec, rot=args.rot, focus=args.focus, scale=args.scale,
+        guideRot=args.guiderot),
+    distribution = args.dist,
+    guideRot = not args.noguiderot,
+    seed = args.seed,
+    emulator = emulator,
+)
+
+def writeAndStop(resultDict):
+    config = guideBench.config
+    config.update(virtual=args.virtual, tcp=args.tcp, profile=args.profile)
+    writeResults(args.out, "guide", config, resultDict)
+    return emulator.close()
+
+def reportError(failure):
+    sys.stderr.write("Guide benchmark failed: %s\n" % (failure.getErrorMessage(),))
+
+d = guideBench.run()
+d.addCallbacks(writeAndStop, reportError)
+d.addBoth(lambda ignored: reactor.stop())
+reactor.run()
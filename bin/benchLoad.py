@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+from __future__ import division, absolute_import
+"""Load test the user port of an emulated LCO TCC with many clients
+
+Usage: benchLoad.py [--out=<json file>] [--clients=<n>] [--rate=<cmds/sec>] [--duration=<sec>]
+    [--drain=<sec>] [--mix=<json file>] [--seed=<n>] [--virtual] [--tcp] [--profile=<file>]
+
+Starts the same fake controllers and actor as emulateLCOTCC.py (in-process), connects many
+user clients that send a random mix of commands, and writes the results as JSON
+(to stdout by default).
+"""
+import argparse
+import json
+import sys
+
+import RO.Comm.Generic
+RO.Comm.Generic.setFramework("twisted")
+from twisted.internet import reactor
+
+from tcc.bench import BenchEmulator, LoadBench, writeResults
+from tcc.dev import loadLinkProfiles
+from tcc.utils.clock import VirtualClock
+
+parser = argparse.ArgumentParser(description="Load test the user port of an emulated LCO TCC")
+parser.add_argument("--out", default="-", help="output JSON file; - for stdout")
+parser.add_argument("--clients", type=int, default=10, help="number of user connections")
+parser.add_argument("--rate", type=float, default=5., help="mean commands per second, summed over all clients")
+parser.add_argument("--duration", type=float, default=60., help="time over which commands are sent (sec)")
+parser.add_argument("--drain", type=float, default=120., help="maximum time to wait for outstanding commands (sec)")
+parser.add_argument("--mix", help="JSON file of a dict of command string: relative weight")
+parser.add_argument("--seed", type=int, default=0, help="random number seed")
+parser.add_argument("--virtual", action="store_true", help="run device timing on a virtual clock")
+parser.add_argument("--tcp", action="store_true", help="connect devices to the fakes over TCP instead of in-process")
+parser.add_argument("--profile", help="JSON file of link profiles for the fake controllers")
+args = parser.parse_args()
+
+cmdMix = None
+if args.mix:
+    with open(args.mix, "r") as f:
+        cmdMix = json.load(f)
+
+emulator = BenchEmulator(
+    loopback = not args.tcp,
+    linkProfiles = loadLinkProfiles(args.profile) if args.profile else None,
+    clock = VirtualClock() if args.virtual else None,
+)
+loadBench = LoadBench(
+    nClient = args.clients,
+    rate = args.rate,
+    duration = args.duration,
+    cmdMix = cmdMix,
+    drainTime = args.drain,
+    seed = args.seed,
+    emulator = emulator,
+)
+
+def writeAndStop(resultDict):
+    config = loadBench.config
+    config.update(virtual=args.virtual, tcp=args.tcp, profile=args.profile)
+    writeResults(args.out, "load", config, resultDict)
+    return emulator.close()
+
+def reportError(failure):
+    sys.stderr.write("Load benchmark failed: %s\n" % (failure.getErrorMessage(),))
+
+d = loadBench.run()
+d.addCallbacks(writeAndStop, reportError)
+d.addBoth(lambda ignored: reactor.stop())
+reactor.run()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+from __future__ import division, absolute_import
+"""Protocol micro-benchmarks: each device against its fake controller
+
+Usage: benchProtocol.py [--out=<json file>] [--scenario=<name> ...] [--n=<exchanges>] [--warmup=<n>]
+    [--tcp] [--virtual] [--baseline=<json file>] [--tolerance=<fraction>]
+
+Runs one device protocol at a time (TCS status verbs, M2 status and moves, scaling ring status
+and Mitutoyo gauge reads) back to back against its fake controller, and writes round trip
+percentiles, throughput and CPU time per message as JSON (to stdout by default).
+
+With --baseline, the results are also compared to an earlier output file: the comparison is
+added to the output, a table is printed to stderr, and the exit status is 1 if any metric
+is worse than the baseline by more than the tolerance.
+"""
+import argparse
+import sys
+
+import RO.Comm.Generic
+RO.Comm.Generic.setFramework("twisted")
+from twisted.internet import reactor
+
+from tcc.bench import ProtoBench, ScenarioNameList, compareToBaseline, readResults, writeResults
+
+parser = argparse.ArgumentParser(description="Protocol micro-benchmarks against the fake controllers")
+parser.add_argument("--out", default="-", help="output JSON file; - for stdout")
+parser.add_argument("--scenario", action="append", choices=ScenarioNameList,
+    help="scenario to run; may be repeated; default is all")
+parser.add_argument("--n", type=int, default=1000, help="number of timed exchanges per scenario")
+parser.add_argument("--warmup", type=int, default=10, help="number of untimed exchanges per scenario")
+parser.add_argument("--tcp", action="store_true", help="connect devices to the fakes over TCP instead of in-process")
+parser.add_argument("--virtual", action="store_true",
+    help="run device timing on a virtual clock, removing the fakes' simulated delays")
+parser.add_argument("--baseline", help="JSON output of an earlier run to compare to")
+parser.add_argument("--tolerance", type=float, default=0.2,
+    help="fractional worsening relative to the baseline reported as a regression")
+args = parser.parse_args()
+
+protoBench = ProtoBench(
+    scenarioNames = args.scenario,
+    nExchange = args.n,
+    nWarmup = args.warmup,
+    loopback = not args.tcp,
+    virtual = args.virtual,
+)
+exitStatus = [0]
+
+def printComparison(comparisonDict):
+    for name, scenarioComparison in sorted(comparisonDict.items()):
+        for metricName, metricDict in sorted(scenarioComparison.items()):
+            sys.stderr.write("%-14s %-13s %12.6g %12.6g %7.3f%s\n" % (name, metricName,
+                metricDict["value"], metricDict["baseline"], metricDict["ratio"],
+                "  REGRESSION" if metricDict["isRegression"] else ""))
+
+def writeAndStop(resultDict):
+    if args.baseline:
+        comparisonDict = compareToBaseline(resultDict, readResults(args.baseline)["results"],
+            tolerance=args.tolerance)
+        resultDict = dict(resultDict, comparison=comparisonDict)
+        printComparison(comparisonDict)
+        if any(metricDict["isRegression"] for scenarioComparison in comparisonDict.values()
+            for metricDict in scenarioComparison.values()):
+            exitStatus[0] = 1
+    config = protoBench.config
+    config.update(baseline=args.baseline, tolerance=args.tolerance)
+    writeResults(args.out, "protocol", config, resultDict)
+
+def reportError(failure):
+    sys.stderr.write("Protocol benchmark failed: %s\n" % (failure.getErrorMessage(),))
+    exitStatus[0] = 2
+
+d = protoBench.run()
+d.addCallbacks(writeAndStop, reportError)
+d.addBoth(lambda ignored: reactor.stop())
+reactor.run()
+sys.exit(exitStatus[0])
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+from __future__ import division, absolute_import
+"""Benchmark the target (slew) path against an emulated LCO TCC
+
+Usage: benchSlew.py [--out=<json file>] [--repeat=<n>] [--settle=<sec>] [--virtual] [--tcp] [--profile=<file>]
+
+Starts the same fake controllers and actor as emulateLCOTCC.py (in-process), slews to a
+fixed list of targets and writes the results as JSON (to stdout by default).
+"""
+import argparse
+import sys
+
+import RO.Comm.Generic
+RO.Comm.Generic.setFramework("twisted")
+from twisted.internet import reactor
+
+from tcc.bench import BenchEmulator, SlewBench, writeResults
+from tcc.dev import loadLinkProfiles
+from tcc.utils.clock import VirtualClock
+
+parser = argparse.ArgumentParser(description="Benchmark slews against an emulated LCO TCC")
+parser.add_argument("--out", default="-", help="output JSON file; - for stdout")
+parser.add_argument("--repeat", type=int, default=1, help="number of times to run through the targets")
+parser.add_argument("--settle", type=float, default=1., help="pause between slews (sec)")
+parser.add_argument("--virtual", action="store_true", help="run device timing on a virtual clock")
+parser.add_argument("--tcp", action="store_true", help="connect devices to the fakes over TCP instead of in-process")
+parser.add_argument("--profile", help="JSON file of link profiles for the fake controllers")
+args = parser.parse_args()
+
+emulator = BenchEmulator(
+    loopback = not args.tcp,
+    linkProfiles = loadLinkProfiles(args.profile) if args.profile else None,
+    clock = VirtualClock() if args.virtual else None,
+)
+slewBench = SlewBench(nRepeat=args.repeat, settleTime=args.settle, emulator=emulator)
+
+def writeAndStop(resultDict):
+    config = slewBench.config
+    config.update(virtual=args.virtual, tcp=args.tcp, profile=args.profile)
+    writeResults(args.out, "slew", config, resultDict)
+    return emulator.close()
+
+def reportError(failure):
+    sys.stderr.write("Slew benchmark failed: %s\n" % (failure.getErrorMessage(),))
+
+d = slewBench.run()
+d.addCallbacks(writeAndStop, reportError)
+d.addBoth(lambda ignored: reactor.stop())
+reactor.run()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+from __future__ import division, absolute_import
+"""Soak test an emulated LCO TCC: run it under load for a long time and look for growth
+
+Usage: benchSoak.py [--out=<json file>] [--hours=<hours>] [--sample=<sec>] [--clients=<n>]
+    [--rate=<cmds/sec>] [--mix=<json file>] [--seed=<n>] [--virtual] [--tcp] [--profile=<file>]
+
+Starts the same fake controllers and actor as emulateLCOTCC.py (in-process), sends a realistic
+command mix, and samples memory use, the live-object census, pending delayed calls and reactor
+lag. Writes the results as JSON (to stdout by default); the exit status is 1 if anything grew
+without bound. With --virtual, hours of device time pass in minutes.
+"""
+import argparse
+import json
+import sys
+
+import RO.Comm.Generic
+RO.Comm.Generic.setFramework("twisted")
+from twisted.internet import reactor
+
+from tcc.bench import BenchEmulator, SoakBench, writeResults
+from tcc.dev import loadLinkProfiles
+from tcc.utils.clock import VirtualClock
+
+parser = argparse.ArgumentParser(description="Soak test an emulated LCO TCC")
+parser.add_argument("--out", default="-", help="output JSON file; - for stdout")
+parser.add_argument("--hours", type=float, default=4., help="duration of the load (hours)")
+parser.add_argument("--sample", type=float, default=60., help="time between samples (sec)")
+parser.add_argument("--clients", type=int, default=3, help="number of user connections")
+parser.add_argument("--rate", type=float, default=0.5, help="mean commands per second, summed over all clients")
+parser.add_argument("--mix", help="JSON file of a dict of command string: relative weight")
+parser.add_argument("--seed", type=int, default=0, help="random number seed")
+parser.add_argument("--virtual", action="store_true", help="run device timing on a virtual clock")
+parser.add_argument("--tcp", action="store_true", help="connect devices to the fakes over TCP instead of in-process")
+parser.add_argument("--profile", help="JSON file of link profiles for the fake controllers")
+args = parser.parse_args()
+
+cmdMix = None
+if args.mix:
+    with open(args.mix, "r") as f:
+        cmdMix = json.load(f)
+
+emulator = BenchEmulator(
+    loopback = not args.tcp,
+    linkProfiles = loadLinkProfiles(args.profile) if args.profile else None,
+    clock = VirtualClock() if args.virtual else None,
+)
+soakBench = SoakBench(
+    duration = args.hours * 3600.,
+    sampleInterval = args.sample,
+    nClient = args.clients,
+    rate = args.rate,
+    cmdMix = cmdMix,
+    seed = args.seed,
+    emulator = emulator,
+)
+exitStatus = [0]
+
+def writeAndStop(resultDict):
+    config = soakBench.config
+    config.update(virtual=args.virtual, tcp=args.tcp, profile=args.profile)
+    writeResults(args.out, "soak", config, resultDict)
+    for growthDict in resultDict["growth"]:
+        sys.stderr.write("%s grew from %.6g to %.6g\n" % (growthDict["metric"], growthDict["midMean"],
+            growthDict["lateMean"]))
+    if resultDict["failed"]:
+        exitStatus[0] = 1
+    return emulator.close()
+
+def reportError(failure):
+    sys.stderr.write("Soak test failed: %s\n" % (failure.getErrorMessage(),))
+    exitStatus[0] = 2
+
+d = soakBench.run()
+d.addCallbacks(writeAndStop, reportError)
+d.addBoth(lambda ignored: reactor.stop())
+reactor.run()
+sys.exit(exitStatus[0])
@@ -2,7 +2,12 @@
 from __future__ import division, absolute_import
 """Start a faked LCO TCC actor
 
+Usage: emulateLCOTCC.py [--profile=<link profile file>] [--seed=<int>]
+
+The link profile file is a JSON file of fake controller name ("tcs", "scale", "sec", "measScale"):
+link profile arguments; see tcc.dev.fakeLinkProfile. Without one, the fakes reply instantly.
 """
+import argparse
 import sys
 import traceback
 # import Tkinter
@@ -15,39 +20,40 @@ from twistedActor import startFileLogging
 # import RO.Wdg
 import datetime
 
-rotateTime = datetime.datetime.now() + datetime.timedelta(seconds=10)
-
-startFileLogging("emulateTCCLCO", rotate=rotateTime)
-
-
 from tcc.actor import TCCLCOActor
-from tcc.dev import TCSDevice, ScaleDevice, M2Device, FakeScaleCtrl, FakeTCS, FakeM2Ctrl, MeasScaleDevice, FakeMeasScaleCtrl, FFDevice, FakeFFPowerSuply
+from tcc.dev import TCSDevice, ScaleDevice, M2Device, FakeScaleCtrl, FakeTCS, FakeM2Ctrl, FakeMeasScaleCtrl, loadLinkProfiles
 
 UserPort = 25000
 
 ScaleDevicePort = 26000
-MeasScaleDevicePort = 26500
 MeasScaleDevicePort = 10001
 TCSDevicePort = 27000
 M2DevicePort = 28000
-FFDevicePort = 29000
 
+parser = argparse.ArgumentParser(description="Start a faked LCO TCC actor")
+parser.add_argument("--profile", help="JSON file of link profiles for the fake controllers")
+parser.add_argument("--seed", type=int, help="seed for link profiles that do not specify one")
+args = parser.parse_args()
+
+rotateTime = datetime.datetime.now() + datetime.timedelta(seconds=10)
+
+startFileLogging("emulateTCCLCO", rotate=rotateTime)
+
+linkProfiles = {}
+if args.profile:
+    linkProfiles = loadLinkProfiles(args.profile, seed=args.seed)
+    print("Link profiles: %s" % (", ".join("%s=%r" % item for item in sorted(linkProfiles.items())),))
 
 print("Start fake LCO controllers")
-fakeScaleController  = FakeScaleCtrl("fakeScale",  ScaleDevicePort)
-fakeTCS = FakeTCS("mockTCSDevice", TCSDevicePort)
-fakeM2Ctrl = FakeM2Ctrl("fakeM2", M2DevicePort)
-fakeFFDev = FakeFFPowerSuply("fakeFF", FFDevicePort)
-fakeMeasScaleDev = FakeMeasScaleCtrl("fakeMeasScale", MeasScaleDevicePort)
+fakeScaleController  = FakeScaleCtrl("fakeScale",  ScaleDevicePort, linkProfile=linkProfiles.get("scale"))
+fakeTCS = FakeTCS("mockTCSDevice", TCSDevicePort, linkProfile=linkProfiles.get("tcs"))
+fakeM2Ctrl = FakeM2Ctrl("fakeM2", M2DevicePort, linkProfile=linkProfiles.get("sec"))
+fakeMeasScaleDev = FakeMeasScaleCtrl("fakeMeasScale", MeasScaleDevicePort, linkProfile=linkProfiles.get("measScale"))
 
-measScaleDev = MeasScaleDevice("measScaleDev", "localhost", MeasScaleDevicePort)
 tcsDev = TCSDevice("tcsDev", "localhost", TCSDevicePort)
-scaleDev = ScaleDevice("mockScale", "localhost", ScaleDevicePort, measScaleDev)
+scaleDev = ScaleDevice("mockScale", "localhost", ScaleDevicePort)
 m2Dev = M2Device("m2Dev", "localhost", M2DevicePort)
 
-#ffDev = FFDevice("ffDev", "139.229.101.122", 23)
-ffDev = FFDevice("ffDev", "localhost", FFDevicePort)
-
 def startTCCLCO(*args):
     try:
         tccActor = TCCLCOActor(
@@ -56,23 +62,23 @@ def startTCCLCO(*args):
             tcsDev = tcsDev,
             scaleDev = scaleDev,
             m2Dev = m2Dev,
-            measScaleDev = measScaleDev,
-            ffDev = ffDev,
             )
     except Exception:
         print >>sys.stderr, "Error starting fake lcoTCC"
         traceback.print_exc(file=sys.stderr)
 
+def printLinkStats():
+    for linkProfile in linkProfiles.itervalues():
+        print(linkProfile.getStatsStr())
 
 def checkFakesRunning(ignored):
-    if fakeScaleController.isReady and fakeTCS.isReady and fakeM2Ctrl.isReady and fakeFFDev.isReady and fakeMeasScaleDev.isReady:
+    if fakeScaleController.isReady and fakeTCS.isReady and fakeM2Ctrl.isReady and fakeMeasScaleDev.isReady:
         startTCCLCO()
 
 fakeScaleController.addStateCallback(checkFakesRunning)
 fakeTCS.addStateCallback(checkFakesRunning)
 fakeM2Ctrl.addStateCallback(checkFakesRunning)
-fakeFFDev.addStateCallback(checkFakesRunning)
 fakeMeasScaleDev.addStateCallback(checkFakesRunning)
 
+reactor.addSystemEventTrigger("before", "shutdown", printLinkStats)
 reactor.run()
-
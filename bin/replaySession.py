@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+from __future__ import division, absolute_import
+"""Replay a recorded device session (see tcc.utils.sessionLog) to a TCC actor
+
+Usage: replaySession.py <session file> [--mode=serve|bench] [--speed=<factor>] [--port=<user port>]
+
+serve: start replay controllers for the TCS, scaling ring and M2 on TCP ports and a TCC actor
+    that talks to them; the recorded replies are sent at the recorded pace divided by --speed.
+    Connect to the user port to command the actor as usual.
+bench: connect the actor to the replay controllers in-process, run device timing on a virtual
+    clock and send replies as quickly as possible; when the session is used up, print the
+    throughput and replay statistics and quit.
+"""
+import argparse
+import functools
+import sys
+import time
+import traceback
+
+import RO.Comm.Generic
+RO.Comm.Generic.setFramework("twisted")
+from twisted.internet import reactor
+
+from tcc.actor import TCCLCOActor
+from tcc.dev import TCSDevice, ScaleDevice, M2Device, FakeReplayCtrl, setLoopbackConnection
+from tcc.utils.clock import VirtualClock, setClock, deviceIsBusy
+from tcc.utils.sessionLog import readSession
+
+# source: (device class, device name, replay controller port for serve mode)
+SourceDict = {
+    "tcs": (TCSDevice, "tcsDev", 27000),
+    "scale": (ScaleDevice, "scaleDev", 26000),
+    "sec": (M2Device, "m2Dev", 28000),
+}
+
+parser = argparse.ArgumentParser(description="Replay a recorded device session to a TCC actor")
+parser.add_argument("sessionFile", help="session file recorded by the TCC")
+parser.add_argument("--mode", choices=("serve", "bench"), default="serve")
+parser.add_argument("--speed", type=float, default=1., help="replay speed for serve mode; 0 for as fast as possible")
+parser.add_argument("--port", type=int, help="user port for the actor (default 25000 for serve, a free port for bench)")
+parser.add_argument("--timeLimit", type=float, default=600., help="maximum duration of a benchmark (real sec)")
+args = parser.parse_args()
+
+isBench = args.mode == "bench"
+speed = 0 if isBench else args.speed
+userPort = args.port if args.port is not None else (0 if isBench else 25000)
+
+sessionStartTime, eventList = readSession(args.sessionFile)
+print("Read %i events recorded starting %s" % (len(eventList), time.ctime(sessionStartTime)))
+
+clock = setClock(VirtualClock(startTime=sessionStartTime) if isBench else None)
+
+replayCtrlDict = {}
+for source, (devClass, devName, port) in SourceDict.iteritems():
+    replayCtrlDict[source] = FakeReplayCtrl(
+        name = "replay_%s" % (source,),
+        port = 0 if isBench else port,
+        eventList = eventList,
+        source = source,
+        speed = speed,
+        loopback = isBench,
+    )
+
+actorList = []
+benchStartTime = None
+
+def printStats():
+    for source in sorted(replayCtrlDict):
+        print(replayCtrlDict[source].getStatsStr())
+
+def startTCCLCO():
+    global benchStartTime
+    devDict = {}
+    for source, (devClass, devName, port) in SourceDict.iteritems():
+        devDict[source] = devClass(devName, "localhost", replayCtrlDict[source].port)
+        if isBench:
+            setLoopbackConnection(devDict[source], replayCtrlDict[source].server)
+            clock.addBusyCheck(functools.partial(deviceIsBusy, devDict[source]))
+    try:
+        actorList.append(TCCLCOActor(
+            name = "tcc",
+            userPort = userPort,
+            tcsDev = devDict["tcs"],
+            scaleDev = devDict["scale"],
+            m2Dev = devDict["sec"],
+        ))
+    except Exception:
+        print >>sys.stderr, "Error starting TCC actor"
+        traceback.print_exc(file=sys.stderr)
+        reactor.stop()
+        return
+    if isBench:
+        benchStartTime = time.time()
+        clock.startAutoAdvance()
+        reactor.callLater(0.1, checkBenchDone)
+
+def checkBenchDone():
+    wallTime = time.time() - benchStartTime
+    isDone = all(replayCtrl.isExhausted for replayCtrl in replayCtrlDict.itervalues())
+    if not isDone and wallTime < args.timeLimit:
+        reactor.callLater(0.1, checkBenchDone)
+        return
+    clock.stopAutoAdvance()
+    nReplies = sum(replayCtrl.nRepliesSent for replayCtrl in replayCtrlDict.itervalues())
+    nCmds = sum(replayCtrl.nMatched + replayCtrl.nUnmatched for replayCtrl in replayCtrlDict.itervalues())
+    if not isDone:
+        print("Time limit reached before the session was used up")
+    print("Replayed %0.1f sec of recorded traffic in %0.2f sec: %i commands, %i replies, %0.0f replies/sec" % (
+        clock.time() - sessionStartTime, wallTime, nCmds, nReplies, nReplies / max(wallTime, 1e-9)))
+    printStats()
+    reactor.stop()
+
+def checkReplayCtrlsRunning(ignored):
+    if all(replayCtrl.isReady for replayCtrl in replayCtrlDict.itervalues()) and not actorList:
+        startTCCLCO()
+
+for replayCtrl in replayCtrlDict.itervalues():
+    replayCtrl.addStateCallback(checkReplayCtrlsRunning)
+
+if not isBench:
+    reactor.addSystemEventTrigger("before", "shutdown", printStats)
+reactor.run()
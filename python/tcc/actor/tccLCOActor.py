@@ -1,6 +1,7 @@
 from __future__ import division, absolute_import
 """The TCC (telescope control code) interface shim for the Las Campanas Observatory du Pont telescope
 """
+import os
 import sys
 import traceback
 
@@ -10,12 +11,20 @@ from RO.Comm.TwistedTimer import Timer
 import numpy
 from astropy.time import Time
 
+from twisted.internet import reactor
 from twistedActor import CommandError, BaseActor, DeviceCollection, expandCommand
 
 from .tccLCOCmdParser import TCCLCOCmdParser
 from ..version import __version__
 
 from ..cmd.collimate import CollimationModel
+from ..utils.clock import getClock
+from ..utils.cmdTrace import cmdTracer
+from ..utils.devLog import getDevLog
+from ..utils.asyncLog import getAsyncLogWriter
+from ..utils.telemetry import TelemetryRecorder
+from ..utils.tcsErrLog import TCSErrLogger
+from ..utils.sessionLog import SessionRecorder, sessionFileName
 
 # tcsHost = "localhost"
 # tcsPort = 0
@@ -24,6 +33,8 @@ from ..cmd.collimate import CollimationModel
 
 __all__ = ["TCCLCOActor"]
 
+actorLog = getDevLog("actor")
+
 """
 From Paul's email regarding scaling solution:
 
@@ -87,6 +98,8 @@ class TCCStatus(object):
             "tccTemps",
             "airmass",
             "pleaseSlew",
+            "SlewDuration",
+            "SlewTimeRemaining",
             "TAI",
             "UTC_TAI",
             "axisErr",
@@ -153,6 +166,12 @@ class TCCLCOActor(BaseActor):
         # measScaleDev,
         # ffDev,
         name = "tcc",
+        logDir = None,
+        telemetryDir = None,
+        tcsErrLogPath = None,
+        sessionDir = None,
+        measScaleDev = None,
+        ffDev = None,
     ):
         """Construct a TCCActor
 
@@ -163,6 +182,17 @@ class TCCLCOActor(BaseActor):
         @param[in] measScaleDev a MeasScaleDevice instance
         @param[in] ffDev a ffDevice instance
         @param[in] name  actor name; used for logging
+        @param[in] logDir  directory for trace files and other diagnostic output;
+            if None then the current working directory is used
+        @param[in] telemetryDir  directory for night-long status telemetry (see tcc.utils.telemetry);
+            if None then telemetry is not recorded
+        @param[in] tcsErrLogPath  path of TCS tracking error log (see tcc.utils.tcsErrLog);
+            if None then tracking errors are not logged
+        @param[in] sessionDir  directory for a session file of all raw device traffic (see tcc.utils.sessionLog);
+            if None then the traffic is not recorded
+        @param[in] measScaleDev  a MeasScaleDevice, or None; not connected or used by the actor
+            (see the commented-out entries in devices), but its traffic is recorded in the session file
+        @param[in] ffDev  a FFDevice, or None; as measScaleDev
         """
         devices = {
             "tcsDev": tcsDev,
@@ -172,19 +202,52 @@ class TCCLCOActor(BaseActor):
             # "ffDev": ffDev,
         }
 
+        self.logDir = os.getcwd() if logDir is None else logDir
         self.status = TCCStatus()
         for devName, device in devices.iteritems():
             setattr(self, devName, device)
             device.tccStatus = self.status
+
+        # passive subscribers to device status
+        self.telemetry = None
+        if telemetryDir is not None:
+            self.telemetry = TelemetryRecorder(telemetryDir)
+            tcsDev.statusTap.addSubscriber(self.telemetry.recordTCS)
+            m2Dev.statusTap.addSubscriber(self.telemetry.recordSec)
+            scaleDev.statusTap.addSubscriber(self.telemetry.recordScale)
+            reactor.addSystemEventTrigger("before", "shutdown", self.telemetry.close)
+        self.tcsErrLogger = None
+        if tcsErrLogPath is not None:
+            self.tcsErrLogger = TCSErrLogger(tcsErrLogPath)
+            tcsDev.statusTap.addSubscriber(self.tcsErrLogger)
+            reactor.addSystemEventTrigger("before", "shutdown", self.tcsErrLogger.close)
+        self.sessionRecorder = None
+        if sessionDir is not None:
+            self.sessionRecorder = SessionRecorder(os.path.join(sessionDir, sessionFileName()))
+            tcsDev.sessionLog = self.sessionRecorder.getRecordFunc("tcs")
+            scaleDev.sessionLog = self.sessionRecorder.getRecordFunc("scale")
+            m2Dev.sessionLog = self.sessionRecorder.getRecordFunc("sec")
+            if measScaleDev is not None:
+                measScaleDev.sessionLog = self.sessionRecorder.getRecordFunc("measScale")
+            if ffDev is not None:
+                ffDev.sessionLog = self.sessionRecorder.getRecordFunc("ff")
+            reactor.addSystemEventTrigger("before", "shutdown", self.sessionRecorder.close)
+
+        for device in devices.itervalues():
             device.connect()
 
         self.dev = DeviceCollection(devices.values())
 
         self.cmdParser = TCCLCOCmdParser()
         self.collimationModel = CollimationModel()
+        tcsDev.statusTap.addSubscriber(self.recordTrussTemp)
         self.collimateTimer = Timer(0, self.updateCollimation)
         self.collimateStatusTimer = Timer()
         self.collimateStatusTimer.start(5, self.collimateStatus) #give things a chance to boot up
+        self.logStatusTimer = Timer()
+        self.nLogDropped = 0
+        if getAsyncLogWriter() is not None:
+            self.logStatusTimer.start(5, self.logStatus)
 
         BaseActor.__init__(self, userPort=userPort, name=name, version=__version__)
 
@@ -228,6 +291,8 @@ class TCCLCOActor(BaseActor):
             return
 
         #cmd.parsedCmd.printData()
+        actorLog.debug("%s dispatching %r", self, cmd.cmdBody)
+        cmdTracer.traceUserCmd(cmd)
         if cmd.parsedCmd.callFunc:
             cmd.setState(cmd.Running)
             try:
@@ -273,7 +338,7 @@ class TCCLCOActor(BaseActor):
                     # ra or dec is slewing
                     # get target coords
                     # st and ra in degrees
-                    st = self.tcsDev.status.statusFieldDict["st"].value
+                    st = self.tcsDev.status.lst()
                     ra = self.tcsDev.status.statusFieldDict["inpra"].value
                     ha = st - ra
                     dec = self.tcsDev.status.statusFieldDict["inpdc"].value
@@ -287,23 +352,36 @@ class TCCLCOActor(BaseActor):
                 newOrient = self.collimationModel.getOrientation(ha, dec)
                 orient = self.secDev.status.orientation[:]
                 # check if mirror move is wanted based on tolerances
-                dFocus = None if newOrient[0] is None else newOrient[0]-orient[0]
                 dtiltX = newOrient[1]-orient[1]
                 dtiltY = newOrient[2]-orient[2]
                 dtransX = newOrient[3]-orient[3]
                 dtransY = newOrient[4]-orient[4]
                 doFlex = numpy.max(numpy.abs([dtiltX, dtiltY])) > self.collimationModel.minTilt or numpy.max(numpy.abs([dtransX, dtransY])) > self.collimationModel.minTrans
 
+                # thermal focus offset is None unless it is due (or free, because the mirror is moving anyway);
+                # it is applied as an offset, so focus offsets pending in the M2 device are kept
+                dFocus = self.collimationModel.getThermalFocusOffset(orient[0], doFlex or force)
+
                 if force:
                     self.writeToUsers("i", "collimation update forced", cmd)
                 if not doFlex and not force:
                     self.writeToUsers("i", "collimation flex update too small: dTiltX=%.2f, dTiltY=%.2f, dTransX=%.2f, dTransY=%.2f"%(dtiltX, dtiltY, dtransX, dtransY))
-                    cmd.setState(cmd.Done)
+                    if dFocus is None:
+                        cmd.setState(cmd.Done)
+                    else:
+                        self.writeToUsers("i", "thermal focus update: dFocus=%.2f, TrussTemp=%.2f"%(dFocus, self.collimationModel.smoothTrussTemp), cmd=cmd)
+                        self.secDev.focus(dFocus, offset=True, userCmd=cmd)
                 else:
                     # update flex values
-                    orient[1:] = newOrient[1:] # keep existing focus
+                    orient[1:] = newOrient[1:]
                     self.writeToUsers("i", "collimation update: Focus=%.2f, TiltX=%.2f, TiltY=%.2f, TransX=%.2f, TransY=%.2f"%tuple(orient), cmd=cmd)
-                    self.secDev.move(orient, userCmd=cmd)
+                    # focus is not set absolutely, so the move does not undo focus changes pending in the M2 device;
+                    # any thermal focus change goes out in the same move, as an offset
+                    focusOffsetList = None
+                    if dFocus is not None:
+                        self.writeToUsers("i", "thermal focus update: dFocus=%.2f, TrussTemp=%.2f"%(dFocus, self.collimationModel.smoothTrussTemp), cmd=cmd)
+                        focusOffsetList = [dFocus]
+                    self.secDev.move([None] + orient[1:], offsetList=focusOffsetList, userCmd=cmd)
 
 
         statusCmd.addCallback(moveMirrorCallback)
@@ -314,8 +392,22 @@ class TCCLCOActor(BaseActor):
         else:
             self.collimateTimer.cancel()
 
+    def recordTrussTemp(self, tcsStatus):
+        """Add the truss temperature from a TCS status snapshot to the collimation model's history
+        """
+        self.collimationModel.addTrussTemp(tcsStatus.trussTemp, getClock().time())
+
     def collimateStatus(self):
         if not self.collimateTimer.isActive and (self.tcsDev.isTracking or self.tcsDev.isSlewing):
             self.writeToUsers("w", "Text=Collimation is NOT active!!!")
         self.collimateStatusTimer.start(5, self.collimateStatus)
 
+    def logStatus(self):
+        """Warn users if log records have been dropped since the last check
+        """
+        nDropped = getAsyncLogWriter().nDropped
+        if nDropped > self.nLogDropped:
+            self.nLogDropped = nDropped
+            self.writeToUsers("w", "logDropped=%i" % (nDropped,))
+        self.logStatusTimer.start(5, self.logStatus)
+
@@ -1,9 +1,12 @@
 from __future__ import division, absolute_import
 
+import functools
+
 from twistedActor import ActorWrapper, DispatcherWrapper
 
 from .tccLCOActor import TCCLCOActor
 from ..dev import TCSDeviceWrapper, ScaleDeviceWrapper, M2DeviceWrapper, MeasScaleDeviceWrapper #, FFDeviceWrapper
+from ..utils.clock import VirtualClock, setClock, deviceIsBusy
 
 __all__ = ["TCCLCOActorWrapper", "TCCLCODispatcherWrapper"]
 
@@ -14,17 +17,33 @@ class TCCLCOActorWrapper(ActorWrapper):
         name = "mockTCCLCO",
         userPort = 0,
         debug = False,
+        linkProfiles = None,
+        clock = None,
+        loopback = False,
     ):
         """!Construct a TCCLCOActorWrapper
 
         @param[in] name  a name to use for messages
         @param[in] userPort  port for actor server
         @param[in] debug  print debug messages?
+        @param[in] linkProfiles  dict of fake controller name ("tcs", "scale", "sec" or "measScale"): LinkProfile
+            (e.g. from tcc.dev.loadLinkProfiles); fakes not listed get an ideal link
+        @param[in] clock  clock for the devices and fake controllers (see tcc.utils.clock);
+            if a VirtualClock then it is auto-advanced while no device is waiting for a reply,
+            and the real clock is restored when the wrapper is closed; if None use the real clock
+        @param[in] loopback  if True, connect the devices to their fake controllers in-process
+            (see tcc.dev.loopback) rather than over TCP; the user port is still TCP
         """
-        self.tcsWrapper = TCSDeviceWrapper(name="tcsWrapper", debug=debug)
-        self.measScaleWrapper = MeasScaleDeviceWrapper(name="measScaleWrapper", debug=debug)
-        self.scaleWrapper = ScaleDeviceWrapper(name="scaleWrapper", debug=debug)
-        self.m2Wrapper = M2DeviceWrapper(name="m2Wrapper", debug=debug)
+        linkProfiles = linkProfiles or {}
+        self.clock = setClock(clock)
+        self.tcsWrapper = TCSDeviceWrapper(name="tcsWrapper", debug=debug, linkProfile=linkProfiles.get("tcs"),
+            loopback=loopback)
+        self.measScaleWrapper = MeasScaleDeviceWrapper(name="measScaleWrapper", debug=debug,
+            linkProfile=linkProfiles.get("measScale"), loopback=loopback)
+        self.scaleWrapper = ScaleDeviceWrapper(name="scaleWrapper", debug=debug, linkProfile=linkProfiles.get("scale"),
+            loopback=loopback)
+        self.m2Wrapper = M2DeviceWrapper(name="m2Wrapper", debug=debug, linkProfile=linkProfiles.get("sec"),
+            loopback=loopback)
         # self.ffWrapper = FFDeviceWrapper(name="ffWrapper", debug=debug)
         deviceWrapperList = [self.tcsWrapper, self.scaleWrapper, self.m2Wrapper, self.measScaleWrapper]#, self.ffWrapper]
         ActorWrapper.__init__(self,
@@ -36,17 +55,27 @@ class TCCLCOActorWrapper(ActorWrapper):
 
     def _makeActor(self):
         self.debugMsg("_makeActor()")
-        # give scaleDevice access to the measScaleDevice
-        self.scaleWrapper.device._addMeasScaleDev(self.measScaleWrapper.device)
         self.actor = TCCLCOActor(
             name = self.name,
             tcsDev = self.tcsWrapper.device,
             scaleDev = self.scaleWrapper.device,
             m2Dev = self.m2Wrapper.device,
-            measScaleDev = self.measScaleWrapper.device,
+            # measScaleDev = self.measScaleWrapper.device,
             # ffDev = self.ffWrapper.device,
             userPort = self._userPort,
         )
+        if isinstance(self.clock, VirtualClock):
+            for devWrapper in (self.tcsWrapper, self.scaleWrapper, self.m2Wrapper):
+                self.clock.addBusyCheck(functools.partial(deviceIsBusy, devWrapper.device))
+            self.clock.startAutoAdvance()
+
+    def _basicClose(self):
+        """Stop auto-advancing a virtual clock and restore the real clock
+        """
+        if isinstance(self.clock, VirtualClock):
+            self.clock.stopAutoAdvance()
+            setClock(None)
+        return ActorWrapper._basicClose(self)
 
 class TCCLCODispatcherWrapper(DispatcherWrapper):
     """!Wrapper for an ActorDispatcher talking to a mock LCO TCC talking to mock controllers
@@ -55,14 +84,20 @@ class TCCLCODispatcherWrapper(DispatcherWrapper):
     on automatically chosen ports, constructing devices that talk to them, constructing
     a TCC actor the specified port, and constructing and connecting the dispatcher.
     """
-    def __init__(self, userPort=0):
+    def __init__(self, userPort=0, linkProfiles=None, clock=None, loopback=False):
         """!Construct a TCCLCODispatcherWrapper
 
         @param[in] userPort  port for mock LCO controller; 0 to chose a free port
+        @param[in] linkProfiles  dict of fake controller name: LinkProfile; see TCCLCOActorWrapper
+        @param[in] clock  clock for devices and fake controllers; see TCCLCOActorWrapper
+        @param[in] loopback  connect devices to fake controllers in-process; see TCCLCOActorWrapper
         """
         actorWrapper = TCCLCOActorWrapper(
             name = "mockTCCLCO",
             userPort = userPort,
+            linkProfiles = linkProfiles,
+            clock = clock,
+            loopback = loopback,
         )
         DispatcherWrapper.__init__(self,
             name = "tccLCOClient",
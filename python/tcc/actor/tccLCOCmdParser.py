@@ -5,7 +5,8 @@ from ..parse.cmdParse import CmdParser
 from ..parse import parseDefs
 from ..cmd import setFocus, showFocus, setScaleFactor, showScaleFactor, showStatus, \
                    showVersion, offset, device, ping, threadRing, sec, target, \
-                   collimate, guiderot, help, guideoffset, lamp, showTime
+                   collimate, guiderot, help, guideoffset, lamp, showTime, trace, verbosity
+from ..cmd.syncScaleMove import DefMaxFocusErr
 
 __all__ = ["TCCLCOCmdParser"]
 
@@ -13,6 +14,11 @@ TimeLimit = parseDefs.Qualifier("TimeLimit", numValueRange=[1,1], valType=float,
     help = "Specify timeout time for communication with controllers.",
 )
 
+SyncQualifier = parseDefs.Qualifier("sync", valType=float, numValueRange=[0,1], defValueList=[DefMaxFocusErr],
+    help = "Move the scaling ring in steps with matched M2 focus moves, so the focus error stays below "
+        "the value given (um, default %.0f); implies /secondary." % (DefMaxFocusErr,),
+)
+
 _CoordSysList = (
     parseDefs.Keyword(
         name = "icrs",
@@ -137,6 +143,20 @@ TCCLCOCmdList = (
                 name = "abort",
                 help = "Aborts all slews that are running.",
             ),
+            parseDefs.Qualifier(
+                name = "check",
+                help = "Do not slew; instead check any number of targets, given as coordPair " \
+                        "ra1, dec1, ra2, dec2... (ha if /ha), at each time given by /tai. " \
+                        "Outputs targetCheck=index, ra, dec, tai, ha, az, alt, airmass, screenAlt, " \
+                        "tiltX, tiltY, transX, transY, limit for each target and time, " \
+                        "where limit is OK, Horizon or Screen (too low for the screen, if /screen).",
+            ),
+            parseDefs.Qualifier(
+                name = "tai",
+                valType = float,
+                numValueRange = [1, None],
+                help = "With /check: TAI dates (MJD, seconds) at which to check targets; default is now.",
+            ),
             ],
         minParAmt = 0,
     ),
@@ -170,7 +190,8 @@ TCCLCOCmdList = (
                     parseDefs.Qualifier(
                         "multiplicative",
                         help = "If specified then new scale factor = old scale factor * value.",
-                    )
+                    ),
+                    SyncQualifier,
                 ],
                 callFunc = setScaleFactor,
                 help = "Set the desired scale factor.",
@@ -259,6 +280,7 @@ TCCLCOCmdList = (
                         name = "secondary",
                         help = "move secondary mirror to maintain current focus.",
                     ),
+                    SyncQualifier,
                 ],
                 help = "directly move the scaling ring",
             ),
@@ -333,6 +355,8 @@ TCCLCOCmdList = (
                     parseDefs.Keyword(name = "startTimer", help = "start collimation updates"),
                     parseDefs.Keyword(name = "stopTimer", help = "stop collimation updates"),
                     parseDefs.Keyword(name = "force", help = "force one collimation update, don't trigger timer"),
+                    parseDefs.Keyword(name = "startFocus", help = "fold thermal (truss temperature) focus corrections into collimation updates"),
+                    parseDefs.Keyword(name = "stopFocus", help = "leave focus alone in collimation updates"),
                 ],
             )
         ],
@@ -388,6 +412,46 @@ TCCLCOCmdList = (
             )
         ],
     ),
+    parseDefs.Command(
+        name = "trace",
+        help = "Record user commands and the device commands they spawn as spans " \
+            "in a Chrome trace event file (view with chrome://tracing or Perfetto).",
+        callFunc = trace,
+        minParAmt = 1,
+        paramList = [
+            parseDefs.KeywordParam(
+                name = 'action',
+                keywordDefList = [
+                    parseDefs.Keyword(name = "on", help = "start tracing to a new file"),
+                    parseDefs.Keyword(name = "off", help = "stop tracing and close the file"),
+                    parseDefs.Keyword(name = "status", help = "report trace state"),
+                ],
+            )
+        ],
+        qualifierList = [
+            parseDefs.Qualifier(
+                name = "file",
+                valType = str,
+                numValueRange = [1,1],
+                help = "Trace file path (quoted); defaults to a time-stamped file in the log directory.",
+            ),
+        ],
+    ),
+    parseDefs.Command(
+        name = "verbosity",
+        help = "Show or set log verbosity; levels are quiet, info (default), debug (every line read and written) and verbose.",
+        callFunc = verbosity,
+        minParAmt = 0,
+        paramList = [
+            parseDefs.KeywordParam(
+                name = 'source',
+                keywordDefList = [parseDefs.Keyword(name = item, castVals=str, numValueRange=[0,1]) for item in [
+                    "tcs", "scale", "sec", "measscale", "actor"]],
+                numParamRange = [0, None],
+                help = "Which log source(s), optionally =level. If omitted then show all.",
+            ),
+        ],
+    ),
 )
 
 class TCCLCOCmdParser(CmdParser):
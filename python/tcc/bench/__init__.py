@@ -0,0 +1,9 @@
+from __future__ import absolute_import
+
+from .actorClient import *
+from .benchUtils import *
+from .slewBench import *
+from .guideBench import *
+from .loadBench import *
+from .protoBench import *
+from .soakBench import *
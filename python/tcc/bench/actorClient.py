@@ -0,0 +1,147 @@
+from __future__ import division, absolute_import
+"""A minimal user-port client for benchmarks
+
+Commands are sent as "<cmdID> <cmdStr>"; replies are read as "<userID> <cmdID> <msgCode> <msgStr>".
+Each command is tracked by a ClientCmd, which records when it was sent, every reply and
+when it finished, and fires a Deferred when it finishes. Once the actor has announced
+this client's user ID (yourUserID=...), replies to other users' commands are ignored.
+"""
+import itertools
+import re
+
+from twisted.internet.defer import Deferred
+from RO.Comm.TCPConnection import TCPConnection
+
+from tcc.utils.clock import getClock
+
+__all__ = ["ActorClient", "ClientCmd"]
+
+DoneCodes = frozenset(":")
+FailedCodes = frozenset("f!")
+_UserIDRE = re.compile(r"yourUserID=(\d+)", re.IGNORECASE)
+
+class ClientCmd(object):
+    """!A command sent by an ActorClient
+    """
+    def __init__(self, cmdID, cmdStr):
+        self.cmdID = cmdID
+        self.cmdStr = cmdStr
+        self.sendTime = getClock().time()
+        self.doneTime = None
+        self.msgCode = None # final message code
+        self.replyList = [] # list of (time, msgCode, msgStr)
+        self.doneDeferred = Deferred()
+
+    @property
+    def isDone(self):
+        return self.doneTime is not None
+
+    @property
+    def didFail(self):
+        return self.msgCode in FailedCodes
+
+    @property
+    def latency(self):
+        """Time from sending to the final reply (sec), or None if not done
+        """
+        if self.doneTime is None:
+            return None
+        return self.doneTime - self.sendTime
+
+    @property
+    def textMsg(self):
+        """The message string of the final reply ("" if not done)
+        """
+        return self.replyList[-1][2] if self.isDone else ""
+
+    def _handleReply(self, msgCode, msgStr):
+        currTime = getClock().time()
+        self.replyList.append((currTime, msgCode, msgStr))
+        if msgCode in DoneCodes or msgCode in FailedCodes:
+            self.doneTime = currTime
+            self.msgCode = msgCode
+            self.doneDeferred.callback(self)
+
+
+class ActorClient(object):
+    """!Send commands to an actor's user port and track the replies
+    """
+    def __init__(self, host, port, name="benchClient"):
+        """!Construct an ActorClient; call connect to connect
+
+        @param[in] host  host of the actor
+        @param[in] port  user port of the actor
+        @param[in] name  name, for messages
+        """
+        self.name = name
+        self.userID = None # set when the actor reports it
+        self.cmdDict = {} # cmdID: ClientCmd, for commands not yet done
+        self._cmdIDIter = itertools.count(1)
+        self.nBytesRead = 0
+        self.nLinesRead = 0
+        self.nUnsolicited = 0 # lines that are not replies to this client's commands (e.g. status broadcasts)
+        self.conn = TCPConnection(
+            host = host,
+            port = port,
+            readCallback = self._readCallback,
+            readLines = True,
+            name = name,
+        )
+
+    @property
+    def isConnected(self):
+        return self.conn.isConnected
+
+    def connect(self):
+        """!Connect to the actor
+
+        @return a Deferred that fires with this client when connected, or errs if the connection fails
+        """
+        d = Deferred()
+        def stateCallback(conn):
+            if d.called:
+                return
+            if conn.isConnected:
+                d.callback(self)
+            elif conn.didFail:
+                d.errback(RuntimeError("%s could not connect: %s" % (self.name, conn.fullState[1])))
+        self.conn.addStateCallback(stateCallback)
+        self.conn.connect()
+        return d
+
+    def disconnect(self):
+        self.conn.disconnect()
+
+    def sendCmd(self, cmdStr):
+        """!Send a command
+
+        @param[in] cmdStr  command string, without command ID
+        @return a ClientCmd; its doneDeferred fires with the ClientCmd when the command finishes
+        """
+        clientCmd = ClientCmd(next(self._cmdIDIter), cmdStr)
+        self.cmdDict[clientCmd.cmdID] = clientCmd
+        self.conn.writeLine("%d %s" % (clientCmd.cmdID, cmdStr))
+        return clientCmd
+
+    def _readCallback(self, sock, line):
+        self.nBytesRead += len(line) + 1
+        self.nLinesRead += 1
+        fieldList = line.split(None, 3)
+        try:
+            userID = int(fieldList[0])
+            cmdID = int(fieldList[1])
+            msgCode = fieldList[2]
+        except (IndexError, ValueError):
+            self.nUnsolicited += 1
+            return
+        if self.userID is None:
+            userIDMatch = _UserIDRE.search(line)
+            if userIDMatch:
+                self.userID = int(userIDMatch.group(1))
+        clientCmd = self.cmdDict.get(cmdID) if self.userID in (None, userID) else None
+        if clientCmd is None:
+            self.nUnsolicited += 1
+            return
+        clientCmd._handleReply(msgCode, fieldList[3] if len(fieldList) > 3 else "")
+        if clientCmd.isDone:
+            del self.cmdDict[cmdID]
@@ -0,0 +1,227 @@
+from __future__ import division, absolute_import
+"""Shared pieces of the benchmarks: an emulated TCC, trace collection and result files
+
+Benchmarks run an emulated TCC in-process (fake controllers, devices and actor, as
+started by bin/emulateLCOTCC.py) and talk to its user port with ActorClients.
+Device-level detail comes from the command tracer (tcc.utils.cmdTrace): every device
+command is a span whose traceID identifies the user command that caused it; spans
+without a traceID are status polls and other background traffic.
+
+Results are plain dicts written as JSON, so they can be compared across changes.
+"""
+import datetime
+import json
+import os
+import platform
+
+import numpy
+from twisted.internet.defer import Deferred
+
+from tcc.actor import TCCLCOActorWrapper
+from tcc.utils.cmdTrace import cmdTracer, UserLane
+from tcc.version import __version__
+from .actorClient import ActorClient
+
+__all__ = ["BenchEmulator", "TraceCollector", "summarize", "writeResults", "readResults"]
+
+def summarize(valueList):
+    """!Return summary statistics of a list of numbers as a dict
+
+    Keys are n, mean, min, p50, p90, p99 and max; all but n are None if the list is empty.
+    """
+    valueArr = numpy.asarray([value for value in valueList if value is not None], dtype=float)
+    if len(valueArr) == 0:
+        return dict(n=0, mean=None, min=None, p50=None, p90=None, p99=None, max=None)
+    p50, p90, p99 = numpy.percentile(valueArr, [50, 90, 99])
+    return dict(
+        n = len(valueArr),
+        mean = float(valueArr.mean()),
+        min = float(valueArr.min()),
+        p50 = float(p50),
+        p90 = float(p90),
+        p99 = float(p99),
+        max = float(valueArr.max()),
+    )
+
+def writeResults(filePath, scenario, config, resultDict):
+    """!Write benchmark results as JSON
+
+    @param[in] filePath  path of output file; "-" for stdout
+    @param[in] scenario  name of benchmark scenario, e.g. "slew"
+    @param[in] config  dict of the settings of this run
+    @param[in] resultDict  dict of results
+    @return the full dict written (with scenario, config, host and version information)
+    """
+    outDict = dict(
+        scenario = scenario,
+        date = datetime.datetime.utcnow().isoformat(),
+        version = __version__,
+        host = platform.node(),
+        config = config,
+        results = resultDict,
+    )
+    outStr = json.dumps(outDict, indent=2, sort_keys=True)
+    if filePath == "-":
+        print(outStr)
+    else:
+        outDir = os.path.dirname(filePath)
+        if outDir and not os.path.exists(outDir):
+            os.makedirs(outDir)
+        with open(filePath, "w") as f:
+            f.write(outStr + "\n")
+    return outDict
+
+def readResults(filePath):
+    """!Read benchmark results written by writeResults
+    """
+    with open(filePath, "r") as f:
+        return json.load(f)
+
+
+class TraceCollector(object):
+    """!Collect command tracer spans in memory
+    """
+    def __init__(self):
+        self.spanList = []
+
+    def start(self):
+        cmdTracer.addSink(self.addEvent)
+
+    def stop(self):
+        cmdTracer.removeSink(self.addEvent)
+
+    def addEvent(self, eventDict):
+        if eventDict.get("ph") == "X":
+            self.spanList.append(eventDict)
+
+    def clear(self):
+        self.spanList = []
+
+    def getUserSpan(self, cmdStr, startTime, endTime):
+        """!Return the user command span for a command string that ran within a time window, or None
+
+        @param[in] cmdStr  command string, as sent (without command ID)
+        @param[in] startTime, endTime  time window (sec)
+        """
+        for span in reversed(self.spanList):
+            if span["cat"] == UserLane and span["name"] == cmdStr \
+                and startTime * 1e6 <= span["ts"] <= endTime * 1e6 + 1:
+                return span
+        return None
+
+    def getDevSpans(self, startTime, endTime, traceID=False):
+        """!Return device command spans that started within a time window
+
+        @param[in] startTime, endTime  time window (sec)
+        @param[in] traceID  only return spans with this trace ID (None for background commands);
+            if False then return all
+        """
+        return [span for span in self.spanList
+            if span["cat"] != UserLane
+            and startTime * 1e6 <= span["ts"] <= endTime * 1e6
+            and (traceID is False or span["args"].get("traceID") == traceID)]
+
+    def describeCmd(self, clientCmd):
+        """!Describe where the time of a finished command went, using its device spans
+
+        @param[in] clientCmd  a finished ClientCmd
+        @return a dict containing:
+        - latency: command-to-done time (sec)
+        - dispatchDelay: time from sending to the actor starting the command (sec), if traced
+        - devCmds: dict of device lane: number of device commands the command issued
+        - devTime: dict of device lane: summed duration of those commands (sec)
+        - queueWait: summed time those commands waited in device queues (sec)
+        - verbTime: dict of command verb: summed duration (sec)
+        - motionWait: time from the end of the last device command to done (sec):
+            waiting for motion, settling, or status polls to confirm arrival
+        - pollCmds: dict of device lane: number of background device commands
+            (status polls) while the command ran
+        """
+        startTime, endTime = clientCmd.sendTime, clientCmd.doneTime
+        userSpan = self.getUserSpan(clientCmd.cmdStr, startTime, endTime)
+        traceID = None if userSpan is None else userSpan["args"]["traceID"]
+        ownSpanList = [] if traceID is None else self.getDevSpans(startTime, endTime, traceID=traceID)
+        devCmds = {}
+        devTime = {}
+        verbTime = {}
+        queueWait = 0.
+        lastEndTime = startTime
+        for span in ownSpanList:
+            lane = span["cat"]
+            dur = span["dur"] / 1e6
+            devCmds[lane] = devCmds.get(lane, 0) + 1
+            devTime[lane] = devTime.get(lane, 0.) + dur
+            verb = span["name"].split()[0].upper() if span["name"] else ""
+            verbTime[verb] = verbTime.get(verb, 0.) + dur
+            queueWait += span["args"].get("queueWaitMs", 0) / 1000.
+            lastEndTime = max(lastEndTime, (span["ts"] + span["dur"]) / 1e6)
+        pollCmds = {}
+        for span in self.getDevSpans(startTime, endTime, traceID=None):
+            pollCmds[span["cat"]] = pollCmds.get(span["cat"], 0) + 1
+        return dict(
+            latency = clientCmd.latency,
+            dispatchDelay = None if userSpan is None else userSpan["ts"] / 1e6 - startTime,
+            devCmds = devCmds,
+            devTime = devTime,
+            queueWait = queueWait,
+            verbTime = verbTime,
+            motionWait = max(0., endTime - lastEndTime) if ownSpanList else None,
+            pollCmds = pollCmds,
+        )
+
+
+class BenchEmulator(object):
+    """!An emulated TCC (fake controllers, devices and actor) for benchmarks
+    """
+    def __init__(self, loopback=True, linkProfiles=None, clock=None, userPort=0):
+        """!Construct a BenchEmulator; call start to start it
+
+        @param[in] loopback  connect devices to the fake controllers in-process?
+        @param[in] linkProfiles  dict of fake controller name: LinkProfile; see TCCLCOActorWrapper
+        @param[in] clock  clock for devices and fake controllers; see TCCLCOActorWrapper
+        @param[in] userPort  user port of the actor; 0 to pick a free port
+        """
+        self.actorWrapper = TCCLCOActorWrapper(
+            name = "benchTCC",
+            userPort = userPort,
+            linkProfiles = linkProfiles,
+            clock = clock,
+            loopback = loopback,
+        )
+        self.clientList = []
+
+    @property
+    def actor(self):
+        return self.actorWrapper.actor
+
+    @property
+    def userPort(self):
+        return self.actorWrapper.userPort
+
+    def start(self):
+        """!Start the emulator
+
+        @return a Deferred that fires with this emulator when the actor is ready
+        """
+        d = Deferred()
+        self.actorWrapper.readyDeferred.addCallbacks(lambda ignored: d.callback(self), d.errback)
+        return d
+
+    def addClient(self, name="benchClient"):
+        """!Connect a new ActorClient to the actor
+
+        @return a Deferred that fires with the client when it is connected
+        """
+        client = ActorClient(host="localhost", port=self.userPort, name=name)
+        self.clientList.append(client)
+        return client.connect()
+
+    def close(self):
+        """!Disconnect all clients and shut down the emulator
+
+        @return a Deferred that fires when done
+        """
+        for client in self.clientList:
+            client.disconnect()
+        self.actor.collimateStatusTimer.cancel()
+        return self.actorWrapper.close()
@@ -0,0 +1,207 @@
+from __future__ import division, absolute_import
+"""Closed-loop guiding benchmark
+
+A synthetic guider sends corrections to an emulated TCC at a fixed cadence, as the real
+guider does: each cycle sends one guideoffset command (RA/Dec, rotator, focus and scale
+terms) and, optionally, an "offset guide" rotator correction. Cycles start on schedule
+whether or not the previous cycle's corrections have finished, so a slow correction
+shows up as an overlapping ("late") cycle, and delays the next one (corrections that
+arrive during a move are merged and applied when the move is done).
+
+Reports, for each cycle: completion latency of each correction and of the cycle as a
+whole, failed corrections and why, and device traffic (commands per device, own and
+background) while the cycle ran.
+"""
+from twisted.internet.defer import Deferred
+import numpy
+
+from tcc.utils.clock import getClock
+from .benchUtils import BenchEmulator, TraceCollector, summarize
+
+__all__ = ["GuideBench", "DefaultOffsetScales"]
+
+ArcSecPerDeg = 3600.
+
+# scale of each correction term, for the chosen distribution; 0 to omit the term
+DefaultOffsetScales = dict(
+    ra = 0.3, # arcsec
+    dec = 0.3, # arcsec
+    rot = 5., # arcsec, sent as part of guideoffset
+    focus = 5., # um
+    scale = 1e-5, # fractional change of scale
+    guideRot = 0., # arcsec, sent as "offset guide 0, 0, rot"
+)
+
+class GuideBench(object):
+    """!Run a synthetic guider against an emulated TCC
+    """
+    def __init__(self, nCycle=50, cadence=5., offsetScales=None, distribution="normal",
+        guideRot=True, seed=0, emulator=None):
+        """!Construct a GuideBench
+
+        @param[in] nCycle  number of guide cycles
+        @param[in] cadence  time between the start of successive cycles (sec)
+        @param[in] offsetScales  dict of correction term: scale; missing terms are taken from
+            DefaultOffsetScales. Terms are ra, dec, rot (arcsec), focus (um), scale (fraction)
+            and guideRot (arcsec). A term whose scale is 0 is not sent.
+        @param[in] distribution  distribution of each term: "normal" (scale is sigma)
+            or "uniform" (values are in the range [-scale, scale])
+        @param[in] guideRot  enable rotator guide corrections ("guiderot on") before starting?
+        @param[in] seed  random number seed, so runs can be compared
+        @param[in] emulator  a BenchEmulator; if None then one is constructed with default settings
+        """
+        if distribution not in ("normal", "uniform"):
+            raise RuntimeError("Unknown distribution %r; must be normal or uniform" % (distribution,))
+        self.nCycle = int(nCycle)
+        self.cadence = float(cadence)
+        self.offsetScales = DefaultOffsetScales.copy()
+        if offsetScales:
+            unknownTerms = set(offsetScales) - set(DefaultOffsetScales)
+            if unknownTerms:
+                raise RuntimeError("Unknown offset terms: %s" % (", ".join(sorted(unknownTerms)),))
+            self.offsetScales.update(offsetScales)
+        self.distribution = distribution
+        self.guideRot = bool(guideRot)
+        self.seed = seed
+        self.randomState = numpy.random.RandomState(seed)
+        self.emulator = BenchEmulator() if emulator is None else emulator
+        self.traceCollector = TraceCollector()
+        self.client = None
+        self.cycleList = [] # list of (start time, list of ClientCmd)
+
+    @property
+    def config(self):
+        return dict(
+            nCycle = self.nCycle,
+            cadence = self.cadence,
+            offsetScales = self.offsetScales,
+            distribution = self.distribution,
+            guideRot = self.guideRot,
+            seed = self.seed,
+        )
+
+    def run(self):
+        """!Run the benchmark
+
+        @return a Deferred that fires with the results dict (see getResults)
+        """
+        self.doneDeferred = Deferred()
+        d = self.emulator.start()
+        d.addCallback(lambda emulator: emulator.addClient("guideBench"))
+        d.addCallback(self._setup)
+        d.addErrback(self.doneDeferred.errback)
+        return self.doneDeferred
+
+    def drawOffset(self, term):
+        """!Draw one value of a correction term, or return 0 if the term is disabled
+        """
+        scale = self.offsetScales[term]
+        if not scale:
+            return 0.
+        if self.distribution == "normal":
+            return self.randomState.normal(0., scale)
+        return self.randomState.uniform(-scale, scale)
+
+    def makeCycleCmds(self):
+        """!Return the command strings for one guide cycle
+        """
+        offRA, offDec, offRot, offFocus, offScale, offGuideRot = [self.drawOffset(term)
+            for term in ("ra", "dec", "rot", "focus", "scale", "guideRot")]
+        cmdStrList = ["guideoffset %.7f, %.7f, %.7f, %.2f, %.8f" % (
+            offRA / ArcSecPerDeg, offDec / ArcSecPerDeg, offRot / ArcSecPerDeg, offFocus, 1. + offScale)]
+        if offGuideRot:
+            cmdStrList.append("offset guide 0.0, 0.0, %.7f" % (offGuideRot / ArcSecPerDeg,))
+        return cmdStrList
+
+    def _setup(self, client):
+        self.client = client
+        self.traceCollector.start()
+        if self.guideRot:
+            guideRotCmd = self.client.sendCmd("guiderot on")
+            guideRotCmd.doneDeferred.addCallback(self._startCycles)
+        else:
+            self._startCycles()
+
+    def _startCycles(self, ignored=None):
+        # let the devices report status at least once before the first cycle
+        getClock().callLater(self.cadence, self._nextCycle)
+
+    def _nextCycle(self):
+        if len(self.cycleList) >= self.nCycle:
+            return
+        clientCmdList = [self.client.sendCmd(cmdStr) for cmdStr in self.makeCycleCmds()]
+        self.cycleList.append((getClock().time(), clientCmdList))
+        for clientCmd in clientCmdList:
+            clientCmd.doneDeferred.addCallback(self._cmdDone)
+        if len(self.cycleList) < self.nCycle:
+            getClock().callLater(self.cadence, self._nextCycle)
+
+    def _cmdDone(self, ignored):
+        if len(self.cycleList) < self.nCycle or self.doneDeferred.called:
+            return
+        if all(clientCmd.isDone for startTime, clientCmdList in self.cycleList for clientCmd in clientCmdList):
+            self.traceCollector.stop()
+            self.doneDeferred.callback(self.getResults())
+
+    def getResults(self):
+        """!Return the results as a dict containing:
+        - cycles: a list of one dict per cycle:
+            - startTime: time the cycle started, relative to the first cycle (sec)
+            - latency: time from the start of the cycle until all its corrections finished (sec)
+            - isLate: True if the cycle's corrections were still running when the next cycle started
+            - nFailed: number of failed corrections
+            - traffic: dict of device lane: number of device commands (own and background)
+                from the start of this cycle to the start of the next (or the end of this one)
+            - cmds: a list of one dict per correction: cmdStr, didFail, textMsg
+                and the items of TraceCollector.describeCmd
+        - summary: statistics over all cycles of cycle latency, guideoffset and offset guide
+            latency (of successful corrections), device commands issued per cycle
+            and device traffic per cycle
+        - nFailed: number of failed corrections
+        - nLate: number of late cycles
+        - failures: dict of failure message: number of corrections that failed with it
+        """
+        cycleDictList = []
+        failureDict = {}
+        t0 = self.cycleList[0][0] if self.cycleList else 0.
+        for ind, (startTime, clientCmdList) in enumerate(self.cycleList):
+            endTime = max(clientCmd.doneTime for clientCmd in clientCmdList)
+            nextStartTime = self.cycleList[ind + 1][0] if ind + 1 < len(self.cycleList) else endTime
+            cmdDictList = []
+            for clientCmd in clientCmdList:
+                cmdDict = dict(cmdStr=clientCmd.cmdStr, didFail=clientCmd.didFail, textMsg=clientCmd.textMsg)
+                cmdDict.update(self.traceCollector.describeCmd(clientCmd))
+                cmdDictList.append(cmdDict)
+                if clientCmd.didFail:
+                    failureDict[clientCmd.textMsg] = failureDict.get(clientCmd.textMsg, 0) + 1
+            traffic = {}
+            for span in self.traceCollector.getDevSpans(startTime, max(endTime, nextStartTime)):
+                traffic[span["cat"]] = traffic.get(span["cat"], 0) + 1
+            cycleDictList.append(dict(
+                startTime = startTime - t0,
+                latency = endTime - startTime,
+                isLate = endTime > nextStartTime,
+                nFailed = sum(cmdDict["didFail"] for cmdDict in cmdDictList),
+                traffic = traffic,
+                cmds = cmdDictList,
+            ))
+
+        def getCmdValues(verb, name):
+            return [cmdDict[name] for cycleDict in cycleDictList for cmdDict in cycleDict["cmds"]
+                if cmdDict["cmdStr"].startswith(verb) and not cmdDict["didFail"]]
+
+        summary = dict(
+            cycleLatency = summarize([cycleDict["latency"] for cycleDict in cycleDictList]),
+            guideoffsetLatency = summarize(getCmdValues("guideoffset", "latency")),
+            guideRotLatency = summarize(getCmdValues("offset guide", "latency")),
+            devCmds = summarize([sum(sum(cmdDict["devCmds"].values()) for cmdDict in cycleDict["cmds"])
+                for cycleDict in cycleDictList]),
+            traffic = summarize([sum(cycleDict["traffic"].values()) for cycleDict in cycleDictList]),
+        )
+        return dict(
+            cycles = cycleDictList,
+            summary = summary,
+            nFailed = sum(cycleDict["nFailed"] for cycleDict in cycleDictList),
+            nLate = sum(cycleDict["isLate"] for cycleDict in cycleDictList),
+            failures = failureDict,
+        )
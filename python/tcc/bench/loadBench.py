@@ -0,0 +1,186 @@
+from __future__ import division, absolute_import
+"""Multi-client load test of the actor's user port
+
+Opens many user connections to an emulated TCC, as STUI instances, the guider, the hub
+and scripts do in production, and has each send a random mix of commands (status
+queries and small motions) at random intervals, independent of whether its earlier
+commands have finished. Every reply and status broadcast goes to every client, so this
+exercises the actor's reply fan-out as well as command handling.
+
+Reports command throughput, reply latency percentiles (overall and per command) and
+per-client traffic received.
+"""
+from twisted.internet.defer import Deferred, gatherResults
+import numpy
+
+from tcc.utils.clock import getClock
+from .benchUtils import BenchEmulator, summarize
+
+__all__ = ["LoadBench", "DefaultCmdMix"]
+
+# command string: relative weight; motions are paired so the telescope does not drift
+DefaultCmdMix = {
+    "show status": 3,
+    "show time": 3,
+    "ping": 3,
+    "device status": 1,
+    "offset arc 0.0001, 0.0": 0.25,
+    "offset arc -0.0001, 0.0": 0.25,
+    "set focus=5/incremental": 0.25,
+    "set focus=-5/incremental": 0.25,
+}
+
+class LoadBench(object):
+    """!Run many user clients against an emulated TCC
+    """
+    def __init__(self, nClient=10, rate=5., duration=60., cmdMix=None, drainTime=120., seed=0, emulator=None):
+        """!Construct a LoadBench
+
+        @param[in] nClient  number of user connections
+        @param[in] rate  mean number of commands sent per second, summed over all clients;
+            each client sends commands at random (exponentially distributed) intervals
+        @param[in] duration  time over which commands are sent (sec)
+        @param[in] cmdMix  dict of command string: relative weight; if None use DefaultCmdMix
+        @param[in] drainTime  maximum time to wait for outstanding commands after the last is sent (sec);
+            commands still running after this are reported as unfinished
+        @param[in] seed  random number seed, so runs can be compared
+        @param[in] emulator  a BenchEmulator; if None then one is constructed with default settings
+        """
+        if nClient < 1:
+            raise RuntimeError("nClient=%s; must be at least 1" % (nClient,))
+        if rate <= 0:
+            raise RuntimeError("rate=%s; must be positive" % (rate,))
+        self.nClient = int(nClient)
+        self.rate = float(rate)
+        self.duration = float(duration)
+        self.cmdMix = DefaultCmdMix.copy() if cmdMix is None else dict(cmdMix)
+        self.drainTime = float(drainTime)
+        self.seed = seed
+        self.randomState = numpy.random.RandomState(seed)
+        self._cmdStrList = sorted(self.cmdMix)
+        weightArr = numpy.array([self.cmdMix[cmdStr] for cmdStr in self._cmdStrList], dtype=float)
+        self._cmdProbArr = weightArr / weightArr.sum()
+        self.emulator = BenchEmulator() if emulator is None else emulator
+        self.clientList = []
+        self.clientCmdList = [] # list of (client index, ClientCmd)
+        self.startTime = None
+        self.stopTime = None
+        self._drainTimer = None
+
+    @property
+    def config(self):
+        return dict(
+            nClient = self.nClient,
+            rate = self.rate,
+            duration = self.duration,
+            cmdMix = self.cmdMix,
+            drainTime = self.drainTime,
+            seed = self.seed,
+        )
+
+    def run(self):
+        """!Run the benchmark
+
+        @return a Deferred that fires with the results dict (see getResults)
+        """
+        self.doneDeferred = Deferred()
+        d = self.emulator.start()
+        d.addCallback(lambda emulator: gatherResults([emulator.addClient("loadBench%d" % (ind,))
+            for ind in range(self.nClient)]))
+        d.addCallback(self._startLoad)
+        d.addErrback(self.doneDeferred.errback)
+        return self.doneDeferred
+
+    def drawCmdStr(self):
+        """!Return a random command string from the command mix
+        """
+        return self._cmdStrList[self.randomState.choice(len(self._cmdStrList), p=self._cmdProbArr)]
+
+    def drawInterval(self):
+        """!Return a random time until a client's next command (sec)
+        """
+        return self.randomState.exponential(self.nClient / self.rate)
+
+    def _startLoad(self, clientList):
+        self.clientList = clientList
+        self.startTime = getClock().time()
+        for ind in range(self.nClient):
+            getClock().callLater(self.drawInterval(), self._sendCmd, ind)
+        getClock().callLater(self.duration, self._stopLoad)
+
+    def _sendCmd(self, ind):
+        if self.stopTime is not None:
+            return
+        clientCmd = self.clientList[ind].sendCmd(self.drawCmdStr())
+        self.clientCmdList.append((ind, clientCmd))
+        clientCmd.doneDeferred.addCallback(self._checkDone)
+        getClock().callLater(self.drawInterval(), self._sendCmd, ind)
+
+    def _stopLoad(self):
+        self.stopTime = getClock().time()
+        self._drainTimer = getClock().callLater(self.drainTime, self._finish)
+        self._checkDone()
+
+    def _checkDone(self, ignored=None):
+        if self.stopTime is None or self.doneDeferred.called:
+            return
+        if all(clientCmd.isDone for ind, clientCmd in self.clientCmdList):
+            self._finish()
+
+    def _finish(self):
+        if self.doneDeferred.called:
+            return
+        if self._drainTimer is not None and self._drainTimer.active():
+            self._drainTimer.cancel()
+        self.doneDeferred.callback(self.getResults())
+
+    def getResults(self):
+        """!Return the results as a dict containing:
+        - nSent: number of commands sent
+        - nDone: number of commands that finished successfully
+        - nFailed: number of commands that failed
+        - nUnfinished: number of commands that had not finished by the end of the drain time
+        - elapsed: time from the start of the load to the last reply (sec)
+        - throughput: commands finished (successfully or not) per second of elapsed time
+        - latency: statistics of reply latency (sec) of all finished commands
+        - cmds: dict of command string: dict of nSent, nFailed and latency statistics
+        - clients: list of one dict per client: nSent, nFailed, latency statistics,
+            nBytesRead, nLinesRead and nUnsolicited (lines that were not replies to this
+            client's commands, e.g. status broadcasts and other clients' replies)
+        - bytesRead: statistics of bytes received per client
+        """
+        finishedList = [clientCmd for ind, clientCmd in self.clientCmdList if clientCmd.isDone]
+        endTime = max([clientCmd.doneTime for clientCmd in finishedList] + [self.stopTime or self.startTime])
+        elapsed = endTime - self.startTime if self.startTime is not None else 0.
+
+        def describe(clientCmdList):
+            return dict(
+                nSent = len(clientCmdList),
+                nFailed = sum(clientCmd.didFail for clientCmd in clientCmdList),
+                latency = summarize([clientCmd.latency for clientCmd in clientCmdList]),
+            )
+
+        cmdDict = dict((cmdStr, describe([clientCmd for ind, clientCmd in self.clientCmdList
+            if clientCmd.cmdStr == cmdStr])) for cmdStr in self._cmdStrList)
+        clientDictList = []
+        for clientInd, client in enumerate(self.clientList):
+            clientDict = describe([clientCmd for ind, clientCmd in self.clientCmdList if ind == clientInd])
+            clientDict.update(
+                nBytesRead = client.nBytesRead,
+                nLinesRead = client.nLinesRead,
+                nUnsolicited = client.nUnsolicited,
+            )
+            clientDictList.append(clientDict)
+        nFailed = sum(clientCmd.didFail for clientCmd in finishedList)
+        return dict(
+            nSent = len(self.clientCmdList),
+            nDone = len(finishedList) - nFailed,
+            nFailed = nFailed,
+            nUnfinished = len(self.clientCmdList) - len(finishedList),
+            elapsed = elapsed,
+            throughput = len(finishedList) / elapsed if elapsed > 0 else None,
+            latency = summarize([clientCmd.latency for clientCmd in finishedList]),
+            cmds = cmdDict,
+            clients = clientDictList,
+            bytesRead = summarize([client.nBytesRead for client in self.clientList]),
+        )
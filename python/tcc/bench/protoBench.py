@@ -0,0 +1,240 @@
+from __future__ import division, absolute_import
+"""Protocol micro-benchmarks: one device talking to its fake controller
+
+Each scenario starts one device wrapper (a device and its fake controller, as used by the
+emulator) and runs one kind of exchange back to back: the next exchange is started as soon
+as the previous one finishes. For each it measures:
+- round trip: wall-clock time from issuing the exchange to its completion
+- throughput: exchanges and device messages per second of wall-clock time
+- CPU per message: process CPU time (user + system) divided by the number of device messages
+
+A device message is one device command: a command line and its reply lines
+(e.g. a TCS status exchange is one message per status verb).
+
+Round trips are wall-clock times even on a virtual clock. A virtual clock (auto-advanced
+while the device waits for nothing) removes the fake controllers' simulated delays,
+such as the time an M2 move takes, leaving the cost of the protocol itself.
+"""
+import functools
+import os
+import time
+
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred
+
+from tcc.dev import TCSDeviceWrapper, M2DeviceWrapper, ScaleDeviceWrapper, MeasScaleDeviceWrapper
+from tcc.utils.clock import VirtualClock, setClock, deviceIsBusy
+from tcc.utils.cmdTrace import cmdTracer
+from .benchUtils import summarize
+
+__all__ = ["ProtoScenario", "ProtoBench", "ScenarioDict", "ScenarioNameList", "compareToBaseline"]
+
+def _cpuTime():
+    """Return process CPU time (user + system, sec)
+    """
+    timeTuple = os.times()
+    return timeTuple[0] + timeTuple[1]
+
+class ProtoScenario(object):
+    """!One device protocol exchange to benchmark
+    """
+    def __init__(self, name, wrapperClass, exchangeFunc, help):
+        """!Construct a ProtoScenario
+
+        @param[in] name  name of scenario
+        @param[in] wrapperClass  device wrapper class, e.g. TCSDeviceWrapper
+        @param[in] exchangeFunc  function to start one exchange; called with the device and
+            the exchange index; returns a command that finishes when the exchange is done
+        @param[in] help  one-line description
+        """
+        self.name = name
+        self.wrapperClass = wrapperClass
+        self.exchangeFunc = exchangeFunc
+        self.help = help
+
+def _m2Move(device, ind):
+    # alternate small focus offsets so the mirror does not drift
+    return device.focus(1. if ind % 2 == 0 else -1., offset=True)
+
+# scenario name: ProtoScenario
+ScenarioDict = dict((scenario.name, scenario) for scenario in (
+    ProtoScenario("tcsStatus", TCSDeviceWrapper, lambda device, ind: device.getStatus(),
+        "TCS status: one query per status verb"),
+    ProtoScenario("m2Status", M2DeviceWrapper, lambda device, ind: device.getStatus(),
+        "M2 status query"),
+    ProtoScenario("m2Move", M2DeviceWrapper, _m2Move,
+        "M2 focus move of +/-1 um, to the end of the move"),
+    ProtoScenario("scaleStatus", ScaleDeviceWrapper, lambda device, ind: device.getStatus(),
+        "scaling ring status block"),
+    ProtoScenario("measScaleRead", MeasScaleDeviceWrapper, lambda device, ind: device.getStatus(),
+        "Mitutoyo gauge reads: one per gauge"),
+))
+# names of all scenarios, in the order they are run
+ScenarioNameList = ["tcsStatus", "m2Status", "m2Move", "scaleStatus", "measScaleRead"]
+
+class ProtoBench(object):
+    """!Run protocol micro-benchmarks
+    """
+    def __init__(self, scenarioNames=None, nExchange=1000, nWarmup=10, loopback=True, virtual=False):
+        """!Construct a ProtoBench
+
+        @param[in] scenarioNames  names of scenarios to run (see ScenarioDict); if None run all
+        @param[in] nExchange  number of timed exchanges per scenario
+        @param[in] nWarmup  number of untimed exchanges to run first
+        @param[in] loopback  connect each device to its fake controller in-process? If False use TCP
+        @param[in] virtual  run device and fake controller timing on an auto-advanced virtual clock?
+        """
+        if scenarioNames is None:
+            scenarioNames = ScenarioNameList
+        unknownNames = set(scenarioNames) - set(ScenarioDict)
+        if unknownNames:
+            raise RuntimeError("Unknown scenarios: %s; must be in %s" % (
+                ", ".join(sorted(unknownNames)), ", ".join(ScenarioNameList)))
+        self.scenarioNames = list(scenarioNames)
+        self.nExchange = int(nExchange)
+        self.nWarmup = int(nWarmup)
+        self.loopback = bool(loopback)
+        self.virtual = bool(virtual)
+        self.resultDict = {}
+
+    @property
+    def config(self):
+        return dict(
+            scenarios = self.scenarioNames,
+            nExchange = self.nExchange,
+            nWarmup = self.nWarmup,
+            loopback = self.loopback,
+            virtual = self.virtual,
+        )
+
+    def run(self):
+        """!Run each scenario in turn
+
+        @return a Deferred that fires with a dict of scenario name: results (see runScenario)
+        """
+        self.doneDeferred = Deferred()
+        self._runNext()
+        return self.doneDeferred
+
+    def _runNext(self, ignored=None):
+        nameList = [name for name in self.scenarioNames if name not in self.resultDict]
+        if not nameList:
+            self.doneDeferred.callback(self.resultDict)
+            return
+        d = self.runScenario(ScenarioDict[nameList[0]])
+        d.addCallbacks(self._runNext, self.doneDeferred.errback)
+
+    def runScenario(self, scenario):
+        """!Run one scenario
+
+        @param[in] scenario  a ProtoScenario
+        @return a Deferred that fires when done; the results are put in self.resultDict[scenario.name]
+            as a dict containing:
+            - help: description of scenario
+            - nExchange: number of timed exchanges
+            - nFailed: number of exchanges that failed
+            - nMsg: number of device messages in the timed exchanges
+            - roundTrip: statistics of round trip time (sec) of successful exchanges
+            - exchangeRate: exchanges per second
+            - msgRate: device messages per second
+            - cpuPerMsg: CPU time per device message (sec)
+        """
+        doneDeferred = Deferred()
+        clock = setClock(VirtualClock() if self.virtual else None)
+        wrapper = scenario.wrapperClass(name=scenario.name, loopback=self.loopback)
+        msgCounter = [0]
+        def countMsg(eventDict):
+            if eventDict.get("ph") == "X":
+                msgCounter[0] += 1
+        roundTripList = []
+        failedList = []
+        startList = [] # (wall time, cpu time) when timing started
+
+        def finish(ignored=None):
+            cmdTracer.removeSink(countMsg)
+            if isinstance(clock, VirtualClock):
+                clock.stopAutoAdvance()
+            setClock(None)
+            elapsed = time.time() - startList[0][0]
+            cpuTime = _cpuTime() - startList[0][1]
+            nMsg = msgCounter[0]
+            self.resultDict[scenario.name] = dict(
+                help = scenario.help,
+                nExchange = self.nExchange,
+                nFailed = len(failedList),
+                nMsg = nMsg,
+                roundTrip = summarize(roundTripList),
+                exchangeRate = self.nExchange / elapsed if elapsed > 0 else None,
+                msgRate = nMsg / elapsed if elapsed > 0 else None,
+                cpuPerMsg = cpuTime / nMsg if nMsg else None,
+            )
+            d = wrapper.close()
+            d.addCallbacks(doneDeferred.callback, doneDeferred.errback)
+
+        def startExchange(ind):
+            if ind == self.nWarmup:
+                cmdTracer.addSink(countMsg)
+                startList.append((time.time(), _cpuTime()))
+            elif ind >= self.nWarmup + self.nExchange:
+                finish()
+                return
+            sendTime = time.time()
+            cmd = scenario.exchangeFunc(wrapper.device, ind)
+            def exchangeDone(cmd):
+                if not cmd.isDone:
+                    return
+                if ind >= self.nWarmup:
+                    if cmd.didFail:
+                        failedList.append(cmd.textMsg)
+                    else:
+                        roundTripList.append(time.time() - sendTime)
+                # start the next exchange from the reactor, rather than from within this callback
+                reactor.callLater(0, startExchange, ind + 1)
+            cmd.addCallback(exchangeDone)
+
+        def startScenario(ignored):
+            if isinstance(clock, VirtualClock):
+                clock.addBusyCheck(functools.partial(deviceIsBusy, wrapper.device))
+                clock.startAutoAdvance()
+            startExchange(0)
+
+        wrapper.readyDeferred.addCallbacks(startScenario, doneDeferred.errback)
+        return doneDeferred
+
+
+def compareToBaseline(resultDict, baselineDict, tolerance=0.2):
+    """!Compare protocol benchmark results to a baseline
+
+    @param[in] resultDict  results of ProtoBench.run
+    @param[in] baselineDict  results of an earlier run (e.g. the "results" of a file read by readResults)
+    @param[in] tolerance  fractional worsening beyond which a metric is reported as a regression
+    @return a dict of scenario name: dict of metric name: dict of value, baseline, ratio (value/baseline)
+        and isRegression; only scenarios and metrics present in both are compared.
+        Metrics are roundTripP50, roundTripP99, cpuPerMsg (worse if larger) and msgRate (worse if smaller).
+    """
+    def getMetrics(scenarioResult):
+        return dict(
+            roundTripP50 = scenarioResult["roundTrip"]["p50"],
+            roundTripP99 = scenarioResult["roundTrip"]["p99"],
+            cpuPerMsg = scenarioResult["cpuPerMsg"],
+            msgRate = scenarioResult["msgRate"],
+        )
+
+    comparisonDict = {}
+    for name in sorted(set(resultDict) & set(baselineDict)):
+        metricDict = getMetrics(resultDict[name])
+        baselineMetricDict = getMetrics(baselineDict[name])
+        scenarioComparison = {}
+        for metricName, value in metricDict.items():
+            baseline = baselineMetricDict[metricName]
+            if not value or not baseline:
+                continue
+            ratio = value / baseline
+            if metricName == "msgRate":
+                isRegression = ratio < 1. / (1. + tolerance)
+            else:
+                isRegression = ratio > 1. + tolerance
+            scenarioComparison[metricName] = dict(value=value, baseline=baseline, ratio=ratio,
+                isRegression=isRegression)
+        comparisonDict[name] = scenarioComparison
+    return comparisonDict
@@ -0,0 +1,109 @@
+from __future__ import division, absolute_import
+"""End-to-end slew and acquisition benchmark
+
+Issues a sequence of target commands to an emulated TCC, one at a time, and reports for
+each: command-to-done latency, the device commands it issued (RAD/HAD, DECD, MP, INPS on
+the TCS and the lamp command on M2), the status polls that ran while it was in progress,
+and where the time went (see TraceCollector.describeCmd).
+"""
+from twisted.internet.defer import Deferred
+
+from tcc.utils.clock import getClock
+from .benchUtils import BenchEmulator, TraceCollector, summarize
+
+__all__ = ["SlewBench", "DefaultTargetList"]
+
+# (ra, dec, use windscreen?) in degrees; a mix of short and long slews, with and without the screen
+DefaultTargetList = [
+    (10., -30., False),
+    (12., -31., False),
+    (95., -60., False),
+    (95., -58., True),
+    (200., 5., False),
+    (201., 5.5, True),
+    (330., -80., False),
+    (10., -30., True),
+]
+
+class SlewBench(object):
+    """!Run a sequence of slews against an emulated TCC
+    """
+    def __init__(self, targetList=None, nRepeat=1, settleTime=1., emulator=None):
+        """!Construct a SlewBench
+
+        @param[in] targetList  list of (ra, dec, doScreen); if None use DefaultTargetList
+        @param[in] nRepeat  number of times to run through the target list
+        @param[in] settleTime  pause between the end of one slew and the start of the next (sec)
+        @param[in] emulator  a BenchEmulator; if None then one is constructed with default settings
+        """
+        self.targetList = DefaultTargetList if targetList is None else targetList
+        self.nRepeat = int(nRepeat)
+        self.settleTime = float(settleTime)
+        self.emulator = BenchEmulator() if emulator is None else emulator
+        self.traceCollector = TraceCollector()
+        self.client = None
+        self.clientCmdList = []
+
+    @property
+    def config(self):
+        return dict(
+            targetList = self.targetList,
+            nRepeat = self.nRepeat,
+            settleTime = self.settleTime,
+        )
+
+    def run(self):
+        """!Run the benchmark
+
+        @return a Deferred that fires with the results dict (see getResults)
+        """
+        self.doneDeferred = Deferred()
+        self.cmdStrList = [self.formatTarget(*target) for target in self.targetList] * self.nRepeat
+        d = self.emulator.start()
+        d.addCallback(lambda emulator: emulator.addClient("slewBench"))
+        d.addCallback(self._startSlews)
+        d.addErrback(self.doneDeferred.errback)
+        return self.doneDeferred
+
+    @staticmethod
+    def formatTarget(ra, dec, doScreen):
+        return "target %.4f, %.4f icrs%s" % (ra, dec, " /screen" if doScreen else "")
+
+    def _startSlews(self, client):
+        self.client = client
+        self.traceCollector.start()
+        # let the devices report status at least once before the first slew
+        getClock().callLater(self.settleTime, self._nextSlew)
+
+    def _nextSlew(self):
+        if len(self.clientCmdList) >= len(self.cmdStrList):
+            self.traceCollector.stop()
+            self.doneDeferred.callback(self.getResults())
+            return
+        clientCmd = self.client.sendCmd(self.cmdStrList[len(self.clientCmdList)])
+        self.clientCmdList.append(clientCmd)
+        clientCmd.doneDeferred.addCallback(lambda ignored: getClock().callLater(self.settleTime, self._nextSlew))
+
+    def getResults(self):
+        """!Return the results as a dict containing:
+        - slews: a list of one dict per slew: cmdStr, didFail, textMsg and the items of TraceCollector.describeCmd
+        - summary: statistics over all successful slews of latency, dispatchDelay, motionWait,
+            queueWait, and the number of device commands and status poll commands per slew
+        - nFailed: number of slews that failed
+        """
+        slewList = []
+        for clientCmd in self.clientCmdList:
+            slewDict = dict(cmdStr=clientCmd.cmdStr, didFail=clientCmd.didFail, textMsg=clientCmd.textMsg)
+            slewDict.update(self.traceCollector.describeCmd(clientCmd))
+            slewList.append(slewDict)
+        goodList = [slewDict for slewDict in slewList if not slewDict["didFail"]]
+        summary = dict(
+            (name, summarize([slewDict[name] for slewDict in goodList]))
+            for name in ("latency", "dispatchDelay", "motionWait", "queueWait"))
+        summary["devCmds"] = summarize([sum(slewDict["devCmds"].values()) for slewDict in goodList])
+        summary["pollCmds"] = summarize([sum(slewDict["pollCmds"].values()) for slewDict in goodList])
+        return dict(
+            slews = slewList,
+            summary = summary,
+            nFailed = len(slewList) - len(goodList),
+        )
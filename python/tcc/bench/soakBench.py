@@ -0,0 +1,233 @@
+from __future__ import division, absolute_import
+"""Soak test: run the emulated TCC under load for a long time and look for growth
+
+Runs a LoadBench with a realistic command mix (status queries, guide offsets and small
+moves from a few clients) for hours of real or virtual time, and samples at regular intervals:
+- rss: resident set size of this process (kB)
+- gcObjects: number of objects tracked by the garbage collector, and a census of them by type
+- delayedCalls: pending reactor delayed calls (plus those of a virtual clock)
+- reactorLag: real time from scheduling an immediate reactor call to it running (sec)
+
+The emulator, devices and actor all run in this process, so growth in any of these
+is growth in the TCC. A metric is reported as growing without bound if its mean over the
+last third of the samples exceeds its mean over the middle third by more than a fractional
+tolerance and a minimum absolute increase (the first third is a warmup: caches filling,
+histories reaching their maximum length); a bounded metric levels off and passes.
+"""
+import gc
+import resource
+import sys
+import time
+
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred
+
+from tcc.utils.clock import VirtualClock, getClock
+from .benchUtils import BenchEmulator, summarize
+from .loadBench import LoadBench
+
+__all__ = ["SoakBench", "DefaultSoakMix", "DefaultGrowthLimits", "findGrowth", "getRSS"]
+
+# command string: relative weight; a night of guiding with occasional status queries and moves
+DefaultSoakMix = {
+    "guideoffset 0.0000300, -0.0000300, 0.0, 2.0, 1.0": 2,
+    "guideoffset -0.0000300, 0.0000300, 0.0, -2.0, 1.0": 2,
+    "show status": 1,
+    "show time": 1,
+    "ping": 1,
+    "device status": 0.2,
+    "offset arc 0.0001, 0.0": 0.1,
+    "offset arc -0.0001, 0.0": 0.1,
+}
+
+# metric name: (fractional tolerance, minimum increase) beyond which growth is reported;
+# "census" applies to the count of each object type
+DefaultGrowthLimits = dict(
+    rss = (0.1, 5000), # kB
+    gcObjects = (0.1, 2000),
+    census = (0.2, 500),
+    delayedCalls = (0.5, 10),
+    reactorLag = (1.0, 0.05), # sec
+)
+
+def getRSS():
+    """!Return the resident set size of this process (kB)
+
+    Read from /proc where available; otherwise the peak resident set size is returned.
+    """
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except (IOError, ValueError, IndexError):
+        pass
+    maxRSS = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kB elsewhere
+    return maxRSS // 1024 if sys.platform == "darwin" else maxRSS
+
+def findGrowth(valueList, tolerance, minIncrease):
+    """!Return (midMean, lateMean) if a series grows without bound, else None
+
+    @param[in] valueList  sampled values, in time order
+    @param[in] tolerance  fractional increase of the late mean over the middle mean that counts as growth
+    @param[in] minIncrease  minimum absolute increase that counts as growth
+    """
+    nThird = len(valueList) // 3
+    if nThird < 1:
+        return None
+    midMean = sum(valueList[nThird:2 * nThird]) / nThird
+    lateList = valueList[2 * nThird:]
+    lateMean = sum(lateList) / len(lateList)
+    increase = lateMean - midMean
+    if increase > minIncrease and increase > tolerance * abs(midMean):
+        return (midMean, lateMean)
+    return None
+
+class SoakBench(object):
+    """!Run an emulated TCC under load and track resource use
+    """
+    def __init__(self, duration=4 * 3600., sampleInterval=60., nClient=3, rate=0.5, cmdMix=None,
+        minCensusCount=100, growthLimits=None, seed=0, emulator=None):
+        """!Construct a SoakBench
+
+        @param[in] duration  time over which commands are sent (sec, of the emulator's clock)
+        @param[in] sampleInterval  time between samples (sec, of the emulator's clock)
+        @param[in] nClient  number of user connections
+        @param[in] rate  mean number of commands per second, summed over all clients
+        @param[in] cmdMix  dict of command string: relative weight; if None use DefaultSoakMix
+        @param[in] minCensusCount  object types with fewer instances than this are left out of each census
+        @param[in] growthLimits  dict of metric name: (tolerance, minimum increase); missing metrics
+            are taken from DefaultGrowthLimits
+        @param[in] seed  random number seed for the load
+        @param[in] emulator  a BenchEmulator; if None then one is constructed with default settings
+        """
+        self.duration = float(duration)
+        self.sampleInterval = float(sampleInterval)
+        self.minCensusCount = int(minCensusCount)
+        self.growthLimits = DefaultGrowthLimits.copy()
+        if growthLimits:
+            self.growthLimits.update(growthLimits)
+        self.emulator = BenchEmulator() if emulator is None else emulator
+        self.loadBench = LoadBench(
+            nClient = nClient,
+            rate = rate,
+            duration = duration,
+            cmdMix = DefaultSoakMix if cmdMix is None else cmdMix,
+            seed = seed,
+            emulator = self.emulator,
+        )
+        self.sampleList = []
+        self._sampleTimer = None
+        self.startTime = None
+
+    @property
+    def config(self):
+        config = self.loadBench.config
+        config.update(
+            sampleInterval = self.sampleInterval,
+            minCensusCount = self.minCensusCount,
+            growthLimits = self.growthLimits,
+        )
+        return config
+
+    def run(self):
+        """!Run the soak test
+
+        @return a Deferred that fires with the results dict (see getResults)
+        """
+        self.doneDeferred = Deferred()
+        loadDeferred = self.loadBench.run()
+        self.emulator.start().addCallback(self._startSampling)
+        loadDeferred.addCallbacks(self._loadDone, self.doneDeferred.errback)
+        return self.doneDeferred
+
+    def _startSampling(self, ignored=None):
+        self.startTime = getClock().time()
+        self._sample()
+
+    def _sample(self):
+        """Take a sample and schedule the next one
+
+        Reactor lag is measured first, so the sample is recorded when the probe call runs.
+        """
+        probeTime = time.time()
+        reactor.callLater(0, self._recordSample, probeTime)
+        self._sampleTimer = getClock().callLater(self.sampleInterval, self._sample)
+
+    def _recordSample(self, probeTime):
+        reactorLag = time.time() - probeTime
+        gc.collect()
+        census = {}
+        objList = gc.get_objects()
+        for obj in objList:
+            typeName = type(obj).__name__
+            census[typeName] = census.get(typeName, 0) + 1
+        nObjects = len(objList)
+        del objList
+        delayedCalls = len(reactor.getDelayedCalls())
+        clock = getClock()
+        if isinstance(clock, VirtualClock):
+            delayedCalls += len(clock.getDelayedCalls())
+        self.sampleList.append(dict(
+            time = getClock().time() - self.startTime,
+            rss = getRSS(),
+            gcObjects = nObjects,
+            delayedCalls = delayedCalls,
+            reactorLag = reactorLag,
+            nSent = len(self.loadBench.clientCmdList),
+            census = dict((typeName, count) for typeName, count in census.items()
+                if count >= self.minCensusCount),
+        ))
+
+    def _loadDone(self, loadResults):
+        if self._sampleTimer is not None and self._sampleTimer.active():
+            self._sampleTimer.cancel()
+        # take a final sample once the probe call has run
+        probeTime = time.time()
+        def finish():
+            self._recordSample(probeTime)
+            self.doneDeferred.callback(self.getResults(loadResults))
+        reactor.callLater(0, finish)
+
+    def findAllGrowth(self):
+        """!Return a list of metrics that grow without bound
+
+        @return a list of dicts of metric, midMean and lateMean; census metrics are named "census.<type>"
+        """
+        growthList = []
+        for metric in ("rss", "gcObjects", "delayedCalls", "reactorLag"):
+            growth = findGrowth([sample[metric] for sample in self.sampleList], *self.growthLimits[metric])
+            if growth:
+                growthList.append(dict(metric=metric, midMean=growth[0], lateMean=growth[1]))
+        typeNameSet = set()
+        for sample in self.sampleList:
+            typeNameSet.update(sample["census"])
+        for typeName in sorted(typeNameSet):
+            growth = findGrowth([sample["census"].get(typeName, 0) for sample in self.sampleList],
+                *self.growthLimits["census"])
+            if growth:
+                growthList.append(dict(metric="census.%s" % (typeName,), midMean=growth[0], lateMean=growth[1]))
+        return growthList
+
+    def getResults(self, loadResults):
+        """!Return the results as a dict containing:
+        - samples: the list of samples: time (sec since the start), rss, gcObjects, delayedCalls,
+            reactorLag, nSent (commands sent so far) and census (dict of type name: count)
+        - summary: statistics of rss, gcObjects, delayedCalls and reactorLag over all samples
+        - growth: list of metrics that grew without bound (see findAllGrowth)
+        - failed: True if any metric grew without bound, or there were too few samples to tell
+        - load: results of the load (see LoadBench.getResults), without the per-client details
+        """
+        growthList = self.findAllGrowth()
+        summary = dict((metric, summarize([sample[metric] for sample in self.sampleList]))
+            for metric in ("rss", "gcObjects", "delayedCalls", "reactorLag"))
+        loadResults = dict(loadResults)
+        loadResults.pop("clients", None)
+        return dict(
+            samples = self.sampleList,
+            summary = summary,
+            growth = growthList,
+            failed = bool(growthList) or len(self.sampleList) < 3,
+            load = loadResults,
+        )
@@ -8,6 +8,7 @@ from .target import *
 from .setFocus import *
 from .showFocus import *
 from .setScaleFactor import *
+from .syncScaleMove import *
 from .showScaleFactor import *
 from .offset import *
 from .device import *
@@ -21,4 +22,6 @@ from .guiderot import *
 from .help import *
 from .guideoffset import *
 from .lamp import *
-from .showTime import *
\ No newline at end of file
+from .showTime import *
+from .trace import *
+from .verbosity import *
@@ -1,4 +1,6 @@
 from __future__ import division, absolute_import
+import collections
+
 import numpy
 
 __all__ = ["collimate"]
@@ -16,6 +18,10 @@ class CollimationModel(object):
         self.minTrans = 10. # microns
         self.minTilt = 0.5 # arcseconds
         self.minFocus = 10 # microns
+        self.focusPerDegC = 70. # microns of M2 focus per degree C of truss temperature
+        self.doThermalFocus = True # fold the thermal focus term into collimation moves?
+        self.trussTempWindow = 600. # seconds of truss temperature history to average
+        self.trussTempHistory = collections.deque() # (time, truss temp) samples, oldest first
 
         # values used December Eng Run 2016 and previously
         # transX = 200.
@@ -76,13 +82,38 @@ class CollimationModel(object):
         self.baseOrientation = numpy.asarray([tiltX, tiltY, transX, transY])
         self.baseFocus = None
         self.baseTrussTemp = None
+        self.appliedFocus = None # thermal focus model value when focus was last corrected
+
+    def addTrussTemp(self, trussTemp, pySec):
+        """Add a truss temperature sample to the history, discarding samples older than trussTempWindow
+
+        @param[in] trussTemp  truss temperature (deg C); ignored if None
+        @param[in] pySec  time of the sample (sec)
+        """
+        if trussTemp is None:
+            return
+        self.trussTempHistory.append((pySec, trussTemp))
+        while self.trussTempHistory[0][0] < pySec - self.trussTempWindow:
+            self.trussTempHistory.popleft()
+
+    @property
+    def smoothTrussTemp(self):
+        """Mean truss temperature over the history (deg C), or None if there is no history
+        """
+        if not self.trussTempHistory:
+            return None
+        return numpy.mean([trussTemp for pySec, trussTemp in self.trussTempHistory])
+
+    @property
+    def hasFocusBaseline(self):
+        return None not in [self.baseFocus, self.baseTrussTemp]
 
     def getFocus(self, trussTemp):
         """Return the desired focus value from trussTemp
 
         @raise runtime error if no focus baseline has been set
         """
-        if None in [self.baseFocus, self.baseTrussTemp]:
+        if not self.hasFocusBaseline:
             raise RuntimeError("No baseline set for focus-collimation model")
         # temperature decreases, dist between m2 and m1 shrinks,
         # correct by moving them apart.
@@ -91,11 +122,42 @@ class CollimationModel(object):
         # focal length is longer than self.baseFocus
         # command m2 to a higher focus value than self.baseFocus
         # focus model is 70 microns/degC
-        return self.baseFocus + dtemp*70.
+        return self.baseFocus + dtemp*self.focusPerDegC
 
     def setFocus(self, focusVal, trussTemp):
+        """Set the focus baseline: the focus that is correct at a given truss temperature
+
+        Thermal corrections are measured from this baseline, so call it whenever focus is set by hand.
+        """
         self.baseFocus = focusVal
         self.baseTrussTemp = trussTemp
+        self.appliedFocus = focusVal
+
+    def getThermalFocusOffset(self, currFocus, doFlex):
+        """Return the focus offset (microns) to apply with a collimation update, or None to leave focus alone
+
+        The offset is the thermal focus change since the last correction. It is to be applied
+        as a relative move, so focus offsets made since then, or still pending in the M2 device
+        (e.g. by the guider), are kept. Focus is only moved on its own if the change exceeds
+        minFocus (a hysteresis band, so M2 does not chase noise in the temperature); if the mirror
+        is moving anyway for flexure, any change is applied.
+
+        @param[in] currFocus  current M2 focus (microns); sets the baseline if there is none yet
+        @param[in] doFlex  is a flexure move going to be made?
+        """
+        trussTemp = self.smoothTrussTemp
+        if not self.doThermalFocus or trussTemp is None or currFocus is None:
+            return None
+        if not self.hasFocusBaseline:
+            # start tracking from the current focus
+            self.setFocus(currFocus, trussTemp)
+            return None
+        modelFocus = self.getFocus(trussTemp)
+        dFocus = modelFocus - self.appliedFocus
+        if abs(dFocus) <= self.minFocus and not (doFlex and dFocus):
+            return None
+        self.appliedFocus = modelFocus
+        return dFocus
 
 
     def getOrientation(self, ha, dec, temp=None):
@@ -166,7 +228,8 @@ class CollimationModel(object):
         tiltX =  -1*(29.03*sinDec + 9.86*(cosDec-1.) + -0.46*sinHA + -10.21*(cosHA-1.))
         tiltY = -13.56*sinDec + -4.28*(cosDec-1) + 4.84*sinHA + -1.09*(cosHA-1.)
 
-        flexTerms = self.baseOrientation - numpy.asarray([tiltX, tiltY, transX, transY])
+        # transpose so ha and dec may be arrays (then each flex term is an array)
+        flexTerms = (self.baseOrientation - numpy.asarray([tiltX, tiltY, transX, transY]).T).T
         focus = None if temp is None else self.getFocus(temp)
         # multiply by -1 (orentation to move to to remove the flex)
         return [focus] + list(flexTerms)
@@ -187,5 +250,11 @@ def collimate(tccActor, userCmd):
         tccActor.updateCollimation(userCmd)
     elif param == "force":
         tccActor.updateCollimation(userCmd, force=True)
+    elif param == "startFocus":
+        tccActor.collimationModel.doThermalFocus = True
+        userCmd.setState(userCmd.Done)
+    elif param == "stopFocus":
+        tccActor.collimationModel.doThermalFocus = False
+        userCmd.setState(userCmd.Done)
 
 
@@ -12,11 +12,9 @@ def guideoffset(tccActor, userCmd):
     parsedCmd = userCmd.parsedCmd
     offRA, offDec, offRot, offFocus, multScale = parsedCmd.paramDict["offsets"].valueList
     cmdList = []
-    if offRA or offDec:
-        # ra dec offset wanted
-        cmdList.append(tccActor.tcsDev.slewOffset(offRA, offDec))
-    if offRot:
-        cmdList.append(tccActor.tcsDev.rotOffset(offRot))
+    if offRA or offDec or offRot:
+        # ra dec and/or rotator offset wanted; applied together
+        cmdList.append(tccActor.tcsDev.guideOffset(offRA, offDec, offRot))
     if multScale != 1:
         # move scale, and update the focus offset
         absPosMM = tccActor.scaleMult2mm(multScale)
@@ -21,6 +21,12 @@ def setFocus(tccActor, userCmd):
             if focusCmd.didFail:
                 userCmd.setState(userCmd.Failed, focusCmd.textMsg)
                 setDone=False
+            else:
+                # focus set by hand is correct at the current temperature;
+                # thermal focus corrections are measured from here
+                trussTemp = tccActor.collimationModel.smoothTrussTemp
+                if trussTemp is not None:
+                    tccActor.collimationModel.setFocus(tccActor.secDev.status.orientation[0], trussTemp)
             showFocus(tccActor, userCmd, setDone=setDone)
     valueList = userCmd.parsedCmd.paramDict["focus"].valueList[0].valueList
     if valueList is not None:
@@ -3,6 +3,7 @@ from __future__ import division, absolute_import
 from twistedActor import expandCommand
 
 from .showScaleFactor import showScaleFactor
+from .syncScaleMove import SyncScaleMove
 
 __all__ = ["setScaleFactor"]
 
@@ -48,17 +49,18 @@ def setScaleFactor(tccActor, userCmd):
             # scale factor out of range:
             userCmd.setState(userCmd.Failed, "Desired ScaleFactor out of range: %.6f"%scaleFac)
             return
-        # check if M2 is moving, if not move that the desired amount
-        if tccActor.secDev.isBusy:
-            userCmd.setState(userCmd.Failed, "Cannot set scale, M2 is moving.")
-            return
-
-        focusOffset = (absPosMM - tccActor.scaleDev.motorPos) * UM_PER_MM * tccActor.SCALE_RATIO * -1
-        focusCmd = tccActor.secDev.focus(focusOffset, offset=True)
-        scaleCmd = tccActor.scaleDev.move(absPosMM)
+        # if M2 is moving, the focus offset is merged into its next move (see M2Device.move)
         userCmd.linkCommands([motionCmd, showScaleCmd])
         motionCmd.addCallback(showScaleWhenDone)
-        motionCmd.linkCommands([scaleCmd, focusCmd])
+        syncQual = userCmd.parsedCmd.qualDict['sync']
+        if syncQual.boolValue:
+            # step the scaling ring and M2 focus together
+            SyncScaleMove(tccActor, absPosMM, maxFocusErr=syncQual.valueList[0], userCmd=motionCmd).start()
+        else:
+            focusOffset = (absPosMM - tccActor.scaleDev.motorPos) * UM_PER_MM * tccActor.SCALE_RATIO * -1
+            focusCmd = tccActor.secDev.focus(focusOffset, offset=True)
+            scaleCmd = tccActor.scaleDev.move(absPosMM)
+            motionCmd.linkCommands([scaleCmd, focusCmd])
 
 
     else:
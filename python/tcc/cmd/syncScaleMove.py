@@ -0,0 +1,175 @@
+from __future__ import division, absolute_import
+"""Coordinated scaling ring and M2 focus motion
+
+A scale change moves the scaling ring (at 0.1 mm/sec) and M2 focus (at its own speed)
+to keep the image in focus. Moved in parallel in one go, the two drift apart during
+the move and the image is defocused until both finish. A SyncScaleMove instead splits
+the ring move into steps, each small enough that the focus error cannot exceed
+a given bound, and moves M2 by the matching focus increment during each step.
+The streamed ring position is watched during each step, and if the ring runs far enough
+from its step target that the focus error would exceed the bound, M2 focus is corrected
+to match the measured position.
+"""
+import math
+
+import numpy
+
+from twistedActor import expandCommand
+
+__all__ = ["SyncScaleMove", "DefMaxFocusErr"]
+
+UM_PER_MM = 1000.
+DefMaxFocusErr = 20. # default bound on focus error during a coordinated move (um)
+MinTrimFocus = 1. # minimum focus error left at the end of a move that is trimmed (um)
+
+class SyncScaleMove(object):
+    """!Move the scaling ring in steps, with matched M2 focus increments
+    """
+    def __init__(self, tccActor, position, maxFocusErr=DefMaxFocusErr, userCmd=None):
+        """!Construct a SyncScaleMove
+
+        @param[in] tccActor  tcc actor
+        @param[in] position  desired scaling ring position (mm)
+        @param[in] maxFocusErr  maximum focus error during the move (um); sets the step size
+        @param[in] userCmd  a twistedActor BaseCommand; set done when the move is done
+        """
+        if maxFocusErr <= 0:
+            raise RuntimeError("maxFocusErr=%s; must be positive" % (maxFocusErr,))
+        self.tccActor = tccActor
+        self.scaleDev = tccActor.scaleDev
+        self.secDev = tccActor.secDev
+        self.userCmd = expandCommand(userCmd)
+        self.targetPos = float(position)
+        self.maxFocusErr = float(maxFocusErr)
+        # increasing the ring position decreases focus
+        self.focusPerMM = -UM_PER_MM * tccActor.SCALE_RATIO
+        self.startPos = None
+        self.focusPos = None # ring position that the current M2 focus is matched to
+        self.stepPosList = []
+        self.stepInd = 0
+        self.stepFocus = 0. # M2 focus increment of the current step, including corrections (um)
+        self.corrCmd = None # M2 focus correction made during the current step
+        self.worstFocusErr = 0. # largest possible focus error seen so far (um)
+
+    @property
+    def nSteps(self):
+        return len(self.stepPosList)
+
+    def start(self):
+        """!Start the move
+
+        @return userCmd
+        """
+        startPos = self.scaleDev.motorPos
+        if startPos is None or numpy.isnan(startPos):
+            self.userCmd.setState(self.userCmd.Failed, "Cannot sync scale move, scaling ring position unknown")
+            return self.userCmd
+        if self.scaleDev.isMoving:
+            self.userCmd.setState(self.userCmd.Failed, "Cannot move, device is busy moving")
+            return self.userCmd
+        minPos, maxPos = self.scaleDev.status.moveRange
+        if not minPos <= self.targetPos <= maxPos:
+            self.userCmd.setState(self.userCmd.Failed, "Move %.6f not in range [%.4f, %.4f]" % (self.targetPos, minPos, maxPos))
+            return self.userCmd
+        self.startPos = self.focusPos = startPos
+        maxStep = self.maxFocusErr / abs(self.focusPerMM)
+        nSteps = max(1, int(math.ceil(abs(self.targetPos - startPos) / maxStep)))
+        self.stepPosList = list(numpy.linspace(startPos, self.targetPos, nSteps + 1)[1:])
+        self.tccActor.writeToUsers("i", "text=\"Sync scale move from %.4f to %.4f mm in %i steps\"" % (
+            startPos, self.targetPos, nSteps), cmd=self.userCmd)
+        self.scaleDev.positionTap.addSubscriber(self._positionCallback)
+        self._startStep()
+        return self.userCmd
+
+    def _startStep(self):
+        """Start the ring move and matched M2 focus offset for the next step
+        """
+        stepPos = self.stepPosList[self.stepInd]
+        # match focus to where the ring will be, so ring position error in earlier steps does not accumulate
+        self.stepFocus = (stepPos - self.focusPos) * self.focusPerMM
+        scaleCmd = self.scaleDev.move(stepPos)
+        focusCmd = self.secDev.focus(self.stepFocus, offset=True)
+        stepCmd = expandCommand()
+        stepCmd.linkCommands([scaleCmd, focusCmd])
+        stepCmd.addCallback(self._stepCallback)
+
+    def _positionCallback(self, scaleStatus):
+        """Track the worst-case focus error from a streamed ring position, and correct focus if needed
+
+        M2 is somewhere between the start and end of its step, so the error is bounded by
+        the error computed at both ends. While the ring is between the start and target of
+        the step the error once M2 finishes is at most the step's focus increment; if it is
+        beyond the bound (the ring overshot or ran away) M2 focus is offset to match the
+        measured position, one correction at a time.
+        """
+        pos = scaleStatus.position
+        if pos is None or numpy.isnan(pos):
+            return
+        errBefore = (pos - self.focusPos) * self.focusPerMM
+        errAfter = errBefore - self.stepFocus
+        self.worstFocusErr = max(self.worstFocusErr, abs(errBefore), abs(errAfter))
+        if abs(errAfter) > self.maxFocusErr + MinTrimFocus and (self.corrCmd is None or self.corrCmd.isDone):
+            self.tccActor.writeToUsers("w", "text=\"Scaling ring at %.4f mm is off its step target; correcting focus by %.1f um\"" % (
+                pos, errAfter), cmd=self.userCmd)
+            self.stepFocus += errAfter
+            self.corrCmd = self.secDev.focus(errAfter, offset=True)
+
+    def _stepCallback(self, stepCmd):
+        if not stepCmd.isDone:
+            return
+        if stepCmd.didFail:
+            self._finish(failMsg="Sync scale move failed at step %i of %i: %s" % (
+                self.stepInd + 1, self.nSteps, stepCmd.textMsg))
+            return
+        # the ring position M2 focus now matches: the step target, unless focus was corrected during the step
+        self.focusPos += self.stepFocus / self.focusPerMM
+        self.stepInd += 1
+        if self.corrCmd is not None and not self.corrCmd.isDone:
+            self.corrCmd.addCallback(self._nextStep)
+            return
+        self._nextStep()
+
+    def _nextStep(self, corrCmd=None):
+        """Start the next step, or trim focus if all steps are done
+
+        @param[in] corrCmd  focus correction command that was waited for, if any
+        """
+        if corrCmd is not None:
+            if not corrCmd.isDone:
+                return
+            if corrCmd.didFail:
+                self._finish(failMsg="Sync scale focus correction failed: %s" % (corrCmd.textMsg,))
+                return
+        if self.stepInd < self.nSteps:
+            self._startStep()
+            return
+        # trim focus to the ring's final position, read fresh: the last streamed position may lag
+        statusCmd = self.scaleDev.getStatus()
+        statusCmd.addCallback(self._trimFocus)
+
+    def _trimFocus(self, statusCmd):
+        if not statusCmd.isDone:
+            return
+        finalPos = self.scaleDev.motorPos
+        if statusCmd.didFail or finalPos is None or numpy.isnan(finalPos):
+            self._finish()
+            return
+        trimFocus = (finalPos - self.focusPos) * self.focusPerMM
+        if abs(trimFocus) < MinTrimFocus:
+            self._finish()
+            return
+        self.focusPos = finalPos
+        trimCmd = self.secDev.focus(trimFocus, offset=True)
+        def trimCallback(trimCmd):
+            if trimCmd.isDone:
+                self._finish(failMsg="Sync scale focus trim failed: %s" % (trimCmd.textMsg,) if trimCmd.didFail else None)
+        trimCmd.addCallback(trimCallback)
+
+    def _finish(self, failMsg=None):
+        self.scaleDev.positionTap.removeSubscriber(self._positionCallback)
+        self.tccActor.writeToUsers("i", "scaleSyncFocusErr=%.1f, %.1f" % (self.worstFocusErr, self.maxFocusErr),
+            cmd=self.userCmd)
+        if failMsg is not None:
+            self.userCmd.setState(self.userCmd.Failed, failMsg)
+        else:
+            self.userCmd.setState(self.userCmd.Done)
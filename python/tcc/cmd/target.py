@@ -1,13 +1,96 @@
 from __future__ import division, absolute_import
 
+import numpy
+
 from twistedActor import CommandError, expandCommand
 
+from tcc.utils.astrometry import azAltFromHADec, airmassFromAlt, lastFromPySec, pySecFromTAI, taiFromPySec
+from tcc.utils.clock import getClock
+from tcc.utils.ffs import get_ffs_altitudes
+
 
-__all__ = ["target"]
+__all__ = ["target", "checkTargets"]
 
 # use track ra, dec icrs coords
 # must we provide an equinox?
 
+# limit flags reported by checkTargets
+LimitOK = "OK"
+LimitHorizon = "Horizon" # target is below the horizon
+LimitScreen = "Screen" # target is too low for the flat field screen; target would move it to telescope_alt_limit
+
+def checkTargets(raArr, decArr, pySecArr, doHA, doScreen, collimationModel):
+    """!Check the feasibility of many targets at many times, without moving the telescope
+
+    Every target is evaluated at every time.
+
+    @param[in] raArr  right ascension, or hour angle if doHA, of each target (deg)
+    @param[in] decArr  declination of each target (deg)
+    @param[in] pySecArr  times at which to evaluate the targets (POSIX time, sec)
+    @param[in] doHA  if True, raArr is hour angle
+    @param[in] doScreen  if True, compute the flat field screen altitude and check the screen limit
+    @param[in] collimationModel  a CollimationModel, for the M2 orientation at each target
+    @return a dict of name: array of shape (number of targets, number of times):
+        ha, az, alt (deg; az is 0 south and 90 east), airmass, screenAlt (deg; nan unless doScreen),
+        tiltX, tiltY (arcsec), transX, transY (um) and limit (one of LimitOK, LimitHorizon, LimitScreen)
+    """
+    raArr = numpy.asarray(raArr, dtype=float)[:, numpy.newaxis]
+    decArr = numpy.asarray(decArr, dtype=float)[:, numpy.newaxis]
+    pySecArr = numpy.asarray(pySecArr, dtype=float)[numpy.newaxis, :]
+    shape = (raArr.shape[0], pySecArr.shape[1])
+    if doHA:
+        haArr = numpy.broadcast_to(raArr, shape)
+    else:
+        haArr = lastFromPySec(pySecArr) - raArr
+    haArr = (haArr + 180.) % 360. - 180.
+    decArr = numpy.broadcast_to(decArr, shape)
+    azArr, altArr = azAltFromHADec(haArr, decArr)
+    limitArr = numpy.full(shape, LimitOK, dtype=object)
+    screenAltArr = numpy.full(shape, numpy.nan)
+    if doScreen:
+        screenAltArr, isAtMinArr = get_ffs_altitudes(altArr)
+        limitArr[isAtMinArr] = LimitScreen
+    limitArr[altArr <= 0] = LimitHorizon
+    focus, tiltX, tiltY, transX, transY = collimationModel.getOrientation(haArr, decArr)
+    return dict(
+        ha = haArr,
+        az = azArr,
+        alt = altArr,
+        airmass = airmassFromAlt(altArr),
+        screenAlt = screenAltArr,
+        tiltX = tiltX,
+        tiltY = tiltY,
+        transX = transX,
+        transY = transY,
+        limit = limitArr,
+    )
+
+def _checkTargets(tccActor, userCmd, coordList, doHA, doScreen):
+    """Implement target /check: output a targetCheck keyword for each target at each time
+    """
+    if not coordList or len(coordList) % 2 != 0:
+        raise CommandError("/check requires one or more pairs of ra, dec (or ha, dec)")
+    coordArr = numpy.asarray(coordList, dtype=float).reshape(-1, 2)
+    taiQual = userCmd.parsedCmd.qualDict['tai']
+    if taiQual.boolValue and taiQual.valueList:
+        taiList = list(taiQual.valueList)
+    else:
+        taiList = [float(taiFromPySec(getClock().time()))]
+    pySecArr = pySecFromTAI(taiList)
+    checkDict = checkTargets(coordArr[:, 0], coordArr[:, 1], pySecArr, doHA, doScreen, tccActor.collimationModel)
+    for targInd, (ra, dec) in enumerate(coordArr):
+        for timeInd, tai in enumerate(taiList):
+            def val(name):
+                return checkDict[name][targInd, timeInd]
+            userCmd.writeToUsers("i", "targetCheck=%i, %.6f, %.6f, %.1f, %.4f, %.4f, %.4f, %.3f, %.2f, "
+                "%.2f, %.2f, %.1f, %.1f, %s" % (
+                targInd, ra, dec, tai, val("ha"), val("az"), val("alt"), val("airmass"), val("screenAlt"),
+                val("tiltX"), val("tiltY"), val("transX"), val("transY"), val("limit"),
+            ))
+    nLimited = int(numpy.sum(checkDict["limit"] != LimitOK))
+    userCmd.setState(userCmd.Done, textMsg="%i targets at %i times checked; %i at a limit" % (
+        len(coordArr), len(taiList), nLimited))
+
 def target(tccActor, userCmd):
     """!Implement the target command, passing coords through to LCO TCS
 
@@ -21,6 +104,7 @@ def target(tccActor, userCmd):
     doHA = userCmd.parsedCmd.qualDict['ha'].boolValue
     doScreen = userCmd.parsedCmd.qualDict['screen'].boolValue
     abort = userCmd.parsedCmd.qualDict['abort'].boolValue
+    doCheck = userCmd.parsedCmd.qualDict['check'].boolValue
     #doBlock = userCmd.parsedCmd.qualDict['block'].boolValue
 
     if abort:
@@ -33,6 +117,9 @@ def target(tccActor, userCmd):
         raise CommandError("%s coordSys not supported at LCO"%name)
     if val.valueList:
         raise CommandError("%s coordSys date input not supported at LCO"%str(val.valueList[0]))
+    if doCheck:
+        _checkTargets(tccActor, userCmd, parsedCmd.paramDict["coordpair"].valueList, doHA, doScreen)
+        return
     if not tccActor.scaleDev.status.loaded:
         raise CommandError("Cartridge not loaded")
     if not tccActor.scaleDev.status.locked:
@@ -1,5 +1,6 @@
 from __future__ import division, absolute_import
 
+from .syncScaleMove import SyncScaleMove
 
 __all__ = ["threadRing"]
 UM_PER_MM = 1000.
@@ -21,9 +22,13 @@ def threadRing(tccActor, userCmd):
         value = params["movevalue"].valueList[0]
         offset = quals["incremental"].boolValue
         doSec = quals["secondary"].boolValue
+        doSync = quals["sync"].boolValue
         if offset:
             value += tccActor.scaleDev.motorPos
-        if not doSec:
+        if doSync:
+            # step the scaling ring and M2 focus together
+            SyncScaleMove(tccActor, value, maxFocusErr=quals["sync"].valueList[0], userCmd=userCmd).start()
+        elif not doSec:
             tccActor.scaleDev.move(value, userCmd)
         else:
             # move M2 to maintain current focus
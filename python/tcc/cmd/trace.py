@@ -0,0 +1,35 @@
+from __future__ import division, absolute_import
+
+import os
+import time
+
+from ..utils.cmdTrace import cmdTracer
+
+__all__ = ["trace"]
+
+def trace(tccActor, userCmd):
+    """Start or stop span tracing of user commands and their device commands
+
+    Traces are written in Chrome trace event format; load them with chrome://tracing or Perfetto.
+
+    @param[in,out] tccActor  tcc actor
+    @param[in,out] userCmd  a twistedActor BaseCommand with parseCmd attribute
+    """
+    params = userCmd.parsedCmd.paramDict
+    quals = userCmd.parsedCmd.qualDict
+    action = params["action"].valueList[0].keyword.lower()
+    if action == "on":
+        if quals["file"].boolValue:
+            filePath = quals["file"].valueList[0]
+        else:
+            fileName = "tccTrace-%s.json" % (time.strftime("%Y-%m-%dT%H:%M:%S"),)
+            filePath = os.path.join(tccActor.logDir, fileName)
+        cmdTracer.start(filePath)
+    elif action == "off":
+        cmdTracer.stop()
+    if cmdTracer.isEnabled:
+        traceState = "On, %r, %i" % (cmdTracer.filePath, cmdTracer.nEvents)
+    else:
+        traceState = "Off, %r, %i" % (cmdTracer.filePath, cmdTracer.nEvents)
+    userCmd.writeToUsers("i", "cmdTrace=%s" % (traceState,))
+    userCmd.setState(userCmd.Done)
@@ -0,0 +1,35 @@
+from __future__ import division, absolute_import
+
+from twistedActor import CommandError
+
+from ..utils.devLog import getDevLog, devLogNames, levelFromName, nameFromLevel
+
+__all__ = ["verbosity"]
+
+def verbosity(tccActor, userCmd):
+    """Show or set the log verbosity of devices
+
+    verbosity                   show all levels
+    verbosity tcs=debug, sec    set tcs to debug level, show sec level
+
+    @param[in,out] tccActor  tcc actor
+    @param[in,out] userCmd  a twistedActor BaseCommand with parseCmd attribute
+    """
+    params = userCmd.parsedCmd.paramDict
+    keywordList = params["source"].valueList
+    if keywordList:
+        nameList = []
+        for keyword in keywordList:
+            name = keyword.keyword.lower()
+            if keyword.valueList:
+                try:
+                    level = levelFromName(keyword.valueList[0])
+                except ValueError as e:
+                    raise CommandError(str(e))
+                getDevLog(name).setLevel(level)
+            nameList.append(name)
+    else:
+        nameList = devLogNames()
+    for name in nameList:
+        userCmd.writeToUsers("i", "logLevel=%s, %s" % (name, nameFromLevel(getDevLog(name).level)))
+    userCmd.setState(userCmd.Done)
@@ -1,6 +1,9 @@
 from __future__ import absolute_import
 
 from .fakeLCODevs import *
+from .fakeLinkProfile import *
+from .loopback import *
+from .fakeReplay import *
 from .scaleDevice import *
 from .scaleDeviceWrapper import *
 from .tcsDevice import *
@@ -1,52 +1,216 @@
 from __future__ import division, absolute_import
 
-from RO.Comm.TwistedTimer import Timer
 from RO.Comm.TwistedSocket import TCPServer
 from RO.StringUtil import dmsStrFromDeg
+import collections
 import numpy
 import traceback
 import sys
 
+from tcc.utils.astrometry import deriveTCSFields
+from tcc.utils.clock import Timer, getClock
+from .fakeLinkProfile import LinkProfile
+from .loopback import LoopbackServer
+
 ArcsecPerDeg = 3600.
 AxisVelocity = 1.25 # deg / sec
 FocusVelocity = 100 # microns / sec
-ScaleVelocity = 1 # mm /sec
-RotVelocity = 0.5 # arcseconds per second
-TimerDelay = 0.01 # seconds till next timer update
-FocusStepSize = FocusVelocity * TimerDelay # microns
-AxisStepSize = AxisVelocity * TimerDelay # deg
-RotStepSize = RotVelocity * TimerDelay #deg
-ScaleStepSize = ScaleVelocity * TimerDelay # deg
+RotVelocity = 0.5 # deg / sec
+RotUnclampDelay = 5 # sec from APGCIR to the clamp releasing and the rotator starting to move
+RotClampDelay = 0.3 # sec from the end of a rotator move to the clamp engaging
+RotEncOffset = 408.653 # rotator position (deg) at encoder count 0; IROFFSET in tcsDevice
+RotEncScale = -0.00015263375 # rotator deg per encoder count; IRSCALE in tcsDevice
+PositionStreamInterval = 0.25 # seconds between __ACTUAL_POSITION lines while the scaling ring moves
 
 munge = 1
 
-GlobalScalePosition = 20 # global variable for sharing scaling ring position between fake ScaleCtrl and fake ScaleMeas
+__all__ = ["FakeScaleCtrl", "FakeTCS", "FakeM2Ctrl", "FakeMeasScaleCtrl", "FakeFFPowerSuply", "LinearMove"]
+
+class LinearMove(object):
+    """!Constant speed motion of one simulated axis
+
+    Rather than stepping the position on a timer, store where and when the move started,
+    its target and speed, and compute the position when it is asked for.
+    """
+    def __init__(self, position, speed):
+        """!Construct a LinearMove, initially at rest
+
+        @param[in] position  initial position
+        @param[in] speed  speed (position units / sec); must be > 0
+        """
+        self.speed = float(speed)
+        self.startPos = float(position)
+        self.targPos = self.startPos
+        self.startTime = getClock().time()
+
+    @property
+    def endTime(self):
+        """Time at which the move reaches (or reached) its target
+        """
+        return self.startTime + abs(self.targPos - self.startPos) / self.speed
 
-__all__ = ["FakeScaleCtrl", "FakeTCS", "FakeM2Ctrl", "FakeMeasScaleCtrl", "FakeFFPowerSuply"]
+    @property
+    def isMoving(self):
+        return getClock().time() < self.endTime
 
-class FakeDev(TCPServer):
+    def position(self, tsec=None):
+        """!Return the position at time tsec (now if None)
+        """
+        if tsec is None:
+            tsec = getClock().time()
+        elapsedTime = tsec - self.startTime
+        moveDist = self.targPos - self.startPos
+        if self.speed * elapsedTime >= abs(moveDist):
+            return self.targPos
+        return self.startPos + numpy.sign(moveDist) * self.speed * elapsedTime
+
+    def moveTo(self, targPos, speed=None):
+        """!Start a move from the current position
+
+        @param[in] targPos  target position
+        @param[in] speed  new speed; if None then use the current speed
+        @return duration of the move (sec)
+        """
+        currTime = getClock().time()
+        self.startPos = self.position(currTime)
+        self.startTime = currTime
+        self.targPos = float(targPos)
+        if speed is not None:
+            self.speed = float(speed)
+        return self.endTime - self.startTime
+
+    def stop(self):
+        """!Stop at the current position
+        """
+        currTime = getClock().time()
+        self.startPos = self.position(currTime)
+        self.targPos = self.startPos
+        self.startTime = currTime
+
+# scaling ring motion, shared between fake ScaleCtrl and fake ScaleMeas
+GlobalScaleMove = LinearMove(20, 0.5)
+
+class FakeDev(object):
     """!A server that emulates an echoing device for testing
+
+    All output goes through writeLine, which applies the link profile.
+    The server itself is self.server: a TCPServer, or a LoopbackServer for in-process tests;
+    its state and port are available as attributes of the fake.
     """
-    def __init__(self, name, port, doEcho=False):
+    def __init__(self, name, port, doEcho=False, linkProfile=None, loopback=False):
         """!Construct a fake device controller
 
         @param[in] name  name of device controller
         @param[in] port  port on which to command device controller
         @param[in] doEcho  if True echo all incoming text
+        @param[in] linkProfile  a LinkProfile describing reply latency and faults;
+            if None then replies are instant and perfect
+        @param[in] loopback  if True, serve in-process over a LoopbackServer instead of TCP
+            (see tcc.dev.loopback; port is then nominal)
         """
+        self.name = name
         self.doEcho = doEcho
-        TCPServer.__init__(self,
-            port=port,
-            stateCallback=self.stateCallback,
+        self.linkProfile = LinkProfile() if linkProfile is None else linkProfile
+        self._replyDelay = None # delay for replies to the command being parsed
+        self._replyQueue = collections.deque() # (send time, line) in order of sending
+        self.replyTimer = Timer()
+        serverClass = LoopbackServer if loopback else TCPServer
+        self.server = serverClass(
+            port = port,
+            stateCallback = self.stateCallback,
             sockReadCallback = self.sockReadCallback,
             sockStateCallback = self.sockStateCallback,
+            name = name,
         )
 
+    @property
+    def port(self):
+        return self.server.port
+
+    @property
+    def state(self):
+        return self.server.state
+
+    @property
+    def fullState(self):
+        return self.server.fullState
+
+    @property
+    def isReady(self):
+        return self.server.isReady
+
+    @property
+    def isDone(self):
+        return self.server.isDone
+
+    @property
+    def didFail(self):
+        return self.server.didFail
+
+    def addStateCallback(self, callFunc):
+        self.server.addStateCallback(callFunc)
+
+    def removeStateCallback(self, callFunc, doRaise=False):
+        return self.server.removeStateCallback(callFunc, doRaise=doRaise)
+
+    def close(self, isOK=True, reason=None):
+        return self.server.close(isOK=isOK, reason=reason)
+
     def sockReadCallback(self, sock):
         cmdStr = sock.readLine()
-        if self.doEcho:
-            sock.writeLine(cmdStr)
-        self.parseCmdStr(cmdStr)
+        if self.linkProfile.doDisconnect():
+            print("%s dropping connection (link profile %s)" % (self.name, self.linkProfile.name))
+            sock.close()
+            return
+        self._replyDelay = self.linkProfile.replyDelay(cmdStr)
+        try:
+            if self.doEcho:
+                self.writeLine(cmdStr)
+            self.parseCmdStr(cmdStr)
+        finally:
+            self._replyDelay = None
+
+    def writeLine(self, line):
+        """!Write a line to the connected device, subject to the link profile
+
+        Replies to a command share one delay; unsolicited output gets its own.
+        Lines are always sent in the order written.
+        """
+        if self.linkProfile.isIdeal:
+            self.userSock.writeLine(line)
+            return
+        delay = self.linkProfile.replyDelay() if self._replyDelay is None else self._replyDelay
+        for mangledLine in self.linkProfile.mangle(line):
+            self.writeLineLater(delay, mangledLine)
+
+    def writeLineLater(self, delay, line):
+        """!Write a line after a delay (sec), bypassing the link profile
+
+        The line is not sent before any line already queued.
+        """
+        sendTime = getClock().time() + delay
+        if self._replyQueue:
+            sendTime = max(sendTime, self._replyQueue[-1][0])
+        self._replyQueue.append((sendTime, line))
+        if not self.replyTimer.isActive:
+            self.replyTimer.start(self._replyQueue[0][0] - getClock().time(), self._sendReplies)
+
+    def _sendReplies(self):
+        """Send all queued lines that are due, then wait for the next one
+        """
+        currTime = getClock().time()
+        while self._replyQueue and self._replyQueue[0][0] <= currTime:
+            sendTime, line = self._replyQueue.popleft()
+            if self.userSock is not None:
+                self.userSock.writeLine(line)
+        if self._replyQueue:
+            self.replyTimer.start(self._replyQueue[0][0] - currTime, self._sendReplies)
+
+    def cancelReplies(self):
+        """!Discard unsent replies (e.g. when shutting down)
+        """
+        self.replyTimer.cancel()
+        self._replyQueue.clear()
 
     def parseCmdStr(self, cmdStr):
         raise NotImplementedError
@@ -60,39 +224,24 @@ class FakeDev(TCPServer):
             self.userSock = sock
         else:
             self.userSock = None
-
-    def incrementPosition(self, desiredPosition, currentPosition, stepSize):
-        """move position one stepSize towards desiredPosition but don't overshoot
-        return the new position
-        """
-        moveDist = desiredPosition - currentPosition
-        sign = 1
-        if moveDist == 0:
-            return currentPosition
-        if moveDist < 0:
-            sign = -1
-        newPosition = currentPosition + sign * stepSize
-        # check for overshoot
-        if sign*(desiredPosition - newPosition) < 0:
-            #overshot return the desiredPosition
-            return desiredPosition
-        return newPosition
+            self.cancelReplies()
 
 class FakeScaleCtrl(FakeDev):
     """!A server that emulates the LCO scale
     """
-    def __init__(self, name, port):
+    def __init__(self, name, port, linkProfile=None, loopback=False):
         """!Construct a fake LCO scale controller
 
         @param[in] name  name of scale controller
         @param[in] port  port on which to command scale controller
+        @param[in] linkProfile  a LinkProfile for replies; None for instant, perfect replies
+        @param[in] loopback  if True, serve in-process instead of over TCP
         """
-        global GlobalScalePosition
         self.isMoving = False
         self.moveRange = [0., 40.]
-        self.desPosition = GlobalScalePosition # wake up in mid travel
-        self.position = GlobalScalePosition
-        self.speed = 0.5
+        self.positionMove = GlobalScaleMove
+        self.positionMove.stop() # wake up wherever the last fake left the ring
+        self.desPosition = self.position
         self.moveTimer = Timer()
         self.posSw1, self.posSw2, self.posSw3 = (1, 1, 1)
         self.cartID = 0
@@ -107,23 +256,30 @@ class FakeScaleCtrl(FakeDev):
         FakeDev.__init__(self,
             name = name,
             port = port,
+            linkProfile = linkProfile,
+            loopback = loopback,
             doEcho = True,
         )
         # self.sendPositionLoop()
-        # self.moveLoop()
-
-    def moveLoop(self):
-        # loops always
-        global GlobalScalePosition
-        self.position = self.incrementPosition(self.desPosition, self.position, self.speed*TimerDelay)
-        GlobalScalePosition = self.position
-        if self.position == self.desPosition:
-            # move is done, send OK
-            self.userSock.writeLine("OK")
-            self.isMoving = False
-        else:
-            # keep moving
-            self.moveTimer.start(TimerDelay/10., self.moveLoop)
+
+    @property
+    def position(self):
+        return self.positionMove.position()
+
+    @property
+    def speed(self):
+        return self.positionMove.speed
+
+    def startMove(self):
+        """Start moving towards desPosition; moveDone is called when it is reached
+        """
+        moveTime = self.positionMove.moveTo(self.desPosition, self.speed)
+        self.moveTimer.start(moveTime, self.moveDone)
+
+    def moveDone(self):
+        # move is done, send OK
+        self.isMoving = False
+        self.writeLine("OK")
 
     def parseCmdStr(self, cmdStr):
         if "status" in cmdStr.lower():
@@ -131,34 +287,38 @@ class FakeScaleCtrl(FakeDev):
         elif "move" in cmdStr.lower():
             desPos = float(cmdStr.split()[-1])
             if not self.moveRange[0] <= desPos <= self.moveRange[1]:
-                self.userSock.writeLine("ERROR OUT_OF_RANGE")
-                self.userSock.writeLine("OK")
+                self.writeLine("ERROR OUT_OF_RANGE")
+                self.writeLine("OK")
             else:
                 self.desPosition = desPos
                 self.isMoving = True
-                self.moveTimer.start(0, self.moveLoop)
+                self.startMove()
                 self.sendPositionLoop()
         elif "speed" in cmdStr.lower():
-            self.speed = float(cmdStr.split()[-1])
-            self.userSock.writeLine("OK")
+            # a move in progress continues at the new speed
+            self.positionMove.moveTo(self.positionMove.targPos, float(cmdStr.split()[-1]))
+            if self.isMoving:
+                self.startMove()
+            self.writeLine("OK")
         elif "stop" in cmdStr.lower():
             self.stop()
         else:
             # unrecognized command
-            self.userSock.writeLine("ERROR INVALID_COMMAND")
-            self.userSock.writeLine("OK")
+            self.writeLine("ERROR INVALID_COMMAND")
+            self.writeLine("OK")
 
     def stop(self):
-        # moveLoop will send the ok
+        # moveDone will send the ok
+        self.positionMove.stop()
         self.desPosition = self.position
-        self.moveTimer.start(0, self.moveLoop)
+        self.moveTimer.start(0, self.moveDone)
 
     def sendPositionLoop(self):
         # only write if we are "moving"
         if self.userSock is not None and self.isMoving == True:
             currPosStr = "__ACTUAL_POSITION %.6f"%self.position
-            self.userSock.writeLine(currPosStr)
-            self.positionTimer.start(TimerDelay, self.sendPositionLoop)
+            self.writeLine(currPosStr)
+            self.positionTimer.start(PositionStreamInterval, self.sendPositionLoop)
 
     # def sendStatusAndOK(self):
     #     statusLines = [
@@ -173,7 +333,7 @@ class FakeScaleCtrl(FakeDev):
     #         "OK"
     #     ]
     #     for line in statusLines:
-    #         self.userSock.writeLine(line)
+    #         self.writeLine(line)
 
     def sendStatusAndOK(self):
         global munge
@@ -241,7 +401,7 @@ class FakeScaleCtrl(FakeDev):
             "OK",
         ]
         for line in statusLines:
-            self.userSock.writeLine(line)
+            self.writeLine(line)
 
 
     def stateCallback(self, server=None):
@@ -263,11 +423,13 @@ class FakeTCS(FakeDev):
     Tracking = 2
     Slewing = 3
     Stop = 4
-    def __init__(self, name, port):
+    def __init__(self, name, port, linkProfile=None, loopback=False):
         """!Construct a fake LCO TCS
 
         @param[in] name  name of TCS controller
         @param[in] port  port on which to command TCS
+        @param[in] linkProfile  a LinkProfile for replies; None for instant, perfect replies
+        @param[in] loopback  if True, serve in-process instead of over TCP
         """
         self.rstop = 0
         self.ractive = 0
@@ -282,12 +444,13 @@ class FakeTCS(FakeDev):
         self.imoving = 0
 
         self.isClamped = 1
-        self.targRot = 0.
-        self.rot = 0.
-        self.focus = 0.
+        self.targRot = RotEncOffset + RotEncScale # encoder count 1
+        self.rotMove = LinearMove(self.targRot, RotVelocity)
+        self.rotTimer = Timer()
+        self.focusMove = LinearMove(0., FocusVelocity)
         self.targFocus = 0.
-        self.ra = 0.
-        self.dec = 0.
+        self.raMove = LinearMove(0., AxisVelocity)
+        self.decMove = LinearMove(0., AxisVelocity)
         self.ha = 0.
         self.targRA = 0.
         self.inpScreen = 0.
@@ -297,15 +460,34 @@ class FakeTCS(FakeDev):
         self.offRA = 0.
         self.epoch = 2000
         self.telState = self.Idle
-        self.focusTimer = Timer()
         self.slewTimer = Timer()
-        self.rotTimer = Timer()
+        self.errorVerbSet = set() # verbs (upper case) to reject with -1, for testing error handling
+        self.silentVerbSet = set() # verbs (upper case) to execute without replying, as MP occasionally does
+        self._muteReplies = False
 
         FakeDev.__init__(self,
             name = name,
             port = port,
+            linkProfile = linkProfile,
+            loopback = loopback,
         )
 
+    @property
+    def ra(self):
+        return self.raMove.position()
+
+    @property
+    def dec(self):
+        return self.decMove.position()
+
+    @property
+    def rot(self):
+        return self.rotMove.position()
+
+    @property
+    def focus(self):
+        return self.focusMove.position()
+
     @property
     def rerr(self):
         return self.targRA - self.ra
@@ -318,132 +500,155 @@ class FakeTCS(FakeDev):
     def onTarget(self):
         return self.targRA == self.ra and self.targDec == self.dec
 
+    @property
+    def derivedDict(self):
+        """Values of st, telaz, telel, zd and airmass, consistent with the current position and time
+        """
+        return deriveTCSFields((self.ha, self.dec), getClock().time())
+
+    def writeLine(self, line):
+        if self._muteReplies:
+            return
+        FakeDev.writeLine(self, line)
+
     def parseCmdStr(self, cmdStr):
         """Parse an incoming command, make it somewhat
         like the way c100.cpp does things.
 
         how to offsets behave, are they sticky, not here
         """
+        verb = cmdStr.strip().split(" ")[0]
+        if verb in self.errorVerbSet:
+            self.writeLine("-1")
+            return
+        self._muteReplies = verb in self.silentVerbSet
+        try:
+            self._parseCmdStr(cmdStr)
+        finally:
+            self._muteReplies = False
+
+    def _parseCmdStr(self, cmdStr):
         try:
             tokens = cmdStr.strip().split(" ")
 
             # status requests
             if tokens[0] == "RA" and len(tokens) == 1:
                 # report ra in HMS
-               self.userSock.writeLine(dmsStrFromDeg(self.ra / 15.))
+               self.writeLine(dmsStrFromDeg(self.ra / 15.))
             elif tokens[0] ==  "DEC" and len(tokens) == 1:
-               self.userSock.writeLine(dmsStrFromDeg(self.dec))
+               self.writeLine(dmsStrFromDeg(self.dec))
             elif tokens[0] == "RERR" and len(tokens) == 1:
-               self.userSock.writeLine("%.4f"%self.rerr)
+               self.writeLine("%.4f"%self.rerr)
             elif tokens[0] ==  "DERR" and len(tokens) == 1:
-               self.userSock.writeLine("%.4f"%self.derr)
+               self.writeLine("%.4f"%self.derr)
             elif tokens[0] ==  "HA" and len(tokens) == 1:
-               self.userSock.writeLine(dmsStrFromDeg(self.ha))
+               self.writeLine(dmsStrFromDeg(self.ha / 15.))
             elif tokens[0] ==  "POS" and len(tokens) == 1:
-               self.userSock.writeLine("%.4f %.4f"%(numpy.radians(self.ha), numpy.radians(self.dec)))
+               self.writeLine("%.4f %.4f"%(numpy.radians(self.ha), numpy.radians(self.dec)))
             elif tokens[0] ==  "MPOS" and len(tokens) == 1:
-               self.userSock.writeLine("%.4f %.4f"%(numpy.radians(self.ra), numpy.radians(self.dec)))
+               self.writeLine("%.4f %.4f"%(numpy.radians(self.ra), numpy.radians(self.dec)))
             elif tokens[0] ==  "EPOCH" and len(tokens) == 1:
-               self.userSock.writeLine("%.2f"%(2000))
+               self.writeLine("%.2f"%(2000))
             elif tokens[0] ==  "ZD" and len(tokens) == 1:
-               self.userSock.writeLine("%.2f"%(80))
+               self.writeLine("%.2f"%(self.derivedDict["zd"]))
             elif tokens[0] == "STATE" and len(tokens) == 1:
-               self.userSock.writeLine(str(self.telState))
+               self.writeLine(str(self.telState))
             elif tokens[0] == "INPRA" and len(tokens) == 1:
-               self.userSock.writeLine(str(self.targRA))
+               self.writeLine(str(self.targRA))
             elif tokens[0] == "INPDC" and len(tokens) == 1:
-               self.userSock.writeLine(str(self.targDec))
+               self.writeLine(str(self.targDec))
             elif tokens[0] == "TELEL" and len(tokens) == 1:
-                self.userSock.writeLine(str(85.2)) # placeholder
+                self.writeLine("%.4f"%(self.derivedDict["telel"]))
             elif tokens[0] == "TELAZ" and len(tokens) == 1:
-                self.userSock.writeLine(str(40.6)) #placeholder
+                self.writeLine("%.4f"%(self.derivedDict["telaz"]))
             elif tokens[0] == "ROT" and len(tokens) == 1:
-                self.userSock.writeLine(str(30.6)) #placeholder
+                self.writeLine(str(30.6)) #placeholder
             elif tokens[0] == "MRP" and len(tokens) == 1:
                 mrpLine = "%i 0 0 1 3"%(self.isClamped)
-                self.userSock.writeLine(mrpLine)
+                self.writeLine(mrpLine)
             elif tokens[0] == "TEMPS" and len(tokens) == 1:
-                self.userSock.writeLine("18.8 10.8 12.0 11.5 8.8 13.1 -273.1 -273.1")
+                self.writeLine("18.8 10.8 12.0 11.5 8.8 13.1 -273.1 -273.1")
             elif tokens[0] == "ST" and len(tokens) == 1:
-                self.userSock.writeLine("06:59:29")
+                self.writeLine(dmsStrFromDeg(self.derivedDict["st"] / 15.))
             elif tokens[0] == "TTRUSS" and len(tokens) == 1:
-                self.userSock.writeLine("10.979")
+                self.writeLine("10.979")
             elif tokens[0] == "INPHA" and len(tokens) == 1:
-                self.userSock.writeLine("0")
+                self.writeLine("0")
             elif tokens[0] == "RAWPOS" and len(tokens) == 1:
-                self.userSock.writeLine("1 1 1 1 1")
+                # the last value is the rotator encoder count
+                self.writeLine("1 1 1 1 %i" % (round((self.rot - RotEncOffset) / RotEncScale),))
             elif tokens[0] == "AXISSTATUS" and len(tokens) == 1:
                 axisLine = "%i %i %i %i %i %i %i %i %i %i %i" % (
                     self.rstop, self.ractive, self.rmoving, self.rtracking,
                     self.dstop, self.dactive, self.dmoving, self.dtracking,
                     self.istop, self.iactive, self.imoving
                 )
-                self.userSock.writeLine(axisLine)
+                self.writeLine(axisLine)
             elif tokens[0] == "AIRMASS" and len(tokens) == 1:
-                self.userSock.writeLine("1.01")
+                self.writeLine("%.3f"%(self.derivedDict["airmass"]))
             elif tokens[0] == "LPLC" and len(tokens) == 1:
-                self.userSock.writeLine("180.072 5002 0 1 0 0 84.593 2643 1 0 1 0 0 3103 3100 1 1 0 0 0 1 0 1 0")
+                self.writeLine("180.072 5002 0 1 0 0 84.593 2643 1 0 1 0 0 3103 3100 1 1 0 0 0 1 0 1 0")
 
             # commands
             elif tokens[0] == "HAD":
                 assert len(tokens) == 2, "Error Parsing HAD"
                 self.inpHA = float(tokens[1])
-                self.userSock.writeLine("0")
+                self.writeLine("0")
             elif tokens[0] == "INPS":
                 assert len(tokens) == 2, "Error Parsing INPS"
                 self.inpScreen = float(tokens[1])
-                self.userSock.writeLine("0")
+                self.writeLine("0")
             elif tokens[0] == "RAD":
                 assert len(tokens) == 2, "Error Parsing RAD"
                 self.targRA = float(tokens[1])
-                self.userSock.writeLine("0")
+                self.writeLine("0")
             elif tokens[0] == "DECD":
                 assert len(tokens) == 2, "Error Parsing DECD"
                 self.targDec = float(tokens[1])
-                self.userSock.writeLine("0")
+                self.writeLine("0")
             elif tokens[0] == "OFDC":
                 assert len(tokens) == 2, "Error Parsing OFDC"
                 # convert from arcseconds to degrees
                 self.offDec = float(tokens[1]) / ArcsecPerDeg
-                self.userSock.writeLine("0")
+                self.writeLine("0")
             elif tokens[0] == "OFRA":
                 assert len(tokens) == 2, "Error Parsing OFRA"
                 # convert from arcseconds to degrees
                 self.offRA = float(tokens[1]) / ArcsecPerDeg
-                self.userSock.writeLine("0")
+                self.writeLine("0")
             elif tokens[0] == "OFFP":
                 assert len(tokens) == 1, "Error Parsising Offset Execute"
                 self.targRA += self.offRA
                 self.targDec += self.offDec
                 self.offRA, self.offDec = 0., 0.
                 self.doSlew()
-                self.userSock.writeLine("0")
+                self.writeLine("0")
             elif tokens[0] == "UNCLAMP":
                 self.isClamped = 0
-                self.userSock.writeLine("0")
+                self.writeLine("0")
             elif tokens[0] == "CLAMP":
                 self.isClamped = 1
-                self.userSock.writeLine("0")
+                self.writeLine("0")
             elif tokens[0] == "APGCIR":
                 assert len(tokens) == 2, "Error Parsising APGCIR Execute"
                 self.targRot = float(tokens[1])
-                self.doRot()
-                self.userSock.writeLine("0")
+                self.doRot(autoClamp=True)
+                self.writeLine("0")
             elif tokens[0] == "DCIR":
                 assert len(tokens) == 2, "Error Parsising DCIR Execute"
                 assert self.isClamped == 0, "Rotator is clamped"
                 self.targRot += float(tokens[1])
                 self.doRot()
-                self.userSock.writeLine("0")
+                self.writeLine("0")
             elif tokens[0] == "SLEW":
                 raise RuntimeError("SLEWS NOT ALLOWED")
                 # slew to target
                 self.doSlew()
-                self.userSock.writeLine("0")
+                self.writeLine("0")
             elif tokens[0] == "MP":
                 # set epoch
                 self.MP = float(tokens[1])
-                self.userSock.writeLine("0")
+                self.writeLine("0")
                 # begin slew after short delay
                 # simulating the TO
                 self.doSlew()
@@ -451,7 +656,7 @@ class FakeTCS(FakeDev):
             elif tokens[0] == "FOCUS":
                 raise RuntimeError("DON'T USE TCS FOR FOCUS!")
                 if len(tokens) == 1:
-                   self.userSock.writeLine(str(self.focus))
+                   self.writeLine(str(self.focus))
                 else:
                     assert len(tokens) == 2, "Error Parsing Focus"
                     focusArg = tokens[1].upper()
@@ -463,19 +668,19 @@ class FakeTCS(FakeDev):
                         # input new desired focus value and move
                         self.targFocus = float(focusArg)
                         self.doFocus()
-                    self.userSock.writeLine("0")
+                    self.writeLine("0")
             elif tokens[0] == "DFOCUS":
                 assert len(tokens) == 2, "Error Parsing DFocus"
                 # input new desired focus value and move
                 self.targFocus += float(tokens[1])
                 self.doFocus()
-                self.userSock.writeLine("0")
+                self.writeLine("0")
 
             else:
                 # unknown command?
                 raise RuntimeError("Unknown Command: %s"%cmdStr)
         except Exception as e:
-            self.userSock.writeLine("-1") # error!
+            self.writeLine("-1") # error!
             print("Error: ", e)
             traceback.print_exc(file=sys.stdout)
 
@@ -483,29 +688,38 @@ class FakeTCS(FakeDev):
         if not offset:
             # offset doesn't trigger slewing state
             self.telState = self.Slewing
-        self.dec = self.incrementPosition(self.targDec, self.dec, AxisStepSize)
-        self.ra = self.incrementPosition(self.targRA, self.ra, AxisStepSize)
-        if self.onTarget:
-            # slew done!
-            self.telState = self.Tracking
+        slewTime = max(self.raMove.moveTo(self.targRA), self.decMove.moveTo(self.targDec))
+        self.slewTimer.start(slewTime, self.slewDone)
+
+    def slewDone(self):
+        self.telState = self.Tracking
+
+    def doRot(self, autoClamp=False):
+        """autoClamp: unclamp the rotator for the move and clamp it again afterwards (as APGCIR does)
+        """
+        if autoClamp:
+            # the clamp reads engaged until it has released, RotUnclampDelay later
+            self.imoving = 1
+            self.rotTimer.start(RotUnclampDelay, self.rotUnclamped)
         else:
-            self.slewTimer.start(TimerDelay, self.doSlew)
+            self.rotMove.moveTo(self.targRot)
 
-    def doRot(self):
-        self.rot = self.incrementPosition(self.targRot, self.rot, RotStepSize)
-        if self.rot != self.targRot:
-            self.rotTimer.start(TimerDelay, self.doRot)
+    def rotUnclamped(self):
+        self.isClamped = 0
+        moveTime = self.rotMove.moveTo(self.targRot)
+        self.rotTimer.start(moveTime + RotClampDelay, self.rotDone)
+
+    def rotDone(self):
+        self.imoving = 0
+        self.isClamped = 1
 
     def doFocus(self, stop=False):
         """stop: halt focus at it's current location
         """
         if stop:
-            self.focusTimer.cancel()
+            self.focusMove.stop()
             return
-        self.focus = self.incrementPosition(self.targFocus, self.focus, FocusStepSize)
-        if self.focus != self.targFocus:
-            # continue moving
-            self.focusTimer.start(TimerDelay, self.doFocus)
+        self.focusMove.moveTo(self.targFocus)
 
 
     def stateCallback(self, server=None):
@@ -526,15 +740,19 @@ class FakeM2Ctrl(FakeDev):
     Moving = "MOVING"
     On = "on"
     Off = "off"
-    def __init__(self, name, port):
+    def __init__(self, name, port, linkProfile=None, loopback=False):
         """!Construct a fake LCO M2
 
         @param[in] name  name of M2 controller
         @param[in] port  port on which to command M2
+        @param[in] linkProfile  a LinkProfile for replies; None for instant, perfect replies
+        @param[in] loopback  if True, serve in-process instead of over TCP
 
         State=DONE Ori=12500.0,70.0,-12.0,-600.1,925.0 Lamps=off Galil=off
         """
-        self.orientation = [15,70.0,-12.0,-600.1,925.0]
+        # focus moves at FocusVelocity; the other axes jump to their targets when the move is done
+        self.focusMove = LinearMove(15, FocusVelocity)
+        self._orientation = [15,70.0,-12.0,-600.1,925.0]
         self.targOrientation = [15,70.0,-12.0,-600.1,925.0]
         self.moveState = self.Done
         self.lamps = self.Off
@@ -546,8 +764,14 @@ class FakeM2Ctrl(FakeDev):
         FakeDev.__init__(self,
             name = name,
             port = port,
+            linkProfile = linkProfile,
+            loopback = loopback,
         )
 
+    @property
+    def orientation(self):
+        return [self.focusMove.position()] + self._orientation[1:]
+
     def statusStr(self):
         return "State=%s Ori=%s Lamps=%s Galil=%s"%(
                 self.moveState,
@@ -568,18 +792,18 @@ class FakeM2Ctrl(FakeDev):
             # status requests
             if tokens[0].lower() == "status":
                 # status
-               self.userSock.writeLine(self.statusStr())
+               self.writeLine(self.statusStr())
             elif tokens[0].lower() == "speed":
-                self.userSock.writeLine("%.1f"%self.speed)
+                self.writeLine("%.1f"%self.speed)
             elif tokens[0].lower() in ["move", "offset"] and len(tokens)==1:
-                self.userSock.writeLine(" ".join(["%.2f"%val for val in self.orientation]))
+                self.writeLine(" ".join(["%.2f"%val for val in self.orientation]))
             elif tokens[0].lower() in ["focus", "dfocus"] and len(tokens)==1:
-                self.userSock.writeLine("%.1f"%self.orientation[0])
+                self.writeLine("%.1f"%self.orientation[0])
 
             # commands
             elif tokens[0].lower() == "stop":
                 self.doMove(stop=True)
-                self.userSock.writeLine("OK")
+                self.writeLine("OK")
             elif tokens[0].lower() in ["move", "focus", "offset", "dfocus"]:
                 isOffset = tokens[0].lower() in ["offset", "dfocus"]
                 for ind, value in enumerate(tokens[1:]):
@@ -588,20 +812,20 @@ class FakeM2Ctrl(FakeDev):
                     else:
                         self.targOrientation[ind] = float(value)
                 self.doMove()
-                self.userSock.writeLine("OK")
+                self.writeLine("OK")
             elif tokens[0].lower() == "galil":
                 if tokens[1].lower() == "on":
                     self.powerup()
                 else:
                     self.powerdown()
-                self.userSock.writeLine("OK")
+                self.writeLine("OK")
 
 
             else:
                 # unknown command?
                 raise RuntimeError("Unknown Command: %s"%cmdStr)
         except Exception as e:
-            self.userSock.writeLine("-1") # error!
+            self.writeLine("-1") # error!
             print("Error: ", e)
 
     def powerdown(self):
@@ -623,6 +847,7 @@ class FakeM2Ctrl(FakeDev):
         """
         if stop:
             self.moveTimer.cancel()
+            self.focusMove.stop()
             self.moveState = self.Done
             self.galil = self.Off
             return
@@ -632,14 +857,15 @@ class FakeM2Ctrl(FakeDev):
             # move will start after powerup
             return
         self.moveState = self.Moving
-        focus = self.incrementPosition(self.targOrientation[0], self.orientation[0], FocusStepSize)
-        self.orientation[0] = focus
-        if focus != self.targOrientation[0]:
-            # continue moving
-            self.moveTimer.start(TimerDelay, self.doMove)
+        moveTime = self.focusMove.moveTo(self.targOrientation[0])
+        if moveTime > 0:
+            self.moveTimer.start(moveTime, self.moveDone)
         else:
-            self.orientation = self.targOrientation[:] # copy is necessary!!!
-            self.moveState = self.Done
+            self.moveDone()
+
+    def moveDone(self):
+        self._orientation = self.targOrientation[:] # copy is necessary!!!
+        self.moveState = self.Done
 
     def stateCallback(self, server=None):
         if self.isReady:
@@ -654,23 +880,27 @@ class FakeM2Ctrl(FakeDev):
 class FakeMeasScaleCtrl(FakeDev):
     """!A server that emulates the Mitutoyo EV-Counter Serial interface
     """
-    def __init__(self, name, port):
+    def __init__(self, name, port, linkProfile=None, loopback=False):
         """!Construct a fake MeasController
 
         @param[in] name  name of M2 controller
         @param[in] port  port on which to command M2
+        @param[in] linkProfile  a LinkProfile for replies; None for instant, perfect replies
+        @param[in] loopback  if True, serve in-process instead of over TCP
         """
 
         FakeDev.__init__(self,
             name = name,
             port = port,
+            linkProfile = linkProfile,
+            loopback = loopback,
         )
 
     def measResponse(self):
         # get mig position with some noise
         measPosStr = ""
         for ii in range(6):
-            meas = GlobalScalePosition - 20.0
+            meas = GlobalScaleMove.position() - 20.0
             if meas > 0:
                 sign = "+"
             else:
@@ -685,16 +915,16 @@ class FakeMeasScaleCtrl(FakeDev):
         if not cmdStr:
             return
         if cmdStr == "GA00":
-            self.userSock.writeLine(self.measResponse())
+            self.writeLine(self.measResponse())
         elif cmdStr == "CS00":
-            self.userSock.writeLine("CH00")
+            self.writeLine("CH00")
         elif cmdStr == "CN00":
-            self.userSock.writeLine("CH00")
+            self.writeLine("CH00")
         elif cmdStr == "CR00":
-            self.userSock.writeLine("CH00")
+            self.writeLine("CH00")
         else:
             # unknown command?
-            self.userSock.writeLine("ERROR") # error!
+            self.writeLine("ERROR") # error!
 
     def stateCallback(self, server=None):
         if self.isReady:
@@ -707,11 +937,13 @@ class FakeMeasScaleCtrl(FakeDev):
 
 class FakeFFPowerSuply(FakeDev):
 
-    def __init__(self, name, port):
+    def __init__(self, name, port, linkProfile=None, loopback=False):
         """!Construct a fake MeasController
 
         @param[in] name  name of M2 controller
         @param[in] port  port on which to command M2
+        @param[in] linkProfile  a LinkProfile for replies; None for instant, perfect replies
+        @param[in] loopback  if True, serve in-process instead of over TCP
         """
         self.PWR = "OFF"
         self.IMAX = 37
@@ -725,6 +957,8 @@ class FakeFFPowerSuply(FakeDev):
         FakeDev.__init__(self,
             name = name,
             port = port,
+            linkProfile = linkProfile,
+            loopback = loopback,
         )
 
     def parseCmdStr(self, cmdStr):
@@ -747,30 +981,30 @@ class FakeFFPowerSuply(FakeDev):
                 else:
                     iValue = 0.
                 self.iTimer.start(2, self.setI, iValue)
-            self.userSock.writeLine(self.PWR)
+            self.writeLine(self.PWR)
         elif cmdStr == "REMOTE":
             if value:
                 self.REMOTE = value
-            self.userSock.writeLine(self.REMOTE)
+            self.writeLine(self.REMOTE)
         elif cmdStr == "VMAX":
-            self.userSock.writeLine("%4f"%self.VMAX)
+            self.writeLine("%4f"%self.VMAX)
         elif cmdStr == "IMAX":
-            self.userSock.writeLine("%4f"%self.IMAX)
+            self.writeLine("%4f"%self.IMAX)
         elif cmdStr == "ISET":
             if value:
                 self.ISET = float(value)
-            self.userSock.writeLine("%4f A"%self.ISET)
+            self.writeLine("%4f A"%self.ISET)
         elif cmdStr == "VSET":
             if value:
                 self.VSET = float(value)
-            self.userSock.writeLine("%4f V {#Hdb8d=56205 raw}"%self.VSET)
+            self.writeLine("%4f V {#Hdb8d=56205 raw}"%self.VSET)
         elif cmdStr == "VREAD":
-            self.userSock.writeLine("%4f V {#Hdb8d=56205 raw}"%self.VREAD)
+            self.writeLine("%4f V {#Hdb8d=56205 raw}"%self.VREAD)
         elif cmdStr == "IREAD":
-            self.userSock.writeLine("%4f A"%self.IREAD)
+            self.writeLine("%4f A"%self.IREAD)
         else:
             # unknown command?
-            self.userSock.writeLine("ERROR") # error!
+            self.writeLine("ERROR") # error!
 
     def setI(self, iValue):
         print("setting I value")
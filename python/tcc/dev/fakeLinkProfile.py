@@ -0,0 +1,212 @@
+from __future__ import division, absolute_import
+"""Link profiles: latency, jitter and faults for the fake LCO controllers
+
+A LinkProfile describes how a fake controller's replies travel back to the device:
+how long they take (a random delay per command, optionally per command verb) and how
+often they go wrong (dropped, duplicated, replaced by an error reply, munged, or the
+connection dropped). Replies are always delivered in the order they were written.
+Random numbers come from a private generator, so a seeded profile is reproducible.
+
+Profiles for several fakes can be loaded from a JSON file; keys are fake names
+(as used by TCCLCOActorWrapper: "tcs", "scale", "sec", "measScale") and values are
+LinkProfile constructor arguments, e.g.:
+
+    {
+        "tcs": {
+            "delay": {"dist": "lognormal", "median": 0.02, "sigma": 0.5},
+            "verbDelay": {"MP": {"dist": "constant", "value": 3.0}},
+            "dropProb": 0.001
+        },
+        "scale": {
+            "delay": {"dist": "uniform", "min": 0.005, "max": 0.05},
+            "mungeProb": 0.01,
+            "errorReply": "ERROR"
+        }
+    }
+
+Delay distributions (times in seconds; negative samples are clipped to 0):
+- {"dist": "constant", "value": v}
+- {"dist": "uniform", "min": a, "max": b}
+- {"dist": "normal", "mean": m, "sigma": s}
+- {"dist": "lognormal", "median": m, "sigma": s} (sigma of the underlying normal)
+- {"dist": "exponential", "mean": m}
+"""
+import json
+import math
+import random
+
+__all__ = ["LinkProfile", "loadLinkProfiles"]
+
+MungedValue = "MUNGED"
+
+class DelayDist(object):
+    """!A distribution of delays (sec)
+    """
+    def __init__(self, dist="constant", **kwargs):
+        """!Construct a DelayDist
+
+        @param[in] dist  name of distribution: one of constant, uniform, normal, lognormal, exponential
+        @param[in] kwargs  parameters of the distribution (see module doc)
+        """
+        self.dist = dist
+        self.params = kwargs
+        try:
+            if dist == "constant":
+                value = float(kwargs.get("value", 0))
+                self._sampleFunc = lambda rng: value
+            elif dist == "uniform":
+                minDelay, maxDelay = float(kwargs["min"]), float(kwargs["max"])
+                self._sampleFunc = lambda rng: rng.uniform(minDelay, maxDelay)
+            elif dist == "normal":
+                mean, sigma = float(kwargs["mean"]), float(kwargs["sigma"])
+                self._sampleFunc = lambda rng: rng.gauss(mean, sigma)
+            elif dist == "lognormal":
+                mu, sigma = math.log(float(kwargs["median"])), float(kwargs["sigma"])
+                self._sampleFunc = lambda rng: rng.lognormvariate(mu, sigma)
+            elif dist == "exponential":
+                mean = float(kwargs["mean"])
+                self._sampleFunc = lambda rng: rng.expovariate(1 / mean)
+            else:
+                raise RuntimeError("Unknown delay distribution %r" % (dist,))
+        except KeyError as e:
+            raise RuntimeError("Delay distribution %r requires parameter %s" % (dist, e))
+
+    def sample(self, rng):
+        """!Return a random delay (sec), never negative
+
+        @param[in] rng  a random.Random
+        """
+        return max(0., self._sampleFunc(rng))
+
+    def __repr__(self):
+        return "DelayDist(%r, %s)" % (self.dist, self.params)
+
+
+class LinkProfile(object):
+    """!Latency and fault model for the link between a fake controller and its device
+    """
+    def __init__(self,
+        name = "ideal",
+        delay = None,
+        verbDelay = None,
+        dropProb = 0.,
+        dupProb = 0.,
+        errorProb = 0.,
+        errorReply = "-1",
+        mungeProb = 0.,
+        disconnectProb = 0.,
+        seed = None,
+    ):
+        """!Construct a LinkProfile; the default is an ideal link (instant, perfect replies)
+
+        @param[in] name  name of profile, for reporting
+        @param[in] delay  reply delay: a dict describing a distribution (see module doc); None for no delay
+        @param[in] verbDelay  dict of command verb (first word, case blind): delay dict;
+            replies to these commands use this delay instead of the default
+        @param[in] dropProb  probability that a reply line is dropped
+        @param[in] dupProb  probability that a reply line is sent twice
+        @param[in] errorProb  probability that a reply line is replaced by errorReply
+        @param[in] errorReply  error reply, e.g. "-1" for the TCS and M2
+        @param[in] mungeProb  probability that the value (last word) of a reply line is replaced by "MUNGED"
+        @param[in] disconnectProb  probability that the controller drops the connection
+            instead of handling a command
+        @param[in] seed  seed for the random number generator; None to seed from the system
+        """
+        self.name = name
+        self.delay = None if delay is None else DelayDist(**delay)
+        self.verbDelayDict = dict((verb.upper(), DelayDist(**dist)) for verb, dist in (verbDelay or {}).iteritems())
+        self.dropProb = float(dropProb)
+        self.dupProb = float(dupProb)
+        self.errorProb = float(errorProb)
+        self.errorReply = errorReply
+        self.mungeProb = float(mungeProb)
+        self.disconnectProb = float(disconnectProb)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.nDropped = 0
+        self.nDuplicated = 0
+        self.nErrors = 0
+        self.nMunged = 0
+        self.nDisconnects = 0
+
+    @property
+    def isIdeal(self):
+        """Return True if replies are instant and unaltered
+        """
+        return self.delay is None and not self.verbDelayDict and not (
+            self.dropProb or self.dupProb or self.errorProb or self.mungeProb or self.disconnectProb)
+
+    def replyDelay(self, cmdStr=None):
+        """!Return a random delay (sec) for the reply to a command
+
+        @param[in] cmdStr  command whose reply is delayed; None for unsolicited output
+        """
+        if cmdStr is not None and self.verbDelayDict:
+            tokens = cmdStr.split()
+            if tokens:
+                delayDist = self.verbDelayDict.get(tokens[0].upper())
+                if delayDist is not None:
+                    return delayDist.sample(self.rng)
+        if self.delay is None:
+            return 0.
+        return self.delay.sample(self.rng)
+
+    def doDisconnect(self):
+        """!Return True if the connection should be dropped instead of handling a command
+        """
+        if self.disconnectProb and self.rng.random() < self.disconnectProb:
+            self.nDisconnects += 1
+            return True
+        return False
+
+    def mangle(self, line):
+        """!Apply faults to one reply line
+
+        @param[in] line  reply line
+        @return a list of zero or more lines to send
+        """
+        rng = self.rng
+        if self.dropProb and rng.random() < self.dropProb:
+            self.nDropped += 1
+            return []
+        if self.errorProb and rng.random() < self.errorProb:
+            self.nErrors += 1
+            line = self.errorReply
+        elif self.mungeProb and rng.random() < self.mungeProb:
+            tokens = line.rsplit(None, 1)
+            if len(tokens) == 2:
+                self.nMunged += 1
+                line = "%s %s" % (tokens[0], MungedValue)
+        if self.dupProb and rng.random() < self.dupProb:
+            self.nDuplicated += 1
+            return [line, line]
+        return [line]
+
+    def getStatsStr(self):
+        """!Return a string describing how many faults have been injected
+        """
+        return "%s: nDropped=%i, nDuplicated=%i, nErrors=%i, nMunged=%i, nDisconnects=%i" % (
+            self.name, self.nDropped, self.nDuplicated, self.nErrors, self.nMunged, self.nDisconnects)
+
+    def __repr__(self):
+        return "LinkProfile(%r)" % (self.name,)
+
+
+def loadLinkProfiles(filePath, seed=None):
+    """!Load link profiles from a JSON file
+
+    @param[in] filePath  path of JSON file: a dict of fake name: LinkProfile arguments
+    @param[in] seed  if not None, seed for every profile that does not specify its own
+        (offset by the profile's position in the sorted names, so the profiles are independent)
+    @return a dict of fake name: LinkProfile
+    """
+    with open(filePath, "r") as f:
+        profileArgsDict = json.load(f)
+    profileDict = {}
+    for ind, name in enumerate(sorted(profileArgsDict.keys())):
+        profileArgs = dict((str(key), val) for key, val in profileArgsDict[name].iteritems())
+        profileArgs.setdefault("name", name)
+        if seed is not None:
+            profileArgs.setdefault("seed", seed + ind)
+        profileDict[str(name)] = LinkProfile(**profileArgs)
+    return profileDict
@@ -0,0 +1,128 @@
+from __future__ import division, absolute_import
+"""A fake controller that replays recorded device traffic (see tcc.utils.sessionLog)
+
+The recorded traffic of one device is split into exchanges: a line written to the device
+followed by the lines read before the next write. When the replay controller receives
+a command it finds the matching exchange (the next one with the same command, looking a
+limited distance ahead) and sends the recorded replies, with the recorded delays
+divided by speed. Unmatched commands (e.g. the actor's polling has drifted from the
+recording) get the replies last recorded for that command, if any, so the device
+does not stall.
+"""
+import collections
+
+from .fakeLCODevs import FakeDev
+
+__all__ = ["FakeReplayCtrl", "makeExchangeList"]
+
+Exchange = collections.namedtuple("Exchange", ["cmdStr", "replyList"]) # replyList: list of (delay, line)
+
+def makeExchangeList(eventList, source):
+    """!Split the events of one source into exchanges
+
+    @param[in] eventList  a list of tcc.utils.sessionLog.SessionEvent
+    @param[in] source  source of interest, e.g. "tcs"
+    @return two items:
+    - a list of (delay, line) read before the first command was written
+      (delay relative to the first event of this source)
+    - a list of Exchange, in order
+    """
+    preambleList = []
+    exchangeList = []
+    startTime = None
+    for event in eventList:
+        if event.source != source:
+            continue
+        if event.direction == "w":
+            startTime = event.time
+            exchangeList.append(Exchange(event.line, []))
+        elif exchangeList:
+            exchangeList[-1].replyList.append((event.time - startTime, event.line))
+        else:
+            if startTime is None:
+                startTime = event.time
+            preambleList.append((event.time - startTime, event.line))
+    return preambleList, exchangeList
+
+
+class FakeReplayCtrl(FakeDev):
+    """!A fake controller that answers commands with recorded replies
+    """
+    def __init__(self, name, port, eventList, source, speed=1., lookAhead=50, loopback=False):
+        """!Construct a FakeReplayCtrl
+
+        @param[in] name  name of controller
+        @param[in] port  port on which to serve
+        @param[in] eventList  recorded events (see tcc.utils.sessionLog.readSession)
+        @param[in] source  source to replay, e.g. "tcs"
+        @param[in] speed  replay speed: recorded reply delays are divided by speed;
+            0 to reply as quickly as possible
+        @param[in] lookAhead  maximum number of recorded exchanges to skip when matching a command
+        @param[in] loopback  if True, serve in-process instead of over TCP
+        """
+        if speed < 0:
+            raise RuntimeError("speed=%s must be >= 0" % (speed,))
+        self.source = source
+        self.speed = float(speed)
+        self.lookAhead = int(lookAhead)
+        self.preambleList, self.exchangeList = makeExchangeList(eventList, source)
+        self.exchangeInd = 0
+        self.lastReplyDict = {} # cmdStr: replyList of the last exchange matched or skipped
+        self.nMatched = 0
+        self.nSkipped = 0
+        self.nUnmatched = 0
+        self.nRepliesSent = 0
+        self.userSock = None
+        FakeDev.__init__(self,
+            name = name,
+            port = port,
+            loopback = loopback,
+        )
+
+    @property
+    def isExhausted(self):
+        """True if every recorded exchange has been replayed or skipped
+        """
+        return self.exchangeInd >= len(self.exchangeList)
+
+    def sockStateCallback(self, sock):
+        FakeDev.sockStateCallback(self, sock)
+        if sock.isReady and self.preambleList:
+            self.sendReplies(self.preambleList)
+            self.preambleList = []
+
+    def parseCmdStr(self, cmdStr):
+        cmdKey = cmdStr.strip().lower()
+        endInd = min(self.exchangeInd + self.lookAhead + 1, len(self.exchangeList))
+        for ind in range(self.exchangeInd, endInd):
+            if self.exchangeList[ind].cmdStr.strip().lower() == cmdKey:
+                for exchange in self.exchangeList[self.exchangeInd:ind + 1]:
+                    self.lastReplyDict[exchange.cmdStr.strip().lower()] = exchange.replyList
+                self.nSkipped += ind - self.exchangeInd
+                self.nMatched += 1
+                self.exchangeInd = ind + 1
+                self.sendReplies(self.exchangeList[ind].replyList)
+                return
+        self.nUnmatched += 1
+        self.sendReplies(self.lastReplyDict.get(cmdKey, ()))
+
+    def sendReplies(self, replyList):
+        """!Send recorded replies, with their recorded delays divided by speed
+        """
+        self.nRepliesSent += len(replyList)
+        for delay, line in replyList:
+            if self.speed == 0:
+                self.writeLine(line)
+            else:
+                self.writeLineLater(delay / self.speed, line)
+
+    def getStatsStr(self):
+        return "%s replay of %s: %i/%i exchanges matched, %i skipped, %i commands unmatched, %i replies sent" % (
+            self.name, self.source, self.nMatched, len(self.exchangeList), self.nSkipped, self.nUnmatched,
+            self.nRepliesSent)
+
+    def stateCallback(self, server=None):
+        if self.isReady:
+            print("Fake replay controller %s (%s) running on port %s" % (self.name, self.source, self.port))
+        elif self.didFail:
+            print("Fake replay controller %s failed to start on port %s" % (self.name, self.port))
@@ -5,7 +5,7 @@ import numpy
 from twistedActor import TCPDevice, log, DevCmd, CommandQueue, expandCommand
 
 from RO.StringUtil import strFromException
-from RO.Comm.TwistedTimer import Timer
+from tcc.utils.clock import Timer
 
 __all__ = ["FFDevice"]
 
@@ -38,6 +38,7 @@ class FFDevice(TCPDevice):
                 register a callback with "conn" for that task.
         """
         self.tccStatus = None # set by tccLCOActor
+        self.sessionLog = None # function(direction, line) to record raw traffic; see tcc.utils.sessionLog
         self.PWR = None
         self.VSET = None
         self.ISET = None
@@ -168,6 +169,8 @@ class FFDevice(TCPDevice):
         @param[in] replyStr   the reply, minus any terminating \n
         """
         log.info("%s.handleReply(replyStr=%s)" % (self, replyStr))
+        if self.sessionLog is not None:
+            self.sessionLog("r", replyStr)
         replyStr = replyStr.strip()
         # print(replyStr, self.currExeDevCmd.cmdStr)
         if not replyStr:
@@ -278,6 +281,8 @@ class FFDevice(TCPDevice):
             if self.conn.isConnected:
                 log.info("%s writing %r" % (self, devCmd.cmdStr))
                 devCmd.setState(devCmd.Running)
+                if self.sessionLog is not None:
+                    self.sessionLog("w", devCmd.cmdStr)
                 self.conn.writeLine(devCmd.cmdStr)
             else:
                 self.currExeDevCmd.setState(self.currExeDevCmd.Failed, "Not connected to FF power supply")
@@ -0,0 +1,339 @@
+from __future__ import division, absolute_import
+"""An in-process loopback transport between devices and fake controllers
+
+A LoopbackServer stands in for RO.Comm.TwistedSocket.TCPServer in a fake controller
+and a LoopbackConnection stands in for the RO.Comm.TCPConnection of a device.
+Data written to one end of a connection is delivered to the other end by the reactor,
+in order, on the next iteration; nothing goes through the kernel network stack.
+Lines are framed exactly as by RO's twisted sockets: writeLine appends \\r\\n and
+readLine accepts any of \\r\\n, \\r or \\n.
+
+Typical use (the device wrappers do this when constructed with loopback=True):
+
+    fakeTCS = FakeTCS(name="fakeTCS", port=0, loopback=True)
+    tcsDev = TCSDevice(name="tcsDev", host="localhost", port=fakeTCS.port)
+    setLoopbackConnection(tcsDev, fakeTCS.server)
+    tcsDev.connect()
+"""
+import collections
+import itertools
+import re
+import sys
+import traceback
+
+from twisted.internet import reactor
+from RO.Comm.BaseSocket import BaseSocket, BaseServer
+from RO.Comm.TCPConnection import TCPConnection
+
+__all__ = ["LoopbackSocket", "LoopbackServer", "LoopbackConnection", "setLoopbackConnection"]
+
+# nominal port numbers for loopback servers constructed with port=0; used only in messages
+_portIter = itertools.count(1)
+
+class LoopbackSocket(BaseSocket):
+    """!One end of an in-process connection
+
+    Construct pairs with LoopbackServer.connectClient.
+    """
+    lineEndPattern = re.compile("\r\n|\r|\n")
+
+    def __init__(self, name="", readCallback=None, stateCallback=None, port=None):
+        """!Construct a LoopbackSocket, initially Connecting
+
+        @param[in] name  a string to identify this socket
+        @param[in] readCallback  function to call when data arrives; it receives one argument: this socket
+        @param[in] stateCallback  function to call when the state changes; it receives one argument: this socket
+        @param[in] port  port of the server, for reporting
+        """
+        self.peer = None
+        self._port = port
+        self._readBuffer = ""
+        self._writeQueue = collections.deque()
+        self._flushCall = None
+        BaseSocket.__init__(self,
+            state = self.Connecting,
+            readCallback = readCallback,
+            stateCallback = stateCallback,
+            name = name,
+        )
+
+    @property
+    def host(self):
+        return "loopback"
+
+    @property
+    def port(self):
+        return self._port
+
+    def read(self, nChar=None):
+        """!Read at most nChar characters (all available data if None). Do not block.
+
+        Raise RuntimeError if the socket is not connected.
+        """
+        if not self.isReady:
+            raise RuntimeError("%s not connected" % (self,))
+        if nChar is None:
+            data, self._readBuffer = self._readBuffer, ""
+        else:
+            data, self._readBuffer = self._readBuffer[0:nChar], self._readBuffer[nChar:]
+        self._readAgain()
+        return data
+
+    def readLine(self, default=None):
+        """!Read one line of data, not including the end-of-line indicator. Do not block.
+
+        @param[in] default  value to return if a full line is not available
+        Raise RuntimeError if the socket is not connected.
+        """
+        if not self.isReady:
+            raise RuntimeError("%s not connected" % (self,))
+        res = self.lineEndPattern.split(self._readBuffer, 1)
+        if len(res) == 1:
+            return default
+        self._readBuffer = res[1]
+        self._readAgain()
+        return res[0]
+
+    def write(self, data):
+        """!Queue data for delivery to the peer on the next reactor iteration
+
+        Raise RuntimeError if the socket is not connected.
+        """
+        if not self.isReady:
+            raise RuntimeError("%s.write(%r) failed: not connected" % (self, data))
+        self._writeQueue.append(str(data))
+        if self._flushCall is None:
+            self._flushCall = reactor.callLater(0, self._flush)
+
+    def writeLine(self, data):
+        """!Write a line of data terminated by \\r\\n
+        """
+        self.write(data + "\r\n")
+
+    def _flush(self):
+        """!Deliver all queued data to the peer
+        """
+        if self._flushCall is not None and self._flushCall.active():
+            self._flushCall.cancel()
+        self._flushCall = None
+        if not self._writeQueue:
+            return
+        data = "".join(self._writeQueue)
+        self._writeQueue.clear()
+        if self.peer is not None:
+            self.peer._receive(data)
+
+    def _receive(self, data):
+        """!Data arrived from the peer
+        """
+        if not self.isReady:
+            return
+        self._readBuffer += data
+        self._doRead()
+
+    def _readAgain(self):
+        """!If data remains after a read, call the read callback again (as RO's twisted sockets do)
+        """
+        if self._readBuffer:
+            reactor.callLater(0, self._doRead)
+
+    def _doRead(self):
+        if not self.isReady or not self._readBuffer:
+            return
+        try:
+            self._readCallback(self)
+        except Exception as e:
+            sys.stderr.write("%s read callback %s failed: %s\n" % (self, self._readCallback, e,))
+            traceback.print_exc(file=sys.stderr)
+
+    def _connectionMade(self):
+        if not self.isDone:
+            self._setState(self.Connected)
+
+    def _connectionLost(self, reason=None):
+        """!The connection is gone: finish closing or fail, as appropriate
+        """
+        if self.isDone:
+            return
+        if self.state == self.Closing:
+            self._setState(self.Closed, reason)
+        elif self.state == self.Failing:
+            self._setState(self.Failed, reason)
+        elif self.state == self.Connecting:
+            self._setState(self.Failed, reason or "connection refused")
+        else:
+            # closed by the peer
+            self._setState(self.Closed, reason)
+
+    def _basicClose(self):
+        """!Close this end, after delivering queued data; the peer is closed on the next iteration
+        """
+        reactor.callLater(0, self._finishClose)
+
+    def _finishClose(self):
+        self._flush()
+        peer = self.peer
+        self._connectionLost()
+        if peer is not None and peer.state != peer.Connecting:
+            reactor.callLater(0, peer._connectionLost)
+
+    def _clearCallbacks(self):
+        BaseSocket._clearCallbacks(self)
+        if self._flushCall is not None and self._flushCall.active():
+            self._flushCall.cancel()
+        self._flushCall = None
+
+    def _getArgStr(self):
+        return "name=%r, port=%r" % (self.name, self.port)
+
+
+class LoopbackServer(BaseServer):
+    """!An in-process server with the same interface as RO.Comm.TwistedSocket.TCPServer
+    """
+    def __init__(self,
+        port = 0,
+        connCallback = None,
+        stateCallback = None,
+        sockReadCallback = None,
+        sockStateCallback = None,
+        name = "",
+    ):
+        """!Construct a LoopbackServer; it starts Listening on the next reactor iteration
+
+        @param[in] port  nominal port, used only for reporting; if 0 then pick a unique number
+        @param[in] connCallback  function to call when a client connects; it receives one argument:
+            the server's LoopbackSocket for the connection
+        @param[in] stateCallback  function to call when the server changes state; it receives one argument: this server
+        @param[in] sockReadCallback  read callback for each server socket
+        @param[in] sockStateCallback  state callback for each server socket
+        @param[in] name  a string to identify this server
+        """
+        self._port = port or next(_portIter)
+        self._numConn = 0
+        self._sockList = []
+        BaseServer.__init__(self,
+            connCallback = connCallback,
+            stateCallback = stateCallback,
+            sockReadCallback = sockReadCallback,
+            sockStateCallback = sockStateCallback,
+            name = name,
+        )
+        reactor.callLater(0, self._startListening)
+
+    @property
+    def port(self):
+        return self._port
+
+    def connectClient(self, name="", stateCallback=None):
+        """!Start a connection to this server
+
+        @param[in] name  name for the client socket
+        @param[in] stateCallback  state callback for the client socket
+        @return the client LoopbackSocket; it becomes Connected on the next reactor iteration,
+            or Failed if the server is not listening
+        """
+        self._numConn += 1
+        clientSock = LoopbackSocket(name=name, stateCallback=stateCallback, port=self.port)
+        serverSock = LoopbackSocket(
+            name = "%s%d" % (self.name, self._numConn),
+            readCallback = self._sockReadCallback,
+            stateCallback = self._sockStateCallback,
+            port = self.port,
+        )
+        clientSock.peer = serverSock
+        serverSock.peer = clientSock
+        clientSock._setState(clientSock.Connecting) # report Connecting, as a new TCPSocket does
+        reactor.callLater(0, self._newConnection, serverSock)
+        return clientSock
+
+    def _startListening(self):
+        if self.state == self.Starting:
+            self._setState(self.Listening)
+
+    def _newConnection(self, serverSock):
+        clientSock = serverSock.peer
+        if not self.isReady:
+            clientSock._connectionLost("%s not listening" % (self,))
+            return
+        if clientSock.isDone:
+            return
+        self._sockList = [sock for sock in self._sockList if not sock.isDone]
+        self._sockList.append(serverSock)
+        serverSock._connectionMade()
+        try:
+            self._connCallback(serverSock)
+        except Exception as e:
+            sys.stderr.write("%s connection callback %s failed: %s\n" % (self, self._connCallback, e))
+            traceback.print_exc(file=sys.stderr)
+        clientSock._connectionMade()
+
+    def _basicClose(self):
+        """!Close all connections, then the server, on the next reactor iteration
+        """
+        for sock in self._sockList:
+            sock.close()
+        self._sockList = []
+        reactor.callLater(0, self._finishClose)
+
+    def _finishClose(self):
+        if self.isDone:
+            return
+        if self.state == self.Closing:
+            self._setState(self.Closed)
+        else:
+            self._setState(self.Failed)
+
+    def _getArgStr(self):
+        return "name=%r, port=%r" % (self.name, self.port)
+
+
+class LoopbackConnection(TCPConnection):
+    """!A TCPConnection that connects to a LoopbackServer instead of a TCP port
+    """
+    def __init__(self, server, **kwargs):
+        """!Construct a LoopbackConnection
+
+        @param[in] server  the LoopbackServer to connect to
+        @param[in] kwargs  other arguments for TCPConnection (but not host or port)
+        """
+        self.server = server
+        TCPConnection.__init__(self, host="loopback", port=server.port, **kwargs)
+
+    def connect(self, host=None, port=None, timeLim=None):
+        """!Open the connection; host, port and timeLim are ignored
+
+        Raise RuntimeError if already connecting or connected.
+        """
+        if not self.mayConnect:
+            raise RuntimeError("Cannot connect: already connecting or connected")
+
+        self._sock.setStateCallback() # remove socket state callback
+        if not self._sock.isDone:
+            self._sock.close()
+
+        self._sock = self.server.connectClient(
+            name = self._name,
+            stateCallback = self._sockStateCallback,
+        )
+        self._setRead(False)
+
+
+def setLoopbackConnection(device, server):
+    """!Make a device connect to a LoopbackServer instead of its TCP host and port
+
+    Replaces device.conn, keeping its read and state callbacks; call before connecting.
+
+    @param[in] device  a twistedActor TCPDevice (e.g. TCSDevice)
+    @param[in] server  the LoopbackServer of its fake controller
+    """
+    oldConn = device.conn
+    if not oldConn.isDisconnected:
+        raise RuntimeError("%s must be disconnected to switch to loopback" % (device.name,))
+    conn = LoopbackConnection(
+        server = server,
+        readLines = oldConn._readLines,
+        name = oldConn._name,
+    )
+    conn._userReadCallbacks = oldConn._userReadCallbacks
+    conn._stateCallbacks = oldConn._stateCallbacks
+    device.conn = conn
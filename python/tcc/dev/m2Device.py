@@ -2,16 +2,22 @@ from __future__ import division, absolute_import
 
 import numpy
 
-from RO.Comm.TwistedTimer import Timer
 from RO.StringUtil import strFromException
 
-from twistedActor import TCPDevice, DevCmd, CommandQueue, log, expandCommand
+from twistedActor import TCPDevice, DevCmd, CommandQueue, expandCommand
 
-__all__ = ["M2Device"]
+from tcc.utils.clock import Timer
+from tcc.utils.cmdTrace import cmdTracer
+from tcc.utils.devLog import getDevLog
+from tcc.utils.statusTap import StatusTap
+
+__all__ = ["M2Device", "PendingMove"]
 
 #TODO: fix move timeout, timeout should be set on device
 # commands, currently it is on the UserCmd
 
+secLog = getDevLog("sec")
+
 PollTime = 0.5 #seconds, LCO says status is updated no more frequently that 5 times a second
 # PollTime = 1
 # Speed = 25.0 # microns per second for focus
@@ -156,6 +162,103 @@ class Status(object):
             assert key in dir(self)
             setattr(self, key, val)
 
+class PendingMove(object):
+    """!Orientation requests that arrived while the mirror was moving
+
+    Absolute and relative requests are merged into one net request per axis,
+    to be commanded as a single move once the current move is done:
+    an absolute request replaces any earlier request for its axes,
+    and a relative request adds to the net request for its axes.
+    The user commands that asked for them are finished when that move finishes.
+    """
+    nAxes = 5
+
+    def __init__(self):
+        self.nRequests = 0 # total number of requests merged into a later move
+        self.nMoves = 0 # total number of merged moves commanded
+        self._clear()
+
+    def _clear(self):
+        self.absList = [None] * self.nAxes # absolute position of each axis, or None if not specified
+        self.offsetList = [0.] * self.nAxes # offset of each axis, relative to absList (or the current position)
+        self.nUsed = 0 # number of axes specified
+        self.userCmdList = []
+
+    @property
+    def isEmpty(self):
+        return not self.userCmdList
+
+    @property
+    def isOffset(self):
+        """True if no axis has an absolute request, so the net request is an offset
+        """
+        return all(absVal is None for absVal in self.absList)
+
+    def add(self, valueList, offset, userCmd, offsetList=None):
+        """!Merge a request into the net request
+
+        @param[in] valueList  list of 1 to 5 values: piston (um), tiltx ("), tilty ("), transx (um), transy (um);
+            None for an axis that is not to be changed
+        @param[in] offset  if true this is an offset, else an absolute position
+        @param[in] userCmd  command to finish when the merged move finishes
+        @param[in] offsetList  list of 1 to 5 offsets to add after valueList is applied; None for no offset
+        """
+        for ii, value in enumerate(valueList):
+            if value is None:
+                continue
+            if offset:
+                self.offsetList[ii] += value
+            else:
+                self.absList[ii] = value
+                self.offsetList[ii] = 0.
+        for ii, offsetVal in enumerate(offsetList or ()):
+            if offsetVal is not None:
+                self.offsetList[ii] += offsetVal
+        self.nUsed = max(self.nUsed, len(valueList), len(offsetList or ()))
+        self.userCmdList.append(userCmd)
+        self.nRequests += 1
+
+    def pop(self, currOrientation):
+        """!Return the net request and a command that finishes its user commands; then clear
+
+        @param[in] currOrientation  current orientation (5 values); used for axes that have an
+            absolute request on another axis but only an offset (or nothing) on this one
+        @return valueList, offset, mergedCmd: values and offset flag for M2Device.move,
+            and a command that, when finished, sets all contributing user commands to the same state
+        """
+        if self.isOffset:
+            valueList = self.offsetList[:self.nUsed]
+            offset = True
+        else:
+            valueList = [(curr if absVal is None else absVal) + offsetVal for curr, absVal, offsetVal
+                in zip(currOrientation, self.absList, self.offsetList)][:self.nUsed]
+            offset = False
+        userCmdList = self.userCmdList
+        self._clear()
+        self.nMoves += 1
+        mergedCmd = expandCommand()
+        def mergedCmdCallback(cmd):
+            if not cmd.isDone:
+                return
+            for userCmd in userCmdList:
+                if not userCmd.isDone:
+                    userCmd.setState(cmd.state, textMsg=cmd.textMsg)
+        mergedCmd.addCallback(mergedCmdCallback)
+        return valueList, offset, mergedCmd
+
+    def cancel(self, textMsg):
+        """!Fail all pending requests and clear
+        """
+        userCmdList = self.userCmdList
+        self._clear()
+        for userCmd in userCmdList:
+            if not userCmd.isDone:
+                userCmd.setState(userCmd.Failed, textMsg=textMsg)
+
+    def getStatsStr(self):
+        return "%d M2 requests merged into %d moves" % (self.nRequests, self.nMoves)
+
+
 class M2Device(TCPDevice):
     """!A Device for communicating with the M2 process."""
     def __init__(self, name, host, port, callFunc=None):
@@ -170,10 +273,13 @@ class M2Device(TCPDevice):
                 register a callback with "conn" for that task.
         """
         self.tccStatus = None # set by lcoTCCActor
+        self.statusTap = StatusTap("sec") # published each time a status is parsed
+        self.sessionLog = None # function(direction, line) to record raw traffic; see tcc.utils.sessionLog
         self.status = Status()
         self._statusTimer = Timer()
         self.waitMoveCmd = expandCommand()
         self.waitMoveCmd.setState(self.waitMoveCmd.Done)
+        self.pendingMove = PendingMove() # requests received while the mirror is moving
         priorityDict = {
             "status": 1,
             "speed": 1,
@@ -226,8 +332,7 @@ class M2Device(TCPDevice):
         """Called automatically on startup after the connection is established.
         Only thing to do is query for status or connect if not connected
         """
-        log.info("%s.init(userCmd=%s, timeLim=%s, getStatus=%s)" % (self, userCmd, timeLim, getStatus))
-        # print("%s.init(userCmd=%s, timeLim=%s, getStatus=%s)" % (self, userCmd, timeLim, getStatus))
+        secLog.info("%s.init(userCmd=%s, timeLim=%s, getStatus=%s)", self, userCmd, timeLim, getStatus)
         userCmd = expandCommand(userCmd)
         # if not self.isConnected:
         #     return self.connect(userCmd=userCmd)
@@ -268,6 +373,7 @@ class M2Device(TCPDevice):
         statusDict = self.status.getStatusDict()
         if self.tccStatus is not None:
             self.tccStatus.updateKWs(statusDict, self.currExeDevCmd)
+        self.statusTap.publish(self.status)
         if self.waitMoveCmd.isActive:
             if not self.isBusy:
                 # move is done
@@ -287,6 +393,7 @@ class M2Device(TCPDevice):
 
     def stop(self, userCmd=None):
         userCmd = expandCommand(userCmd)
+        self.pendingMove.cancel("Stop commanded")
         if not self.waitMoveCmd.isDone:
             self.waitMoveCmd.setState(self.waitMoveCmd.Cancelled, "Stop commanded")
         #print("sec stop commanded")
@@ -312,32 +419,53 @@ class M2Device(TCPDevice):
         At APO increasing focus corresponds to decreasing M1-M2 dist.
         The mirror controller at LCO convention is the opposite.
         """
-        log.info("%s.focus(userCmd=%s, focusValue=%.2f, offset=%s)" % (self, userCmd, focusValue, str(bool(offset))))
+        secLog.info("%s.focus(userCmd=%s, focusValue=%.2f, offset=%s)", self, userCmd, focusValue, bool(offset))
         # if this focus value is < 50 microns
         userCmd = expandCommand(userCmd)
         # focusDir = 1 # use M2's natural coordinates
         # focusDir = -1 # use convention at APO
         return self.move(valueList=[focusValue], offset=offset, userCmd=userCmd)
 
-    def move(self, valueList, offset=False, userCmd=None):
+    def move(self, valueList, offset=False, userCmd=None, offsetList=None):
         """Command an offset or absolute orientation move
 
-        @param[in] valueList: list of 1 to 5 values specifying pistion(um), tiltx("), tilty("), transx(um), transy(um)
+        @param[in] valueList: list of 1 to 5 values specifying pistion(um), tiltx("), tilty("), transx(um), transy(um);
+            None for an axis that is not to be changed
         @param[in] offset, if true this is offset, else absolute
         @param[in] userCmd: a twistedActor BaseCommand
+        @param[in] offsetList: list of 1 to 5 offsets, in the same units, to add to the axes after
+            valueList is applied; None for an axis (or all axes) not to be offset. This lets an absolute
+            move of some axes and an offset of others go out as one move.
+
+        If the mirror is moving, the request is merged with any others received during the move
+        and commanded as a single move when the current move is done (see PendingMove).
 
         Note: increasing distance eg pistion means increasing spacing between primary and
         secondary mirrors.
         """
-        log.info("%s.move(userCmd=%s, valueList=%s, offset=%s)" % (self, userCmd, str(valueList), str(bool(offset))))
+        secLog.info("%s.move(userCmd=%s, valueList=%s, offset=%s, offsetList=%s)",
+            self, userCmd, valueList, bool(offset), offsetList)
         userCmd = expandCommand(userCmd)
-        if not self.waitMoveCmd.isDone:
-            userCmd.setState(userCmd.Failed, "Mirror currently moving")
-            return userCmd
+        if offsetList is not None:
+            nAxes = max(len(valueList), len(offsetList))
+            valueList = list(valueList) + [None] * (nAxes - len(valueList))
+            offsetList = list(offsetList) + [None] * (nAxes - len(offsetList))
         if not 1<=len(valueList)<=5:
             userCmd.setState(userCmd.Failed, "Must specify 1 to 5 numbers for a move")
             return userCmd
+        if not self.waitMoveCmd.isDone:
+            # mirror is moving; merge this request into the next move
+            self.pendingMove.add(valueList, offset, userCmd, offsetList=offsetList)
+            secLog.info("%s mirror moving; %d requests pending", self, len(self.pendingMove.userCmdList))
+            return userCmd
+        if offset:
+            valueList = [0. if value is None else value for value in valueList]
+        else:
+            valueList = [curr if value is None else value for curr, value in zip(self.status.orientation, valueList)]
+        if offsetList is not None:
+            valueList = [value if offsetVal is None else value + offsetVal for value, offsetVal in zip(valueList, offsetList)]
         self.waitMoveCmd = expandCommand()
+        self.waitMoveCmd.addCallback(self._applyPendingMove)
         self.waitMoveCmd.userCmd = userCmd # for write to users
         self.status.desOrientation = self.status.orientation[:]
         if offset:
@@ -369,6 +497,19 @@ class M2Device(TCPDevice):
 
         return userCmd
 
+    def _applyPendingMove(self, waitMoveCmd):
+        """waitMoveCmd callback: when the move is done, command the pending move (if any)
+        """
+        if not waitMoveCmd.isDone or self.pendingMove.isEmpty:
+            return
+        if waitMoveCmd.didFail:
+            self.pendingMove.cancel("Previous M2 move failed: %s" % (waitMoveCmd.textMsg,))
+            return
+        valueList, offset, mergedCmd = self.pendingMove.pop(self.status.orientation)
+        secLog.info("%s commanding merged move valueList=%s, offset=%s; %s",
+            self, valueList, offset, self.pendingMove.getStatsStr())
+        self.move(valueList, offset=offset, userCmd=mergedCmd)
+
     def getTimeForMove(self):
         dist2Move = numpy.max(numpy.abs(numpy.subtract(self.status.desOrientation, self.status.orientation)))
         time4Move = dist2Move / self.status.speed
@@ -377,7 +518,7 @@ class M2Device(TCPDevice):
     def lampOn(self, userCmd=None):
         """Toggle power to the ff lamp (the 5th relay at the M2 position)
         """
-        log.info("%s.lampOn(userCmd=%s)" % (self, userCmd))
+        secLog.info("%s.lampOn(userCmd=%s)", self, userCmd)
         userCmd = expandCommand(userCmd)
         userCmd.setTimeLimit(2)
         lampCmd = DevCmd("lamp %i 1"%RelayPosM2)
@@ -388,7 +529,7 @@ class M2Device(TCPDevice):
     def lampOff(self, userCmd=None):
         """Toggle power to the ff lamp (the 5th relay at the M2 position)
         """
-        log.info("%s.lampOff(userCmd=%s)" % (self, userCmd))
+        secLog.info("%s.lampOff(userCmd=%s)", self, userCmd)
         userCmd = expandCommand(userCmd)
         lampCmd = DevCmd("lamp %i 0"%RelayPosM2)
         userCmd.linkCommands([lampCmd])
@@ -406,8 +547,9 @@ class M2Device(TCPDevice):
         - Manage the pending commands
         - Parse status to update the model parameters
         """
-        log.info("%s read %r, currCmdStr: %s" % (self, replyStr, self.currDevCmdStr))
-        # print("%s read %r, currCmdStr: %s" % (self, replyStr, self.currDevCmdStr))
+        secLog.debug("%s read %r, currCmdStr: %s", self, replyStr, self.currDevCmdStr)
+        if self.sessionLog is not None:
+            self.sessionLog("r", replyStr)
         replyStr = replyStr.strip()
         if not replyStr:
             return
@@ -417,7 +559,7 @@ class M2Device(TCPDevice):
         if "error" in replyStr.lower():
             # error
             errStr = "Error in M2 reply: %s, current cmd: %s"%(replyStr, self.currExeDevCmd.cmdStr)
-            log.info(errStr)
+            secLog.info(errStr)
             self.currExeDevCmd.writeToUsers("w", errStr)
         # if this was a speed command, set it
         if self.currDevCmdStr.lower() == "speed":
@@ -435,13 +577,13 @@ class M2Device(TCPDevice):
         @param[in] cmdStr, string to send to the device.
         """
         cmdStr = devCmd.cmdStr
-        log.info("%s.queueDevCmd(cmdStr=%r, cmdQueue: %r"%(self, cmdStr, self.devCmdQueue))
-        # print("%s.queueDevCmd(devCmd=%r, devCmdStr=%r, cmdQueue: %r"%(self, devCmd, devCmd.cmdStr, self.devCmdQueue))
+        secLog.debug("%s.queueDevCmd(cmdStr=%r, cmdQueue: %r", self, cmdStr, self.devCmdQueue)
         # append a cmdVerb for the command queue (other wise all get the same cmdVerb and cancel eachother)
         # could change the default behavior in CommandQueue?
         devCmd.cmdVerb = cmdStr.split()[0]
         def queueFunc(devCmd):
             self.startDevCmd(devCmd)
+        cmdTracer.traceDevCmd(devCmd, self.name)
         self.devCmdQueue.addCmd(devCmd, queueFunc)
         return devCmd
 
@@ -451,10 +593,10 @@ class M2Device(TCPDevice):
         @param[in] devCmdStr a line of text to send to the device
         """
         devCmdStr = devCmd.cmdStr.lower() # m2 uses all lower case
-        log.info("%s.startDevCmd(%r)" % (self, devCmdStr))
+        secLog.debug("%s.startDevCmd(%r)", self, devCmdStr)
         try:
             if self.conn.isConnected:
-                log.info("%s writing %r" % (self, devCmdStr))
+                secLog.debug("%s writing %r", self, devCmdStr)
                 # set move command to running now. Bug if set earlier race condition
                 # with status
                 if "move" in devCmdStr.lower() or "offset" in devCmdStr.lower():
@@ -464,6 +606,8 @@ class M2Device(TCPDevice):
                         self.tccStatus.updateKW("secState", self.status.secStateStr(), devCmd)
                 # if "galil" in devCmdStr.lower():
                 #     self.waitGalilCmd.setState(self.waitGalilCmd.Running)
+                if self.sessionLog is not None:
+                    self.sessionLog("w", devCmdStr)
                 self.conn.writeLine(devCmdStr)
             else:
                 self.currExeDevCmd.setState(self.currExeDevCmd.Failed, "Not connected to M2")
@@ -4,12 +4,17 @@ import re
 
 import numpy
 
-from twistedActor import TCPDevice, log, DevCmd, CommandQueue, expandCommand
+from twistedActor import TCPDevice, DevCmd, CommandQueue, expandCommand
 
 from RO.StringUtil import strFromException
 
+from tcc.utils.cmdTrace import cmdTracer
+from tcc.utils.devLog import getDevLog
+
 __all__ = ["MeasScaleDevice"]
 
+measScaleLog = getDevLog("measscale")
+
 READ_PREFIX = "GA0"
 READ_ENC1 = "GA01"
 READ_ENC2 = "GA02"
@@ -40,6 +45,7 @@ class MeasScaleDevice(TCPDevice):
         # if I could preset the mitutoyo's this would be unnecessary
         # the preset command "CP**" doesn't seem to work.
         self.tccStatus = None # set by tccLCOActor
+        self.sessionLog = None # function(direction, line) to record raw traffic; see tcc.utils.sessionLog
         self.encPos = [None]*3
         self.devCmdQueue = CommandQueue({})
 
@@ -63,7 +69,7 @@ class MeasScaleDevice(TCPDevice):
 
     @property
     def isHomed(self):
-        print("scaleIs homed, ", self.encPos)
+        measScaleLog.verbose("%s.isHomed: encPos=%s", self, self.encPos)
         if None in self.encPos:
             return False
         else:
@@ -84,7 +90,7 @@ class MeasScaleDevice(TCPDevice):
 
         getStatus ignored?
         """
-        log.info("%s.init(userCmd=%s, timeLim=%s, getStatus=%s)" % (self, userCmd, timeLim, getStatus))
+        measScaleLog.info("%s.init(userCmd=%s, timeLim=%s, getStatus=%s)", self, userCmd, timeLim, getStatus)
         userCmd = expandCommand(userCmd)
         #self.getStatus(userCmd) # status links the userCmd
         return userCmd
@@ -135,15 +141,15 @@ class MeasScaleDevice(TCPDevice):
 
         @param[in] replyStr   the reply, minus any terminating \n
         """
-        log.info("%s.handleReply(replyStr=%s)" % (self, replyStr))
-        print("%s.handleReply(replyStr=%s)" % (self, replyStr))
+        measScaleLog.debug("%s.handleReply(replyStr=%s)", self, replyStr)
+        if self.sessionLog is not None:
+            self.sessionLog("r", replyStr)
         replyStr = replyStr.strip()
         if not replyStr:
             return
         if self.currExeDevCmd.isDone:
             # ignore unsolicited output?
-            print("unsolicited!")
-            log.info("%s usolicited reply: %s for done command %s" % (self, replyStr, str(self.currExeDevCmd)))
+            measScaleLog.info("%s usolicited reply: %s for done command %s", self, replyStr, self.currExeDevCmd)
             return
 
         if self.currExeDevCmd.cmdStr in [COUNTING_STATE, ZERO_SET, DISPLAY_CURR]:
@@ -176,7 +182,7 @@ class MeasScaleDevice(TCPDevice):
             gaugeNumQueried = int(self.currExeDevCmd.cmdStr[-1]) - 1
             gaugeMatch = gaugeRE.search(replyStr)
             if gaugeMatch is None:
-                print("gauge match failed")
+                measScaleLog.verbose("%s gauge match failed for %r", self, replyStr)
                 self.encPos[gaugeNumQueried] = None
                 self.currExeDevCmd.writeToUsers("w",  "Failed to match mitutoyo output: %s. Are they in counting state? Homing may be necessary."%replyStr)
                 self.currExeDevCmd.setState(self.currExeDevCmd.Done, "Failed to match mitutoyo output: %s. Are they in counting state? Homing may be necessary."%replyStr)
@@ -200,11 +206,11 @@ class MeasScaleDevice(TCPDevice):
                                 reference.
         """
         devCmdStr = devCmd.cmdStr
-        log.info("%s.queueDevCmd(devCmdStr=%r, cmdQueue: %r"%(self, devCmdStr, self.devCmdQueue))
-        print("%s.queueDevCmd(devCmdStr=%r, cmdQueue: %r"%(self, devCmdStr, self.devCmdQueue))
+        measScaleLog.debug("%s.queueDevCmd(devCmdStr=%r, cmdQueue: %r", self, devCmdStr, self.devCmdQueue)
         # append a cmdVerb for the command queue (otherwise all get the same cmdVerb and cancel eachother)
         # could change the default behavior in CommandQueue?
         devCmd.cmdVerb = devCmdStr
+        cmdTracer.traceDevCmd(devCmd, self.name)
         self.devCmdQueue.addCmd(devCmd, self.startDevCmd)
         return devCmd
 
@@ -213,13 +219,13 @@ class MeasScaleDevice(TCPDevice):
         """
         @param[in] devCmd a dev command
         """
-        log.info("%s.startDevCmd(%r)" % (self, devCmd.cmdStr))
-        #print("%s.startDevCmd(%r)" % (self, devCmd.cmdStr))
+        measScaleLog.debug("%s.startDevCmd(%r)", self, devCmd.cmdStr)
         try:
             if self.conn.isConnected:
-                log.info("%s writing %r" % (self, devCmd.cmdStr))
-                print("meas scale writing", devCmd.cmdStr)
+                measScaleLog.debug("%s writing %r", self, devCmd.cmdStr)
                 devCmd.setState(devCmd.Running)
+                if self.sessionLog is not None:
+                    self.sessionLog("w", devCmd.cmdStr)
                 self.conn.writeLine(devCmd.cmdStr)
             else:
                 self.currExeDevCmd.setState(self.currExeDevCmd.Failed, "Not connected")
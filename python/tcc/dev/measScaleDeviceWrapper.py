@@ -3,6 +3,7 @@ from __future__ import division, absolute_import
 from twistedActor import DeviceWrapper
 
 from .measScaleDevice import MeasScaleDevice
+from .loopback import setLoopbackConnection
 from .fakeLCODevs import FakeMeasScaleCtrl
 
 __all__ = ["MeasScaleDeviceWrapper"]
@@ -16,6 +17,8 @@ class MeasScaleDeviceWrapper(DeviceWrapper):
         port = 0,
         debug = False,
         logReplies = False,
+        linkProfile = None,
+        loopback = False,
     ):
         """!Construct a MeasScaleDeviceWrapper that manages its fake axis controller
 
@@ -25,11 +28,17 @@ class MeasScaleDeviceWrapper(DeviceWrapper):
         @param[in] port  port for device; 0 to assign a free port
         @param[in] debug  if True, print debug messages
         @param[in] logReplies  should the FakeAxisCtrl print replies to stdout?
+        @param[in] linkProfile  a LinkProfile for the fake controller's replies; None for an ideal link
+        @param[in] loopback  if True, connect the device to its fake controller in-process
+            (see tcc.dev.loopback) instead of over TCP
         """
         controller = FakeMeasScaleCtrl(
             name = name,
             port = port,
+            linkProfile = linkProfile,
+            loopback = loopback,
         )
+        self.loopback = bool(loopback)
         DeviceWrapper.__init__(self, name=name, stateCallback=stateCallback, controller=controller, debug=debug)
 
     def _makeDevice(self):
@@ -41,10 +50,13 @@ class MeasScaleDeviceWrapper(DeviceWrapper):
             host="localhost",
             port=port,
         )
+        if self.loopback:
+            setLoopbackConnection(self.device, self.controller.server)
 
     def _basicClose(self):
         """Explicitly kill all timers
         """
+        self.controller.cancelReplies()
         return DeviceWrapper._basicClose(self)
 
 if __name__ == "__main__":
@@ -1,17 +1,19 @@
 from __future__ import division, absolute_import
 
-import time
-import sys
 import traceback
 from collections import Counter
 
 # from RO.StringUtil import strFromException
 import numpy
 
-from twistedActor import TCPDevice, log, DevCmd, CommandQueue, expandCommand
+from twistedActor import TCPDevice, DevCmd, CommandQueue, expandCommand
 
 from RO.StringUtil import strFromException
-from RO.Comm.TwistedTimer import Timer
+
+from tcc.utils.clock import Timer, getClock
+from tcc.utils.cmdTrace import cmdTracer
+from tcc.utils.devLog import getDevLog
+from tcc.utils.statusTap import StatusTap
 
 # tests:
 # fault an axis
@@ -47,6 +49,8 @@ from RO.Comm.TwistedTimer import Timer
 
 __all__ = ["ScaleDevice"]
 
+scaleLog = getDevLog("scale")
+
 # M2 nominal speed is 25 um/sec
 # so scale nominal speed should be 25 * 7 um/sec
 # or 0.175 mm/sec
@@ -101,7 +105,7 @@ class Status(object):
         self.currIter = currIter
         self._state = state
         self._totalTime = totalTime
-        self._timeStamp = time.time()
+        self._timeStamp = getClock().time()
 
     @property
     def moveRange(self):
@@ -358,6 +362,9 @@ class ScaleDevice(TCPDevice):
                 register a callback with "conn" for that task.
         """
         self.tccStatus = None # set by tccLCOActor
+        self.statusTap = StatusTap("scale") # published each time status is reported
+        self.positionTap = StatusTap("scalePosition") # published each time a move reports actual_position
+        self.sessionLog = None # function(direction, line) to record raw traffic; see tcc.utils.sessionLog
         self.targetPos = None
         # holds a userCommand for "move"
         # set done only when move has reached maxIter
@@ -464,7 +471,7 @@ class ScaleDevice(TCPDevice):
         """Called automatically on startup after the connection is established.
         Only thing to do is query for status or connect if not connected
         """
-        log.info("%s.init(userCmd=%s, timeLim=%s, getStatus=%s)" % (self, userCmd, timeLim, getStatus))
+        scaleLog.info("%s.init(userCmd=%s, timeLim=%s, getStatus=%s)", self, userCmd, timeLim, getStatus)
         userCmd = expandCommand(userCmd)
         # stop, set speed, then status?
         devCmds = [DevCmd(cmdStr=cmdStr) for cmdStr in ["stop", "speed %.4f"%self.nomSpeed, "status"]]
@@ -509,6 +516,7 @@ class ScaleDevice(TCPDevice):
     def _statusCallback(self, statusCmd):
         if statusCmd.isDone:
             self.status.setThreadAxisCurrent()
+            self.statusTap.publish(self.status)
             if self.isMoving or self.status._state == self.status.Homing:
                 self._statusTimer.start(POLL_TIME_MOVING, self.getStatus)
                 # moving write to this command
@@ -520,7 +528,7 @@ class ScaleDevice(TCPDevice):
 
     def getStateVal(self):
         # determine time remaining in this state
-        timeElapsed = time.time() - self.status._timeStamp
+        timeElapsed = getClock().time() - self.status._timeStamp
         # cannot have negative time remaining
         timeRemaining = max(0, self.status._totalTime - timeElapsed)
         # explicitly check for isHomed and set accordingly
@@ -597,7 +605,7 @@ class ScaleDevice(TCPDevice):
     def writeStatusToUsers(self, userCmd):
         """Write the current status to all users
         """
-        print("writeStatusToUsers")
+        scaleLog.verbose("%s.writeStatusToUsers", self)
         faultStr = self.getFaultStr()
         if faultStr is not None:
             userCmd.writeToUsers("w", faultStr)
@@ -609,7 +617,7 @@ class ScaleDevice(TCPDevice):
 
     def writeState(self, userCmd=None):
         if self.tccStatus is not None:
-            print("scale dev write state", self.getStateVal())
+            scaleLog.verbose("%s.writeState: %s", self, self.getStateVal())
             self.tccStatus.updateKW("ThreadRingState", self.getStateVal(), userCmd)
 
 
@@ -651,7 +659,7 @@ class ScaleDevice(TCPDevice):
         return "move %.6f"%(targetPos)
 
     def home(self, userCmd=None):
-        log.info("%s.home(userCmd=%s)" % (self, userCmd))
+        scaleLog.info("%s.home(userCmd=%s)", self, userCmd)
         userCmd = expandCommand(userCmd)
         # set state homing
         self.status.setState(self.status.Homing, 0)
@@ -679,7 +687,7 @@ class ScaleDevice(TCPDevice):
         @param[in] postion: a float, position to move (the encoder!) to (mm)
         @param[in] userCmd: a twistedActor BaseCommand
         """
-        log.info("%s.move(postion=%.6f, userCmd=%s)" % (self, position, userCmd))
+        scaleLog.info("%s.move(postion=%.6f, userCmd=%s)", self, position, userCmd)
         userCmd=expandCommand(userCmd)
         if not self.isHomed:
             userCmd.setState(userCmd.Failed, "Scaling ring not homed.  Issue threadring home.")
@@ -740,15 +748,16 @@ class ScaleDevice(TCPDevice):
 
         @param[in] replyStr   the reply, minus any terminating \n
         """
-        print("scaling ring reply: %s"%replyStr)
-        log.info("%s.handleReply(replyStr=%s)" % (self, replyStr))
+        scaleLog.debug("%s.handleReply(replyStr=%s)", self, replyStr)
+        if self.sessionLog is not None:
+            self.sessionLog("r", replyStr)
         replyStr = replyStr.strip().lower()
         # print(replyStr, self.currExeDevCmd.cmdStr)
         if not replyStr:
             return
         if self.currExeDevCmd.isDone:
             # ignore unsolicited output?
-            log.info("%s usolicited reply: %s for done command %s" % (self, replyStr, str(self.currExeDevCmd)))
+            scaleLog.info("%s usolicited reply: %s for done command %s", self, replyStr, self.currExeDevCmd)
             return
         if replyStr == "ok":
             # print("got ok", self.currExeDevCmd.cmdStr)
@@ -759,16 +768,17 @@ class ScaleDevice(TCPDevice):
                     self.status.checkFullStatus()
                 except MungedStatusError as statusError:
                     # status was munged, try again
-                    print("statusError", statusError)
+                    scaleLog.info("%s munged status: %s", self, statusError)
                     self.status.nIter += 1
                     if self.status.nIter > self.status.maxIter:
                         self.currExeDevCmd.setState(self.currExeDevCmd.Failed, "%s status mangled"%str(self))
                     else:
-                        print("status munged, rewriting status")
-                        log.info("%s writing %r iter %i" % (self, "status", self.status.nIter))
+                        scaleLog.debug("%s writing %r iter %i", self, "status", self.status.nIter)
+                        if self.sessionLog is not None:
+                            self.sessionLog("w", "status")
                         self.conn.writeLine("status")
                     return
-                print("status done and good")
+                scaleLog.verbose("%s status done and good", self)
             self.currExeDevCmd.setState(self.currExeDevCmd.Done)
         elif replyStr == self.currExeDevCmd.cmdStr:
             # command echo
@@ -782,19 +792,20 @@ class ScaleDevice(TCPDevice):
                 self.status.parseStatusLine(replyStr)
             except:
                 errMsg = "Scale Device failed to parse: %s"%str(replyStr)
-                print("Exception parsing line in scaling ring (this is ok the code will try again if it's and important piece of status:")
-                print(traceback.print_exc(file=sys.stdout))
-                log.error(errMsg)
+                # this is ok the code will try again if it's an important piece of status
+                if scaleLog.isVerbose:
+                    scaleLog.verbose(traceback.format_exc())
+                scaleLog.error(errMsg)
         elif "move" in self.currExeDevCmd.cmdStr.lower():
-            print("move reply", replyStr)
             if "actual_position" in replyStr:
-                print("actuatl pos in reply", replyStr)
                 junk, val = replyStr.split("actual_position")
                 try:
                     val = float(val)
                     self.status.dict["thread_ring_axis"]["actual_position"] = val
                 except:
                    pass
+                else:
+                    self.positionTap.publish(self.status)
 
 
     def queueDevCmd(self, devCmd):
@@ -803,7 +814,7 @@ class ScaleDevice(TCPDevice):
         @param[in] devCmdStr: a command string to send to the device.
         """
         devCmdStr = devCmd.cmdStr
-        log.info("%s.queueDevCmd(devCmdStr=%r, cmdQueue: %r"%(self, devCmdStr, self.devCmdQueue))
+        scaleLog.debug("%s.queueDevCmd(devCmdStr=%r, cmdQueue: %r", self, devCmdStr, self.devCmdQueue)
         # append a cmdVerb for the command queue (otherwise all get the same cmdVerb and cancel eachother)
         # could change the default behavior in CommandQueue?
         cmdVerb = devCmdStr.split()[0]
@@ -820,6 +831,7 @@ class ScaleDevice(TCPDevice):
                 # gotten a full status when done.
                 self.status.flushStatus()
             self.startDevCmd(devCmd.cmdStr)
+        cmdTracer.traceDevCmd(devCmd, self.name)
         self.devCmdQueue.addCmd(devCmd, queueFunc)
         return devCmd
 
@@ -829,11 +841,12 @@ class ScaleDevice(TCPDevice):
         @param[in] devCmdStr a line of text to send to the device
         """
         devCmdStr = devCmdStr.lower()
-        log.info("%s.startDevCmd(%r)" % (self, devCmdStr))
+        scaleLog.debug("%s.startDevCmd(%r)", self, devCmdStr)
         try:
             if self.conn.isConnected:
-                print("writing to scaling ring: %s"%devCmdStr)
-                log.info("%s writing %r" % (self, devCmdStr))
+                scaleLog.debug("%s writing %r", self, devCmdStr)
+                if self.sessionLog is not None:
+                    self.sessionLog("w", devCmdStr)
                 self.conn.writeLine(devCmdStr)
             else:
                 self.currExeDevCmd.setState(self.currExeDevCmd.Failed, "Not connected to Scale Controller")
@@ -1,19 +1,24 @@
 from __future__ import division, absolute_import
 
 import collections
-import time
+import functools
+import math
+
 import numpy
 
-from RO.Comm.TwistedTimer import Timer
 from RO.Astro.Sph.AzAltFromHADec import azAltFromHADec
 from RO.Astro.Sph.HADecFromAzAlt import haDecFromAzAlt
 from RO.StringUtil import strFromException, degFromDMSStr
 
-from twistedActor import TCPDevice, DevCmd, CommandQueue, log, expandCommand
+from twistedActor import TCPDevice, DevCmd, CommandQueue, expandCommand
 
+from tcc.utils.astrometry import LCO_LATITUDE, deriveTCSFields, lastFromPySec
 from tcc.utils.ffs import get_ffs_altitude, telescope_alt_limit
+from tcc.utils.clock import Timer, getClock
+from tcc.utils.cmdTrace import cmdTracer
+from tcc.utils.devLog import getDevLog
+from tcc.utils.statusTap import StatusTap
 
-from twisted.internet import reactor
 #TODO: Combine offset wait command and rotation offset wait commands.
 # make queueDev command return a dev command rather than requiring one.
 # creat a command list where subsequent commands are not sent if the previous is not successful
@@ -21,12 +26,29 @@ from twisted.internet import reactor
 # maybe we don't want this behavior in the case of the rotator, because we always want it
 # to clamp!!!
 
+tcsLog = getDevLog("tcs")
+
 SEC_TIMEOUT = 2.0
 MAX_OFFSET_WAIT = 60.0
-LCO_LATITUDE = -29.0146
 
 def tai():
-    return time.time() - 36.
+    return getClock().time() - 36.
+
+def _getVerb(devCmd):
+    """Return the verb of a TCS device command, in upper case
+    """
+    return devCmd.cmdStr.split()[0].upper() if devCmd.cmdStr else ""
+
+def _isDoneOnTimeout(devCmd):
+    """Return True if a TCS device command is set done, rather than failed, if it gets no reply
+    """
+    return VerbTimeLimitDict.get(_getVerb(devCmd), (SEC_TIMEOUT, False))[1]
+
+def _cancelWhenDone(cmd, delayedCall):
+    """Command callback: cancel a pending delayed call when the command is done
+    """
+    if cmd.isDone and delayedCall.active():
+        delayedCall.cancel()
 
 __all__ = ["TCSDevice"]
 # ForceSlew = "ForceSlew"
@@ -74,16 +96,81 @@ def SlewTimeRA(deg):
 def SlewTimeDec(deg):
     return deg * DECSCALE / float(DECSP)
 
+def wrapDeltaAngle(deg):
+    """Wrap an angle difference (degrees) into the range [-180, 180)
+    """
+    return ((deg + 180.) % 360.) - 180.
+
+def predictSlewTime(dHA, dDec, dScreen=0):
+    """Predict the duration (sec) of a slew
+
+    HA and Dec move at once, each at full speed (HASP, DECSP); the flat field screen
+    moves at the same time at ScreenSpeed. SlewSettleTime is added for acceleration,
+    fine correction and settling.
+
+    @param[in] dHA  change in hour angle (degrees)
+    @param[in] dDec  change in declination (degrees)
+    @param[in] dScreen  change in screen altitude (degrees)
+    """
+    mountTime = max(abs(SlewTimeRA(dHA)), abs(SlewTimeDec(dDec)))
+    return max(mountTime, abs(dScreen) / ScreenSpeed) + SlewSettleTime
+
+def rotMoveTime(deg):
+    """Predict the time (sec) the rotator takes to move deg degrees, not including clamping
+
+    The rotator accelerates at IRAC to IRFASTSP, cruises, then decelerates at IRDC
+    (a trapezoidal velocity profile); a short move never reaches full speed and
+    decelerates as soon as it has finished accelerating (a triangular profile).
+    """
+    encCounts = abs(deg / IRSCALE)
+    accelTime = IRFASTSP / float(IRAC)
+    decelTime = IRFASTSP / float(IRDC)
+    rampCounts = 0.5 * IRFASTSP * (accelTime + decelTime)
+    if encCounts >= rampCounts:
+        return accelTime + decelTime + (encCounts - rampCounts) / float(IRFASTSP)
+    peakSpeed = math.sqrt(2 * encCounts / (1. / IRAC + 1. / IRDC))
+    return peakSpeed / IRAC + peakSpeed / IRDC
+
+ScreenSpeed = 0.5 # degrees/sec; approximate speed of the flat field screen (not in c100.ini)
+SlewSettleTime = 5 # seconds; allowance for acceleration, fine correction and settling at the end of a slew
+SlewPollLead = 3 # seconds; poll at PollTimeSlew from this long before the predicted end of a slew
+SlewTimeLimFactor = 2 # waitSlewCmd time limit = SlewTimeLimFactor * predicted slew time + SlewTimeLimMargin
+SlewTimeLimMargin = 60 # seconds
+
 PollTimeRot = 0.5 # if rotator is slewing query frequently
+PollTimeRotFast = 0.1 # seconds; poll the clamp this often near the predicted end of a rotator move
+RotPollLead = 0.3 # seconds; start fast clamp polling this long before the predicted end of a rotator move
+# status queried by the fast clamp poll; rawpos is read before mrp so that when the clamp reading
+# ends a move (see checkRotClamp) a pending rotator offset is applied from a fresh position
+RotStatusVerbs = ("rawpos", "mrp", "axisstatus")
 PollTimeSlew = 0.5 #seconds, LCO says status is updated no more frequently that 5 times a second
 PollTimeTrack = 2
 PollTimeIdle = 5
 # FocusPosTol = 0.001 # microns?
 ArcSecPerDeg = 3600 # arcseconds per degree
+
+# status verbs computed locally from pos and the clock (see tcc.utils.astrometry),
+# rather than polled, and how far (deg; airmass: unitless) the values read by a cross check
+# may be from the local values
+DerivedVerbTolDict = {
+    "st": 0.05,
+    "ha": 0.05,
+    "telaz": 0.5,
+    "telel": 0.2,
+    "zd": 0.2,
+    "airmass": 0.02,
+}
+WrappedDerivedVerbs = ("st", "ha", "telaz") # compared modulo 360 degrees
+CrossCheckInterval = 600 # seconds between polls that also read the derived verbs from the TCS
+# a cross check is only made while tracking, since the verbs of a poll are read at different times;
+# local astrometry is only given up after this many cross checks in a row disagree
+CrossCheckMaxMismatches = 3
+CrossCheckMaxAlt = 85 # degrees; azimuth is not cross checked above this altitude
 MinRotOffset = 2 / ArcSecPerDeg # minimum commandable rotator offset
 # MaxRotOffset = 60 / ArcSecPerDeg # max commandable rotator offset
 MaxRotOffset = 1000 / ArcSecPerDeg
-UnclampWaitTime = 7 # measured with a stopwatch to be 5 seconds listening to motors, add 2 extra secs buffer
+UnclampTime = 5 # sec from APGCIR to the rotator moving; measured with a stopwatch listening to motors
+UnclampWaitTime = 7 # UnclampTime plus 2 extra secs buffer
 ClampFudgeTime = 0.5 #seconds.  Time delay between perceived end of rotation and issuing "clamp"
 # RotSpeed = 1 # in degrees/second for setting timeout.
 
@@ -95,6 +182,17 @@ Tracking = "Tracking"
 Slewing = "Slewing"
 
 CMDOFF = "OFFP"
+OffsetVerbs = ("OFRA", "OFDC", CMDOFF) # verbs of an ra/dec offset
+# a batch writes a barrier verb only once all earlier commands in the batch have succeeded,
+# so a move is never started with a partly set target (see TCSDevice.queueDevCmdBatch)
+BarrierVerbs = ("MP", CMDOFF)
+# verb: (time limit (sec), set done rather than failed if there is no reply by then?);
+# verbs not listed get SEC_TIMEOUT and fail. MP occasionally gets no reply, and that
+# should not fail a target command. Later commands in a batch are not written until
+# such a command is done (see TCSDevice.queueDevCmdBatch).
+VerbTimeLimitDict = {
+    "MP": (2.0, True),
+}
 
 TelStateEnumNameDict = collections.OrderedDict((
     (1, Halted),
@@ -192,7 +290,7 @@ def castScreenPos(lcoReply):
         screenPos = items[6].strip()
         return float(screenPos)
     except:
-        print("error parsing lco screen pos: ", screenPos)
+        tcsLog.warn("error parsing lco screen pos: %r", lcoReply)
         return 0
 
 
@@ -209,11 +307,13 @@ class StatusField(object):
         self.cmdVerb = cmdVerb
         self.castFunc = castFunc
         self.value = None
+        self.replyStr = None # raw lco output that value was parsed from; None if value was computed locally
 
     def setValue(self, lcoReply):
         """Set the value attribute from the raw lco output
         """
         self.value = self.castFunc(lcoReply)
+        self.replyStr = lcoReply
 
 
 StatusFieldList = [
@@ -236,11 +336,11 @@ StatusFieldList = [
                 # StatusField("had", float), # I think degrees, only for input?
                 StatusField("epoch", float),
                 StatusField("zd", float),
+                StatusField("rawpos", castRawPos), # before mrp; see RotStatusVerbs
                 StatusField("mrp", castClamp),
                 StatusField("axisstatus", castAxis), #unhack this!
                 StatusField("temps", castTemps),
                 StatusField("ttruss", float),
-                StatusField("rawpos", castRawPos),
                 StatusField("airmass", float),
                 StatusField("lplc", castScreenPos)
             ]
@@ -274,6 +374,80 @@ class Status(object):
         self.offDec = None
         self.offRA = None
         self.telState = None
+        # compute DerivedVerbTolDict verbs locally? Cleared if CrossCheckMaxMismatches cross checks in a row fail
+        self.useLocalAstrometry = True
+        self.nextCrossCheckTime = 0
+        self.nCrossCheckMismatches = 0 # number of cross checks in a row that have disagreed
+
+    def getPollVerbs(self):
+        """Return the status verbs to query and whether the poll is a cross check of local astrometry
+
+        While local astrometry is in use the derived verbs are left out, except every
+        CrossCheckInterval seconds while the telescope is tracking; a cross check that is
+        due waits until the telescope is tracking.
+        """
+        if not self.useLocalAstrometry:
+            return list(self.statusFieldDict.keys()), False
+        if getClock().time() >= self.nextCrossCheckTime and self.statusFieldDict["state"].value == Tracking:
+            return list(self.statusFieldDict.keys()), True
+        return [verb for verb in self.statusFieldDict.keys() if verb not in DerivedVerbTolDict], False
+
+    def deriveAstrometry(self):
+        """Set the values of the derived status fields from pos and the current time
+        """
+        pos = self.statusFieldDict["pos"].value
+        if pos is None:
+            return
+        for verb, value in deriveTCSFields(pos, getClock().time()).items():
+            self.statusFieldDict[verb].value = float(value)
+            self.statusFieldDict[verb].replyStr = None
+
+    def crossCheckAstrometry(self):
+        """Compare the derived status fields just read from the TCS to the local values
+
+        If the telescope stopped tracking during the poll the check is put off to the next
+        tracking poll. If any disagree, the check is repeated on the next poll; once
+        CrossCheckMaxMismatches checks in a row disagree, stop using local astrometry:
+        all fields are polled from then on.
+
+        @return a list of mismatches, as strings
+        """
+        pos = self.statusFieldDict["pos"].value
+        if pos is None or self.statusFieldDict["state"].value != Tracking:
+            return []
+        localDict = deriveTCSFields(pos, getClock().time())
+        mismatchList = []
+        for verb, tol in sorted(DerivedVerbTolDict.items()):
+            tcsValue = self.statusFieldDict[verb].value
+            if tcsValue is None:
+                continue
+            if verb == "telaz" and localDict["telel"] > CrossCheckMaxAlt:
+                continue
+            diff = tcsValue - localDict[verb]
+            if verb in WrappedDerivedVerbs:
+                diff = wrapDeltaAngle(diff)
+            if abs(diff) > tol:
+                mismatchList.append("%s: tcs=%.4f, local=%.4f" % (verb, tcsValue, localDict[verb]))
+        if mismatchList:
+            self.nCrossCheckMismatches += 1
+            if self.nCrossCheckMismatches >= CrossCheckMaxMismatches:
+                self.useLocalAstrometry = False
+                tcsLog.warn("Local astrometry disagrees with the TCS; polling all status from now on: %s",
+                    "; ".join(mismatchList))
+            else:
+                tcsLog.info("Local astrometry disagrees with the TCS (%i of %i); checking again: %s",
+                    self.nCrossCheckMismatches, CrossCheckMaxMismatches, "; ".join(mismatchList))
+        else:
+            self.nCrossCheckMismatches = 0
+            self.nextCrossCheckTime = getClock().time() + CrossCheckInterval
+        return mismatchList
+
+    def lst(self):
+        """Return local apparent sidereal time (deg): computed now if local astrometry is in use, else as last read
+        """
+        if self.useLocalAstrometry:
+            return float(lastFromPySec(getClock().time()))
+        return self.statusFieldDict["st"].value
 
     def getTCCKWDict(self):
         return {
@@ -288,6 +462,7 @@ class Status(object):
             "tccTemps": self.tccTemps(),
             "airmass": self.airmass(),
             "axisErr": self.axisErr(),
+            "slewTimeRemaining": self.slewTimeRemaining(),
         }
 
     def axisErr(self):
@@ -301,6 +476,18 @@ class Status(object):
                 errStrs.append("%.4f"%err)
         return "%s"%(",".join(errStrs))
 
+    def slewTimeRemaining(self):
+        """Format the SlewTimeRemaining keyword: predicted time until the current slew ends (sec)
+
+        0 if not slewing (or the slew is taking longer than predicted), NaN if no prediction was made
+        """
+        if self.tcsDevice.waitSlewCmd.isDone:
+            return "0.0"
+        slewEndTime = self.tcsDevice.slewEndTime
+        if slewEndTime is None:
+            return "NaN"
+        return "%.1f"%(max(0., slewEndTime - getClock().time()))
+
     def airmass(self):
         airmass = self.statusFieldDict["airmass"].value
         if airmass is None:
@@ -400,10 +587,10 @@ class Status(object):
     def wsMoving(self):
         """ return true if ws is moving"""
         if len(self.wsPosQueue) < self.errBufferLen and numpy.all(self.wsPosQueue):
-            print("ws moving")
+            tcsLog.verbose("ws moving")
             return True
         else:
-            print("ws stationary")
+            tcsLog.verbose("ws stationary")
             return False
 
     def onTarget(self, errorBuffer):
@@ -504,6 +691,70 @@ class Status(object):
             self.tcsDevice.tccStatus.updateKWs(self.getTCCKWDict(), userCmd)
 
 
+class PendingCorrection(object):
+    """!Relative corrections (e.g. guide offsets) that arrived while a move was in progress
+
+    Corrections are summed into one net correction, to be applied as a single move
+    once the current move is finished; the user commands that asked for them are
+    finished when that move finishes.
+    """
+    def __init__(self, name, nAxes):
+        """!Construct a PendingCorrection
+
+        @param[in] name  name, for log messages
+        @param[in] nAxes  number of axes of each correction
+        """
+        self.name = name
+        self.nAxes = int(nAxes)
+        self.nMerged = 0 # total number of corrections merged into a later move
+        self.nMoves = 0 # total number of merged moves applied
+        self._clear()
+
+    def _clear(self):
+        self.valueList = [0.] * self.nAxes
+        self.userCmdList = []
+
+    @property
+    def isEmpty(self):
+        return not self.userCmdList
+
+    def add(self, valueList, userCmd):
+        """!Add a correction
+
+        @param[in] valueList  correction for each axis
+        @param[in] userCmd  command to finish when the merged move finishes
+        """
+        if len(valueList) != self.nAxes:
+            raise RuntimeError("%s correction %s must have %d values" % (self.name, valueList, self.nAxes))
+        self.valueList = [total + value for total, value in zip(self.valueList, valueList)]
+        self.userCmdList.append(userCmd)
+        self.nMerged += 1
+        tcsLog.info("%s correction %s pending; net pending correction %s from %d commands",
+            self.name, valueList, self.valueList, len(self.userCmdList))
+
+    def pop(self):
+        """!Return the net correction and a command that finishes its user commands; then clear
+
+        @return valueList, mergedCmd: when mergedCmd finishes, all user commands that
+            contributed to the correction are set to the same state
+        """
+        valueList, userCmdList = self.valueList, self.userCmdList
+        self._clear()
+        self.nMoves += 1
+        mergedCmd = expandCommand()
+        def mergedCmdCallback(cmd):
+            if not cmd.isDone:
+                return
+            for userCmd in userCmdList:
+                if not userCmd.isDone:
+                    userCmd.setState(cmd.state, textMsg=cmd.textMsg)
+        mergedCmd.addCallback(mergedCmdCallback)
+        return valueList, mergedCmd
+
+    def getStatsStr(self):
+        return "%s: %d corrections merged into %d moves" % (self.name, self.nMerged, self.nMoves)
+
+
 class TCSDevice(TCPDevice):
     """!A Device for communicating with the LCO TCS."""
     def __init__(self, name, host, port, callFunc=None):
@@ -532,15 +783,27 @@ class TCSDevice(TCPDevice):
 
         self.waitSlewCmd = expandCommand()
         self.waitSlewCmd.setState(self.waitSlewCmd.Done)
+        self.slewEndTime = None # predicted end time of the current slew; None if unknown
         # self.waitOffsetTimer = Timer()
-        self.rotDelay = False
+        self.rotMoveEndTime = None # predicted time the current rotator move clamps; None until APGCIR is sent
+        self.rotFallbackEndTime = None # time after which the move is done on a clamp reading, even if no unclamp was seen
+        self.rotSawUnclamp = False # has the clamp been seen released during the current rotator move?
 
         self.devCmdQueue = CommandQueue({}) # all commands of equal priority
+        self.batchCmdList = [] # commands of the current batch written so far (see queueDevCmdBatch)
 
         self.lastGuideRotApplied = None
 
+        # corrections received while an offset or rotator move is in progress
+        self.pendingOffset = PendingCorrection("offset", nAxes=2) # ra, dec (deg)
+        self.pendingRot = PendingCorrection("rot", nAxes=1) # rot (deg)
+
         self.doGuideRot = True
 
+        # published each time a complete status has been read
+        self.statusTap = StatusTap("tcs")
+        self.sessionLog = None # function(direction, line) to record raw traffic; see tcc.utils.sessionLog
+
         TCPDevice.__init__(self,
             name = name,
             host = host,
@@ -552,6 +815,10 @@ class TCSDevice(TCPDevice):
 
     @property
     def currExeDevCmd(self):
+        # during a batch, replies belong to its commands in the order written
+        for devCmd in self.batchCmdList:
+            if not devCmd.isDone:
+                return devCmd
         return self.devCmdQueue.currExeCmd.cmd
 
     @property
@@ -585,6 +852,10 @@ class TCSDevice(TCPDevice):
         if self.isSlewing:
             # slewing, get status kinda frequently
             pollTime = PollTimeSlew
+        elif not self.waitSlewCmd.isDone and self.slewEndTime is not None:
+            # poll sparsely until near the predicted end of the slew, then frequently
+            timeToEnd = self.slewEndTime - getClock().time()
+            pollTime = max(PollTimeSlew, min(PollTimeTrack, timeToEnd - SlewPollLead))
         elif self.isTracking:
             # tracking, get status less frequently
             pollTime = PollTimeTrack
@@ -597,8 +868,7 @@ class TCSDevice(TCPDevice):
         """Called automatically on startup after the connection is established.
         Only thing to do is query for status or connect if not connected
         """
-        log.info("%s.init(userCmd=%s, timeLim=%s, getStatus=%s)" % (self, userCmd, timeLim, getStatus))
-        # print("%s.init(userCmd=%s, timeLim=%s, getStatus=%s)" % (self, userCmd, timeLim, getStatus))
+        tcsLog.info("%s.init(userCmd=%s, timeLim=%s, getStatus=%s)", self, userCmd, timeLim, getStatus)
         userCmd = expandCommand(userCmd)
         # if not self.isConnected:
         #     # time lim handled by lco.deviceCmd
@@ -612,7 +882,7 @@ class TCSDevice(TCPDevice):
     def getStatus(self, userCmd=None):
         """Return current telescope status. Continuously poll.
         """
-        log.info("%s.getStatus(userCmd=%s)" % (self, userCmd)) # logging this will flood the log
+        tcsLog.debug("%s.getStatus(userCmd=%s)", self, userCmd) # logging this will flood the log
         userCmd = expandCommand(userCmd)
         if not self.conn.isConnected:
             userCmd.setState(userCmd.Failed, "Not Connected to TCS: try reconnecting (is the APOGEE TCS running!?)")
@@ -623,7 +893,8 @@ class TCSDevice(TCPDevice):
         statusCmd.addCallback(self._statusCallback)
 
         # gather list of status elements to get
-        devCmdList = [DevCmd(cmdStr=cmdVerb) for cmdVerb in self.status.statusFieldDict.keys()]
+        cmdVerbList, statusCmd.crossCheck = self.status.getPollVerbs()
+        devCmdList = [DevCmd(cmdStr=cmdVerb) for cmdVerb in cmdVerbList]
         statusCmd.linkCommands(devCmdList)
         for devCmd in devCmdList:
             self.queueDevCmd(devCmd)
@@ -634,6 +905,11 @@ class TCSDevice(TCPDevice):
         wait commands need to be set done
         """
         if cmd.isDone and not cmd.didFail:
+            if self.status.useLocalAstrometry:
+                if cmd.crossCheck:
+                    self.status.crossCheckAstrometry()
+                else:
+                    self.status.deriveAstrometry()
             # do we want status output so frequently? probabaly not.
             # perhaps only write status if it has changed...
             # append ra and dec errors to the queues
@@ -652,13 +928,83 @@ class TCSDevice(TCPDevice):
                     not self.status.wsMoving):
                 self.waitSlewCmd.setState(self.waitSlewCmd.Done)
 
-            if self.waitRotCmd.isActive and not self.rotDelay and self.status.isClamped: #not self.status.rotMoving: #and self.status.rotOnTarget :
-                # print("set rot command done", self.rotDelay, self.status.isClamped, self.status.rotMoving)
-                self.waitRotCmd.setState(self.waitRotCmd.Done)
+            self.statusTap.publish(self.status)
 
         self.status.updateTCCStatus(cmd)
         self._statusTimer.start(self.pollTime, self.getStatus)
 
+    def getRotStatus(self):
+        """Query only the rotator clamp, position and axis status; repeat rapidly until the rotator move is done
+
+        Started near the predicted end of a rotator move (see newWaitRotCmd); the clamp state
+        is checked as each reply arrives (see checkRotClamp).
+        """
+        if self.waitRotCmd.isDone or not self.conn.isConnected:
+            return
+        rotStatusCmd = expandCommand()
+        def rotStatusCallback(cmd):
+            if cmd.isDone and not self.waitRotCmd.isDone:
+                self.waitRotTimer.start(PollTimeRotFast, self.getRotStatus)
+        rotStatusCmd.addCallback(rotStatusCallback)
+        devCmdList = [DevCmd(cmdStr=cmdVerb) for cmdVerb in RotStatusVerbs]
+        rotStatusCmd.linkCommands(devCmdList)
+        for devCmd in devCmdList:
+            # a verb of its own, so this does not cancel (or get cancelled by) the same query in a full status poll
+            self.queueDevCmd(devCmd, cmdVerb="rot:" + devCmd.cmdStr)
+
+    def newWaitRotCmd(self, rot):
+        """Make a new waitRotCmd for a rotator move, and arrange to poll the clamp near the end of the move
+
+        The move is predicted to take UnclampTime to unclamp, rotMoveTime(rot) to move and
+        ClampFudgeTime to clamp, timed from when APGCIR is sent (when waitRotCmd starts running).
+        Fast clamp polling starts RotPollLead before then.
+
+        @param[in] rot  size of rotator move (degrees)
+        @return the new waitRotCmd
+        """
+        waitRotCmd = expandCommand()
+        self.waitRotCmd = waitRotCmd
+        self.rotMoveEndTime = None
+        self.rotFallbackEndTime = None
+        self.rotSawUnclamp = False
+        moveTime = UnclampTime + rotMoveTime(rot) + ClampFudgeTime
+        def waitRotCallback(cmd):
+            if cmd.isDone:
+                self.waitRotTimer.cancel()
+                self._applyPendingRot()
+            elif cmd.isActive and self.rotMoveEndTime is None:
+                self.rotMoveEndTime = getClock().time() + moveTime
+                self.rotFallbackEndTime = self.rotMoveEndTime + UnclampWaitTime - UnclampTime
+                self.waitRotTimer.start(max(0, moveTime - RotPollLead), self.getRotStatus)
+        waitRotCmd.addCallback(waitRotCallback)
+        waitRotCmd.setTimeLimit(moveTime + 20)
+        tcsLog.debug("predicted rotator move time %.2f sec for %.6f deg", moveTime, rot)
+        return waitRotCmd
+
+    def _applyPendingRot(self):
+        """Apply the pending rotator offset (if any); call when a rotator move is done
+        """
+        if self.pendingRot.isEmpty:
+            return
+        (rot,), mergedCmd = self.pendingRot.pop()
+        tcsLog.info("%s applying merged rot offset %.6f; %s", self, rot, self.pendingRot.getStatsStr())
+        self.rotOffset(rot, mergedCmd, force=True)
+
+    def checkRotClamp(self):
+        """Set waitRotCmd done if the rotator has clamped at the end of its move; call when the clamp state is read
+
+        The move is done once the clamp is seen engaged after being seen released; the clamp still
+        reads engaged while the rotator unclamps, so an engaged clamp alone says nothing.
+        If no poll saw the clamp released, the move is done once the clamp is seen engaged
+        UnclampWaitTime - UnclampTime after the predicted end (the baseline's guard).
+        """
+        if not self.waitRotCmd.isActive or self.rotMoveEndTime is None:
+            return
+        if not self.status.isClamped:
+            self.rotSawUnclamp = True
+        elif self.rotSawUnclamp or getClock().time() >= self.rotFallbackEndTime:
+            self.waitRotCmd.setState(self.waitRotCmd.Done)
+
     def abort_slews(self, userCmd=None):
         """Aborts any slew running."""
 
@@ -684,7 +1030,7 @@ class TCSDevice(TCPDevice):
         @param[in] userCmd: a twistedActor BaseCommand.
         """
 
-        log.info("%s.slew(userCmd=%s, ra=%.2f, dec=%.2f)" % (self, userCmd, ra, dec))
+        tcsLog.info("%s.slew(userCmd=%s, ra=%.2f, dec=%.2f)", self, userCmd, ra, dec)
         userCmd = expandCommand(userCmd)
         ffs_altitude = None
 
@@ -702,7 +1048,7 @@ class TCSDevice(TCPDevice):
             if doHA:
                 ha = ra
             else:
-                ha = self.status.statusFieldDict['st'].value - ra
+                ha = self.status.lst() - ra
 
             (az, alt), atPole = azAltFromHADec([ha, dec], LCO_LATITUDE)
 
@@ -749,10 +1095,22 @@ class TCSDevice(TCPDevice):
         if not self.waitSlewCmd.isDone:
             self.waitSlewCmd.setState(self.waitSlewCmd.Cancelled, "Superseded by new slew")
         self.waitSlewCmd = expandCommand()
+        slewTime = self.predictSlewTime(ra, dec, doHA, ffs_altitude)
+        if slewTime is None:
+            self.slewEndTime = None
+        else:
+            self.slewEndTime = getClock().time() + slewTime
+            self.waitSlewCmd.setTimeLimit(SlewTimeLimFactor * slewTime + SlewTimeLimMargin)
         userCmd.linkCommands(devCmdList + [self.waitSlewCmd])
 
-        for devCmd in devCmdList:
-            self.queueDevCmd(devCmd)
+        # write the target coordinates at once, then MP (and INPS) once they are accepted;
+        # if any command fails the slew is not started
+        batchCmd = self.queueDevCmdBatch(devCmdList)
+        waitSlewCmd = self.waitSlewCmd
+        def batchCallback(batchCmd):
+            if batchCmd.didFail and not waitSlewCmd.isDone:
+                waitSlewCmd.setState(waitSlewCmd.Failed, batchCmd.textMsg)
+        batchCmd.addCallback(batchCallback)
 
         self.status.updateTCCStatus(userCmd)
 
@@ -760,8 +1118,34 @@ class TCSDevice(TCPDevice):
         if self.tccStatus is not None:
             self.tccStatus.updateKW("pleaseSlew", "T", userCmd) # for outputting slew sound in stui
             self.tccStatus.updateKW("pleaseSlew", "F", userCmd)
+            self.tccStatus.updateKW("slewDuration", "NaN" if slewTime is None else "%.1f"%slewTime, userCmd)
         return userCmd
 
+    def predictSlewTime(self, ra, dec, doHA, screenAlt=None):
+        """Predict the duration of a slew from the current position (sec), or None if the position is unknown
+
+        @param[in] ra: right ascension, or hour angle if doHA (degrees)
+        @param[in] dec: declination (degrees)
+        @param[in] doHA: if True, ra is hour angle
+        @param[in] screenAlt: flat field screen altitude (degrees), or None if the screen is not moved
+        """
+        currPos = self.status.statusFieldDict["pos"].value # [ha, dec]
+        if currPos is None:
+            return None
+        if doHA:
+            ha = ra
+        else:
+            st = self.status.lst()
+            if st is None:
+                return None
+            ha = st - ra
+        dScreen = 0
+        if screenAlt is not None:
+            dScreen = screenAlt - (self.status.statusFieldDict["lplc"].value or 0)
+        slewTime = predictSlewTime(wrapDeltaAngle(ha - currPos[0]), dec - currPos[1], dScreen)
+        tcsLog.info("%s predicted slew time %.1f sec", self, slewTime)
+        return slewTime
+
     def slewOffset(self, ra, dec, userCmd=None):
         """Offset telescope in right ascension and declination.
 
@@ -771,7 +1155,7 @@ class TCSDevice(TCPDevice):
 
         @todo, consolidate similar code with self.target?
         """
-        log.info("%s.slewOffset(userCmd=%s, ra=%.6f, dec=%.6f)" % (self, userCmd, ra, dec))
+        tcsLog.info("%s.slewOffset(userCmd=%s, ra=%.6f, dec=%.6f)", self, userCmd, ra, dec)
         userCmd = expandCommand(userCmd)
         # zero the delta computation so the offset isn't marked done immediately
 
@@ -779,29 +1163,61 @@ class TCSDevice(TCPDevice):
             userCmd.setState(userCmd.Failed, "Not Connected to TCS")
             return userCmd
         if not self.waitOffsetCmd.isDone:
-            self.waitOffsetCmd.setState(self.waitOffsetCmd.Cancelled, "Superseded by new offset")
+            # an offset is in progress; apply this one (merged with any others) when it is done
+            self.pendingOffset.add([ra, dec], userCmd)
+            return userCmd
+        self.newWaitOffsetCmd(userCmd)
+        devCmdList = self.getOffsetDevCmds(ra, dec)
+        userCmd.linkCommands(devCmdList + [self.waitOffsetCmd])
+        for devCmd in devCmdList:
+            self.queueDevCmd(devCmd)
+        self.status.updateTCCStatus(userCmd)
+        return userCmd
+
+    def getOffsetDevCmds(self, ra, dec):
+        """Return the device commands for an ra, dec offset
+
+        @param[in] ra: right ascension in decimal degrees
+        @param[in] dec: declination in decimal degrees
+        """
+        enterRa = "OFRA %.8f"%(ra*ArcSecPerDeg)
+        enterDec = "OFDC %.8f"%(dec*ArcSecPerDeg) #lcohack
+        return [DevCmd(cmdStr=cmdStr) for cmdStr in [enterRa, enterDec, CMDOFF]]
+
+    def newWaitOffsetCmd(self, userCmd):
+        """Make a new waitOffsetCmd for an ra, dec offset
+
+        The command starts running when OFFP is sent and is done when the axes are on target
+        (or after MAX_OFFSET_WAIT); then any pending offset is applied.
+
+        @param[in] userCmd  user command, for warnings
+        @return the new waitOffsetCmd
+        """
         # clear the target error buffers
         self.status.rerrQueue.clear()
         self.status.derrQueue.clear()
         waitOffsetCmd = expandCommand()
         self.waitOffsetCmd = waitOffsetCmd
-        enterRa = "OFRA %.8f"%(ra*ArcSecPerDeg)
-        enterDec = "OFDC %.8f"%(dec*ArcSecPerDeg) #lcohack
-        devCmdList = [DevCmd(cmdStr=cmdStr) for cmdStr in [enterRa, enterDec, CMDOFF]]
-
+        waitOffsetCmd.addCallback(self._applyPendingOffset)
 
         def forceOffsetDone(waitOffsetCmd):
             if not waitOffsetCmd.isDone:
                 userCmd.writeToUsers("w", "Forcing offset done after %.2f seconds"%MAX_OFFSET_WAIT)
                 waitOffsetCmd.setState(waitOffsetCmd.Done, "Forcing offset done after %.2f seconds"%MAX_OFFSET_WAIT)
 
-        reactor.callLater(MAX_OFFSET_WAIT, forceOffsetDone, waitOffsetCmd)
+        forceOffsetCall = getClock().callLater(MAX_OFFSET_WAIT, forceOffsetDone, waitOffsetCmd)
+        # cancel the forced done once the offset finishes, rather than leave it pending
+        waitOffsetCmd.addCallback(functools.partial(_cancelWhenDone, delayedCall=forceOffsetCall))
+        return waitOffsetCmd
 
-        userCmd.linkCommands(devCmdList + [self.waitOffsetCmd])
-        for devCmd in devCmdList:
-            self.queueDevCmd(devCmd)
-        self.status.updateTCCStatus(userCmd)
-        return userCmd
+    def _applyPendingOffset(self, waitOffsetCmd):
+        """waitOffsetCmd callback: when the offset is done, apply the pending offset (if any)
+        """
+        if not waitOffsetCmd.isDone or self.pendingOffset.isEmpty:
+            return
+        (ra, dec), mergedCmd = self.pendingOffset.pop()
+        tcsLog.info("%s applying merged offset ra=%.6f, dec=%.6f; %s", self, ra, dec, self.pendingOffset.getStatsStr())
+        self.slewOffset(ra, dec, mergedCmd)
 
     def rotOffset(self, rot, userCmd=None, force=False):
         """Offset telescope rotator.  USE APGCIR cmd
@@ -815,16 +1231,16 @@ class TCSDevice(TCPDevice):
         if not self.conn.isConnected:
             userCmd.setState(userCmd.Failed, "Not Connected to TCS")
             return userCmd
-        if not self.waitRotCmd.isDone:
-            # rotator is unclamped, a move is in progress
-            userCmd.setState(userCmd.Failed, "Rotator is unclamped (already moving?)")
-            return userCmd
         # if abs(rot) < MinRotOffset and not force:
         if not self.doGuideRot:
             # set command done, rotator offset is miniscule
             userCmd.writeToUsers("w", "Guide rot not enabled, not applying")
             userCmd.setState(userCmd.Done)
             return userCmd
+        if not self.waitRotCmd.isDone:
+            # rotator is unclamped, a move is in progress; apply this offset (merged with any others) when it is done
+            self.pendingRot.add([rot], userCmd)
+            return userCmd
         # if abs(rot) > MaxRotOffset:
         #     # set command failed, rotator offset is too big
         #     userCmd.writeToUsers("w", "Rot offset greater than max threshold")
@@ -832,14 +1248,7 @@ class TCSDevice(TCPDevice):
         #     return userCmd
         ### print time since last rot applied from guider command
         if not force:
-            if self.lastGuideRotApplied is None:
-                self.lastGuideRotApplied = time.time()
-            else:
-                tnow = time.time()
-                infoStr = "time since last guide rot update: %.2f"%(tnow-self.lastGuideRotApplied)
-                print(infoStr)
-                log.info(infoStr)
-                self.lastGuideRotApplied = tnow
+            self._logGuideRotTime()
 
         # apgcir requires absolute position, calculate it
         # first get status
@@ -849,20 +1258,7 @@ class TCSDevice(TCPDevice):
         #     if aCmd.isDone:
         #         rotTime = time.time() - rotStart
         #         print("rot: off, time, speed: %.5f %.5f %5f"%(newPos, rotTime, newPos/rotTime))
-        waitRotCmd = expandCommand()
-        self.waitRotCmd = waitRotCmd
-        # calculate time limit for rot move:
-        rotTimeLimBuffer = 2 # check for clamp after 4 seconds
-        self.rotDelay = True
-        print("setting rot delay true")
-        def setRotBufferOff():
-            print("setting rot delay false")
-            print("rot buffer Off (clamped?)", self.status.isClamped)
-            self.rotDelay = False
-        self.waitRotTimer.start(rotTimeLimBuffer, setRotBufferOff)
-        #### should this be waitRotCmd ?!!?
-        # self.waitOffsetCmd.setTimeLimit(rotTimeLimBuffer + 20)
-        self.waitRotCmd.setTimeLimit(rotTimeLimBuffer + 20)
+        self.newWaitRotCmd(rot)
         self.status.setRotOffsetTarg(rot)
         enterAPGCIR = DevCmd(cmdStr="APGCIR %.8f"%(newPos))
         userCmd.linkCommands([enterAPGCIR, self.waitRotCmd])
@@ -872,6 +1268,83 @@ class TCSDevice(TCPDevice):
         return userCmd
 
 
+    def _logGuideRotTime(self):
+        if self.lastGuideRotApplied is None:
+            self.lastGuideRotApplied = getClock().time()
+        else:
+            tnow = getClock().time()
+            tcsLog.info("time since last guide rot update: %.2f", tnow-self.lastGuideRotApplied)
+            self.lastGuideRotApplied = tnow
+
+    def guideOffset(self, ra, dec, rot, userCmd=None):
+        """Apply a guide correction in ra, dec and rotator as one transaction
+
+        The rotator position is read, then APGCIR, OFRA and OFDC are written back to back as one batch
+        (see queueDevCmdBatch), followed by OFFP once they have been accepted, so the ra/dec offset and
+        the rotator move run concurrently. The two are independent: a failed APGCIR fails only the
+        rotator move, and a failed OFRA or OFDC fails only the offset.
+        If only one of the two is wanted, or either is already moving, the offsets are applied
+        separately by slewOffset and rotOffset (which merge them into a move in progress).
+
+        @param[in] ra: right ascension offset in decimal degrees
+        @param[in] dec: declination offset in decimal degrees
+        @param[in] rot: rotator offset in decimal degrees
+        @param[in] userCmd a twistedActor BaseCommand
+        """
+        tcsLog.info("%s.guideOffset(userCmd=%s, ra=%.6f, dec=%.6f, rot=%.6f)", self, userCmd, ra, dec, rot)
+        userCmd = expandCommand(userCmd)
+        if not self.conn.isConnected:
+            userCmd.setState(userCmd.Failed, "Not Connected to TCS")
+            return userCmd
+        doOffset = bool(ra or dec)
+        doRot = bool(rot) and self.doGuideRot
+        if not (doOffset and doRot) or not self.waitOffsetCmd.isDone or not self.waitRotCmd.isDone:
+            cmdList = []
+            if doOffset:
+                cmdList.append(self.slewOffset(ra, dec))
+            if rot:
+                cmdList.append(self.rotOffset(rot))
+            if cmdList:
+                userCmd.linkCommands(cmdList)
+            else:
+                userCmd.setState(userCmd.Done)
+            return userCmd
+
+        self._logGuideRotTime()
+        waitOffsetCmd = self.newWaitOffsetCmd(userCmd)
+        waitRotCmd = self.newWaitRotCmd(rot)
+        rawPosCmd = DevCmd(cmdStr="rawpos")
+        apgcirCmd = DevCmd(cmdStr="APGCIR") # the position is filled in when rawpos is read
+        offsetCmdList = self.getOffsetDevCmds(ra, dec)
+        devCmdList = [apgcirCmd] + offsetCmdList
+
+        def failWaitCmd(devCmd, waitCmd):
+            # e.g. OFFP is cancelled if OFRA or OFDC fails, and then waitOffsetCmd would never start
+            if devCmd.didFail and not waitCmd.isDone:
+                waitCmd.setState(waitCmd.Failed, "%s failed: %s" % (devCmd.cmdStr, devCmd.textMsg))
+        apgcirCmd.addCallback(functools.partial(failWaitCmd, waitCmd=waitRotCmd))
+        offsetCmdList[-1].addCallback(functools.partial(failWaitCmd, waitCmd=waitOffsetCmd))
+
+        def rawPosCallback(rawPosCmd):
+            if not rawPosCmd.isDone:
+                return
+            if rawPosCmd.didFail:
+                errorStr = "Could not read rotator position: %s" % (rawPosCmd.textMsg,)
+                for cmd in devCmdList + [waitOffsetCmd, waitRotCmd]:
+                    if not cmd.isDone:
+                        cmd.setState(cmd.Failed, errorStr)
+                return
+            # apgcir requires absolute position, calculate it from the position just read
+            apgcirCmd.cmdStr = "APGCIR %.8f"%(self.status.rotPos - rot)
+            self.status.setRotOffsetTarg(rot)
+            self.queueDevCmdBatch(devCmdList, independentVerbs=("APGCIR",))
+        rawPosCmd.addCallback(rawPosCallback)
+
+        userCmd.linkCommands([rawPosCmd] + devCmdList + [waitOffsetCmd, waitRotCmd])
+        self.queueDevCmd(rawPosCmd)
+        self.status.updateTCCStatus(userCmd)
+        return userCmd
+
     def handleReply(self, replyStr):
         """Handle a line of output from the device. Called whenever the device outputs a new line of data.
 
@@ -885,18 +1358,26 @@ class TCSDevice(TCPDevice):
         - If a command has finished, call the appropriate command callback
         """
         # log.info("%s read %r, currCmdStr: %s" % (self, replyStr, self.currDevCmdStr))
+        if self.sessionLog is not None:
+            self.sessionLog("r", replyStr)
         replyStr = replyStr.strip()
-        log.info("%s read %s" % (self,replyStr))
+        tcsLog.debug("%s read %s", self, replyStr)
         if replyStr == "-1":
             # error
             errorStr = "handleReply failed for %s with -1"%self.currDevCmdStr
-            if self.waitOffsetCmd.isActive:
-                self.waitOffsetCmd.setState(self.waitOffsetCmd.Failed, errorStr)
-            if self.waitSlewCmd.isActive:
-                self.waitSlewCmd.setState(self.waitSlewCmd.Failed, errorStr)
-            if self.waitRotCmd.isActive:
+            # an offset and a rotator move may run at once (see guideOffset);
+            # a failed offset or rotator command only fails its own move
+            cmdVerb = self.currDevCmdStr.split()[0].upper() if self.currDevCmdStr else ""
+            if cmdVerb in OffsetVerbs:
+                waitCmdList = [self.waitOffsetCmd]
+            elif "CIR" in cmdVerb:
+                waitCmdList = [self.waitRotCmd]
+            else:
+                waitCmdList = [self.waitOffsetCmd, self.waitSlewCmd, self.waitRotCmd]
+            for waitCmd in waitCmdList:
                 # note the clamp should still execute!!!!
-                self.waitRotCmd.setState(self.waitRotCmd.Failed, errorStr)
+                if waitCmd.isActive:
+                    waitCmd.setState(waitCmd.Failed, errorStr)
             self.currExeDevCmd.setState(self.currExeDevCmd.Failed, errorStr)
             return
         statusField = self.status.statusFieldDict.get(self.currDevCmdStr, None)
@@ -905,42 +1386,132 @@ class TCSDevice(TCPDevice):
             # how to check for error condition? parsing -1 as a float will still work.
             statusField.setValue(replyStr)
             self.currExeDevCmd.setState(self.currExeDevCmd.Done)
+            if statusField.cmdVerb == "mrp":
+                self.checkRotClamp()
         elif replyStr == "0":
             # this was a command, a "0" is expected
             self.currExeDevCmd.setState(self.currExeDevCmd.Done)
         else:
-            log.info("%s unexpected reply: %s" % (self,replyStr))
+            tcsLog.info("%s unexpected reply: %s", self, replyStr)
             #self.currExeDevCmd.setState(self.currExeDevCmd.Failed, "Unexpected reply %s for %s"%(replyStr, self.currDevCmdStr))
 
 
-    def queueDevCmd(self, devCmd):
+    def queueDevCmd(self, devCmd, cmdVerb=None):
         """Add a device command to the device command queue
 
         @param[in] devCmd: a twistedActor DevCmd.
+        @param[in] cmdVerb: verb for the command queue; if None then devCmd.cmdStr.
+            Queued commands with the same verb cancel each other, so commands that may be
+            queued alongside the same query from elsewhere need a verb of their own.
         """
         # log.info("%s.queueDevCmd(devCmd=%r, devCmdStr=%r, cmdQueue: %r"%(self, devCmd, devCmd.cmdStr, self.devCmdQueue))
         # append a cmdVerb for the command queue (other wise all get the same cmdVerb and cancel eachother)
         # could change the default behavior in CommandQueue?
-        devCmd.cmdVerb = devCmd.cmdStr
-
-        def forceMPDone(mpDevCmd):
-            # mp command occasionally times out for some reason.  i don't want this to
-            # be a failure in the target command so just set it done rather than timeout
-            if not mpDevCmd.isDone:
-                log.info("Forcing MP done")
-                mpDevCmd.setState(mpDevCmd.Done,"forcing MP done")
+        devCmd.cmdVerb = devCmd.cmdStr if cmdVerb is None else cmdVerb
 
         def queueFunc(devCmd):
-            # all tcs commands return immediately so set a short timeout
-            if "MP" in devCmd.cmdStr:
-                reactor.callLater(2.0, forceMPDone, devCmd)
-            else:
-                devCmd.setTimeLimit(SEC_TIMEOUT)
+            self._setVerbTimeLimit(devCmd)
             devCmd.setState(devCmd.Running)
             self.startDevCmd(devCmd.cmdStr)
+        cmdTracer.traceDevCmd(devCmd, self.name)
         self.devCmdQueue.addCmd(devCmd, queueFunc)
 
 
+    def queueDevCmdBatch(self, devCmdList, barrierVerbs=BarrierVerbs, independentVerbs=()):
+        """Add a batch of device commands to the device command queue, to be written back to back
+
+        When the batch reaches the head of the queue its commands are written in order without
+        waiting for each reply; the TCS replies to commands in the order received, so each reply
+        is matched to the oldest command of the batch still running. A command whose verb is
+        in barrierVerbs (and any after it) is held until all earlier commands are done.
+        A command whose verb is set done if it gets no reply (see VerbTimeLimitDict) is a barrier
+        for the commands after it: they are held until it is done, so that the reply to a later
+        command is never matched to it.
+        If a command fails, the commands not yet written are cancelled, unless its verb is
+        in independentVerbs. Each command gets the
+        time limit for its verb (see VerbTimeLimitDict). The batch holds the queue, as a single
+        command does, until every command is done.
+
+        @param[in] devCmdList: list of twistedActor DevCmds
+        @param[in] barrierVerbs: verbs (upper case) to hold until all earlier commands have succeeded
+        @param[in] independentVerbs: verbs (upper case) of commands that the rest of the batch does not
+            depend on; if one fails the rest of the batch is still written
+        @return batchCmd: a DevCmd that is done when all commands in the batch are done;
+            it fails if any command failed
+        """
+        batchCmd = DevCmd(cmdStr="; ".join(devCmd.cmdStr for devCmd in devCmdList))
+        batchCmd.cmdVerb = batchCmd.cmdStr
+        toWriteList = devCmdList[:]
+        failedList = []
+
+        def writeReady():
+            while toWriteList:
+                devCmd = toWriteList[0]
+                if devCmd.isDone:
+                    toWriteList.pop(0)
+                    continue
+                if _getVerb(devCmd) in barrierVerbs and not all(cmd.isDone for cmd in self.batchCmdList):
+                    return
+                if any(_isDoneOnTimeout(cmd) and not cmd.isDone for cmd in self.batchCmdList):
+                    return
+                toWriteList.pop(0)
+                self.batchCmdList.append(devCmd)
+                self._setVerbTimeLimit(devCmd)
+                devCmd.setState(devCmd.Running)
+                self.startDevCmd(devCmd.cmdStr)
+
+        def devCmdCallback(devCmd):
+            if not devCmd.isDone or batchCmd.isDone:
+                return
+            if devCmd.didFail:
+                if not failedList:
+                    failedList.append(devCmd)
+                if _getVerb(devCmd) not in independentVerbs:
+                    if toWriteList:
+                        tcsLog.info("%s batch %r aborted: %s failed", self, batchCmd.cmdStr, devCmd.cmdStr)
+                    abortList = toWriteList[:]
+                    del toWriteList[:]
+                    for cmd in abortList:
+                        if not cmd.isDone:
+                            cmd.setState(cmd.Cancelled, "Aborted: %s failed" % (devCmd.cmdStr,))
+            if batchCmd.isActive:
+                writeReady()
+            if not batchCmd.isDone and all(cmd.isDone for cmd in devCmdList):
+                self.batchCmdList = []
+                if failedList:
+                    batchCmd.setState(batchCmd.Failed, "%s failed: %s" % (failedList[0].cmdStr, failedList[0].textMsg))
+                else:
+                    batchCmd.setState(batchCmd.Done)
+
+        def queueFunc(batchCmd):
+            batchCmd.setState(batchCmd.Running)
+            self.batchCmdList = []
+            writeReady()
+
+        for devCmd in devCmdList:
+            devCmd.addCallback(devCmdCallback)
+            cmdTracer.traceDevCmd(devCmd, self.name)
+        self.devCmdQueue.addCmd(batchCmd, queueFunc)
+        return batchCmd
+
+    def _setVerbTimeLimit(self, devCmd):
+        """Set the time limit of a device command that is about to be written, according to its verb
+
+        All tcs commands return immediately, so the limits are short (see VerbTimeLimitDict).
+        """
+        timeLim = VerbTimeLimitDict.get(_getVerb(devCmd), (SEC_TIMEOUT, False))[0]
+        if not _isDoneOnTimeout(devCmd):
+            devCmd.setTimeLimit(timeLim)
+            return
+
+        def forceDone(devCmd):
+            if not devCmd.isDone:
+                tcsLog.info("Forcing %s done", devCmd.cmdStr)
+                devCmd.setState(devCmd.Done, "forcing %s done" % (devCmd.cmdStr,))
+
+        forceDoneCall = getClock().callLater(timeLim, forceDone, devCmd)
+        devCmd.addCallback(functools.partial(_cancelWhenDone, delayedCall=forceDoneCall))
+
     def startDevCmd(self, devCmdStr):
         """
         @param[in] devCmdStr a line of text to send to the device
@@ -949,11 +1520,13 @@ class TCSDevice(TCPDevice):
         # log.info("%s.startDevCmd(%r)" % (self, devCmdStr))
         try:
             if self.conn.isConnected:
-                log.info("%s writing %r" % (self, devCmdStr))
+                tcsLog.debug("%s writing %r", self, devCmdStr)
                 if CMDOFF.upper() == devCmdStr:
                     self.waitOffsetCmd.setState(self.waitOffsetCmd.Running)
                 elif "CIR" in devCmdStr:
                     self.waitRotCmd.setState(self.waitRotCmd.Running)
+                if self.sessionLog is not None:
+                    self.sessionLog("w", devCmdStr)
                 self.conn.writeLine(devCmdStr)
             else:
                 self.currExeDevCmd.setState(self.currExeDevCmd.Failed, "Not connected to TCS")
@@ -9,7 +9,8 @@ import datetime
 
 from twisted.internet import reactor
 # from twistedActor import startSystemLogging
-from twistedActor import startFileLogging
+
+from tcc.utils.asyncLog import startAsyncFileLogging
 
 from tcc.actor.tccLCOActor import TCCLCOActor
 from tcc.dev import TCSDevice, ScaleDevice, M2Device #, MeasScaleDevice #, FFDevice
@@ -21,7 +22,8 @@ logPath = "/data/logs/actors/tcc"
 if not os.path.exists(logPath):
     os.makedirs(logPath)
 
-startFileLogging(os.path.join(logPath, "tcc"), rotate=rolloverDatetime)
+# log records are written (and compressed at rotation) by a background thread
+startAsyncFileLogging(os.path.join(logPath, "tcc"), rotate=rolloverDatetime)
 
 UserPort = 25000
 
@@ -37,6 +39,10 @@ M2DevicePort = 52001
 # FFDeviceHost = "139.229.101.122"
 # FFDevicePort = 23
 
+# to record all raw device traffic for later replay (see bin/replaySession.py),
+# set environment variable TCC_SESSION_DIR to the directory for session files
+SessionDir = os.environ.get("TCC_SESSION_DIR") or None
+
 #measScaleDevice = MeasScaleDevice("measScaleDev", MeasScaleDeviceHost, MeasScaleDevicePort)
 
 
@@ -48,6 +54,10 @@ def startTCCLCO(*args):
             tcsDev = TCSDevice("tcsDev", TCSHost, TCSDevicePort),
             scaleDev = ScaleDevice("scaleDev", ScaleDeviceHost, ScaleDevicePort),
             m2Dev = M2Device("m2Dev", M2DeviceHost, M2DevicePort),
+            logDir = logPath,
+            telemetryDir = os.path.join(logPath, "telemetry"),
+            tcsErrLogPath = os.path.join(logPath, "tcsErrLog.txt"),
+            sessionDir = SessionDir,
             )
     except Exception:
         print >>sys.stderr, "Error lcoTCC"
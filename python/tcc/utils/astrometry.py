@@ -0,0 +1,112 @@
+from __future__ import division, absolute_import
+"""Local astrometry for the du Pont telescope
+
+Computes sidereal time, az/alt, zenith distance and airmass locally, from the
+telescope's HA/Dec and the clock, so they need not be queried from the TCS.
+All functions accept scalars or numpy arrays (and return the same).
+
+Accuracy is set by UT1-UTC (< 0.9 sec, or 0.004 deg of sidereal time), which is ignored,
+and the truncated nutation series used for the equation of the equinoxes (< 0.1 arcsec).
+"""
+import numpy
+
+__all__ = ["LCO_LATITUDE", "LCO_LONGITUDE", "mjdFromPySec", "pySecFromTAI", "taiFromPySec", "lastFromPySec", "azAltFromHADec",
+    "airmassFromAlt", "wrapPos", "deriveTCSFields"]
+
+LCO_LATITUDE = -29.0146 # degrees
+LCO_LONGITUDE = -(70 + 41.0 / 60. + 33.36 / 3600.) # degrees east
+_MinAlt = 3.0 # altitudes below this are treated as this by airmassFromAlt, as RO.Astro.Sph.airmass does
+_Obliquity = 23.4393 # mean obliquity of the ecliptic (degrees); varies by < 0.01 deg per century
+TAIMinusUTC = 37 # seconds; leap seconds as of 2017-01-01
+
+def wrapPos(deg):
+    """!Return an angle wrapped into the range [0, 360) (degrees)
+    """
+    return numpy.mod(deg, 360.)
+
+def mjdFromPySec(pySec):
+    """!Return the UTC modified Julian date for a POSIX time (e.g. getClock().time())
+    """
+    return numpy.asarray(pySec, dtype=float) / 86400. + 40587.
+
+def pySecFromTAI(tai):
+    """!Return POSIX time for a TAI date (MJD, seconds), as used by TCC commands
+    """
+    return numpy.asarray(tai, dtype=float) - 40587. * 86400. - TAIMinusUTC
+
+def taiFromPySec(pySec):
+    """!Return TAI date (MJD, seconds) for a POSIX time; the inverse of pySecFromTAI
+    """
+    return numpy.asarray(pySec, dtype=float) + 40587. * 86400. + TAIMinusUTC
+
+def lastFromPySec(pySec, longitude=LCO_LONGITUDE):
+    """!Return local apparent sidereal time (degrees, in the range [0, 360))
+
+    @param[in] pySec  POSIX time (sec); UT1 is taken to be UTC
+    @param[in] longitude  longitude east (degrees)
+    """
+    daysJ2000 = mjdFromPySec(pySec) - 51544.5
+    centJ2000 = daysJ2000 / 36525.
+    # mean sidereal time at Greenwich (IAU 1982 model)
+    gmst = 280.46061837 + 360.98564736629 * daysJ2000 + 0.000387933 * centJ2000**2 - centJ2000**3 / 38710000.
+    # equation of the equinoxes, from the main terms of the nutation in longitude
+    ascNode = numpy.radians(125.04452 - 1934.136261 * centJ2000)
+    sunLong = numpy.radians(280.4665 + 36000.7698 * centJ2000)
+    moonLong = numpy.radians(218.3165 + 481267.8813 * centJ2000)
+    nutLong = -17.20 * numpy.sin(ascNode) - 1.32 * numpy.sin(2 * sunLong) \
+        - 0.23 * numpy.sin(2 * moonLong) + 0.21 * numpy.sin(2 * ascNode) # arcsec
+    eqEquinox = nutLong * numpy.cos(numpy.radians(_Obliquity)) / 3600.
+    return wrapPos(gmst + eqEquinox + longitude)
+
+def azAltFromHADec(ha, dec, lat=LCO_LATITUDE):
+    """!Convert HA/Dec to az/alt; a vectorized version of RO.Astro.Sph.azAltFromHADec
+
+    @param[in] ha  hour angle (degrees)
+    @param[in] dec  declination (degrees)
+    @param[in] lat  latitude (degrees)
+    @return az, alt (degrees); azimuth is 0 south and 90 east, in the range [0, 360), as in RO.
+        Refraction is ignored.
+    """
+    haRad, decRad, latRad = numpy.radians(ha), numpy.radians(dec), numpy.radians(lat)
+    sinAlt = numpy.sin(latRad) * numpy.sin(decRad) + numpy.cos(latRad) * numpy.cos(decRad) * numpy.cos(haRad)
+    alt = numpy.degrees(numpy.arcsin(numpy.clip(sinAlt, -1., 1.)))
+    az = numpy.degrees(numpy.arctan2(
+        numpy.cos(decRad) * numpy.sin(haRad),
+        numpy.sin(latRad) * numpy.cos(decRad) * numpy.cos(haRad) - numpy.cos(latRad) * numpy.sin(decRad),
+    ))
+    # arctan2 gives azimuth measured from south towards west; RO's is towards east
+    return wrapPos(-az), alt
+
+def airmassFromAlt(alt):
+    """!Return airmass at a given altitude; a vectorized version of RO.Astro.Sph.airmass
+
+    @param[in] alt  altitude (degrees); values below 3 degrees are treated as 3 degrees
+    """
+    secM1 = 1. / numpy.sin(numpy.radians(numpy.maximum(_MinAlt, alt))) - 1.
+    return 1. + secM1 * (0.9981833 - secM1 * (0.002875 + 0.0008083 * secM1))
+
+def deriveTCSFields(pos, pySec, lat=LCO_LATITUDE, longitude=LCO_LONGITUDE):
+    """!Compute the TCS status values that follow from the telescope position and the time
+
+    RA and Dec are not derived: it is not known whether the TCS "ra" and "dec" queries report
+    mean or apparent coordinates, and precession alone makes the two differ by more than
+    the cross check tolerance.
+
+    @param[in] pos  telescope (HA, Dec) (degrees), as read by the TCS "pos" status query
+    @param[in] pySec  POSIX time (sec) at which to compute sidereal time
+    @param[in] lat  latitude (degrees)
+    @param[in] longitude  longitude east (degrees)
+    @return a dict of TCS status verb: value, in the units of tcc.dev.tcsDevice.StatusFieldList:
+        st (local apparent sidereal time), ha, telaz (0 north, 90 east),
+        telel, zd (degrees) and airmass
+    """
+    ha, dec = pos
+    az, alt = azAltFromHADec(ha, dec, lat)
+    return dict(
+        st = lastFromPySec(pySec, longitude),
+        ha = ha,
+        telaz = wrapPos(180. - az),
+        telel = alt,
+        zd = 90. - alt,
+        airmass = airmassFromAlt(alt),
+    )
@@ -0,0 +1,221 @@
+from __future__ import division, absolute_import
+"""Asynchronous, buffered log file writer
+
+Log records are formatted on the caller's thread (normally the reactor thread) and handed
+to a bounded in-memory queue; a background thread drains the queue in batches, writes and
+flushes once per batch, and handles daily rotation (compressing the finished file).
+If the queue is full the record is dropped and counted rather than blocking the reactor;
+see AsyncLogWriter.nDropped.
+
+Use startAsyncFileLogging in place of twistedActor's startFileLogging.
+"""
+import datetime
+import gzip
+import logging
+import os
+import Queue
+import shutil
+import threading
+import time
+
+from twisted.internet import reactor
+from twisted.python import log as twistedLog
+
+__all__ = ["AsyncLogWriter", "startAsyncFileLogging", "getAsyncLogWriter"]
+
+_StopWriting = object() # sentinel put on the queue to stop the writer thread
+
+_asyncLogWriter = None
+
+class AsyncLogWriter(object):
+    """!Write log lines to a file from a background thread
+    """
+    def __init__(self, basePath, rotate=None, maxQueueSize=20000, batchSize=500, flushInterval=0.5, compress=True):
+        """!Construct an AsyncLogWriter; call start to start writing
+
+        @param[in] basePath  path and file name prefix of log files;
+            files are named <basePath>-<local start time>.log
+        @param[in] rotate  local time of day (a datetime.time) at which to start a new file;
+            if None then never rotate
+        @param[in] maxQueueSize  maximum number of log lines waiting to be written;
+            additional lines are dropped and counted
+        @param[in] batchSize  maximum number of lines written per flush
+        @param[in] flushInterval  maximum time (sec) a line waits before being written
+        @param[in] compress  gzip each log file when it is rotated?
+        """
+        self.basePath = basePath
+        self.rotate = rotate
+        self.batchSize = int(batchSize)
+        self.flushInterval = float(flushInterval)
+        self.compress = bool(compress)
+        self.queue = Queue.Queue(maxsize=int(maxQueueSize))
+        self.nDropped = 0
+        self.nWritten = 0
+        self.filePath = None
+        self._logFile = None
+        self._nextRollover = None
+        self._thread = threading.Thread(target=self._run, name="AsyncLogWriter")
+        self._thread.daemon = True
+
+    @property
+    def isRunning(self):
+        return self._thread.is_alive()
+
+    def start(self):
+        """!Open the first log file and start the writer thread
+        """
+        logDir = os.path.dirname(self.basePath)
+        if logDir and not os.path.exists(logDir):
+            os.makedirs(logDir)
+        self._openNewFile()
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """!Write all queued lines, close the log file and stop the writer thread
+
+        @param[in] timeout  maximum time (sec) to wait for the writer thread
+        """
+        if not self.isRunning:
+            return
+        try:
+            self.queue.put(_StopWriting, timeout=timeout)
+        except Queue.Full:
+            pass
+        self._thread.join(timeout)
+
+    def writeLine(self, line):
+        """!Queue one line (which should end with a newline) for writing; never blocks
+        """
+        try:
+            self.queue.put_nowait(line)
+        except Queue.Full:
+            self.nDropped += 1
+
+    def twistedObserver(self, eventDict):
+        """!Twisted log observer: format the event and queue it
+        """
+        text = twistedLog.textFromEventDict(eventDict)
+        if text is None:
+            return
+        self.writeLine(self._formatLine(eventDict["time"], text))
+
+    def _formatLine(self, tsec, text):
+        """Format a log line: local time with milliseconds, then the text (continuation lines indented)
+        """
+        timeStr = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(tsec))
+        return "%s.%03d %s\n" % (timeStr, int((tsec % 1) * 1000), text.replace("\n", "\n\t"))
+
+    def _run(self):
+        """Writer thread: drain the queue in batches until told to stop
+        """
+        doStop = False
+        while not doStop:
+            try:
+                line = self.queue.get(timeout=self.flushInterval)
+            except Queue.Empty:
+                self._checkRollover()
+                continue
+            lineList = []
+            while True:
+                if line is _StopWriting:
+                    doStop = True
+                    break
+                lineList.append(line)
+                if len(lineList) >= self.batchSize:
+                    break
+                try:
+                    line = self.queue.get_nowait()
+                except Queue.Empty:
+                    break
+            self._checkRollover()
+            if lineList:
+                self._logFile.write("".join(lineList))
+                self._logFile.flush()
+                self.nWritten += len(lineList)
+        self._logFile.close()
+        self._logFile = None
+
+    def _openNewFile(self):
+        """Open a new log file and compute the next rollover time
+        """
+        now = datetime.datetime.now()
+        self.filePath = "%s-%s.log" % (self.basePath, now.strftime("%Y-%m-%dT%H:%M:%S"))
+        self._logFile = open(self.filePath, "a")
+        if self.rotate is None:
+            self._nextRollover = None
+        else:
+            nextRollover = datetime.datetime.combine(now.date(), self.rotate)
+            if nextRollover <= now:
+                nextRollover += datetime.timedelta(days=1)
+            self._nextRollover = nextRollover
+
+    def _checkRollover(self):
+        """Start a new file if it is time to do so; compress the old one
+        """
+        if self._nextRollover is None or datetime.datetime.now() < self._nextRollover:
+            return
+        oldFile = self._logFile
+        oldPath = self.filePath
+        self._openNewFile()
+        oldFile.close()
+        if self.compress:
+            self._compressFile(oldPath)
+
+    def _compressFile(self, filePath):
+        """Compress a finished log file with gzip and remove the original
+        """
+        try:
+            with open(filePath, "rb") as inFile:
+                gzFile = gzip.open(filePath + ".gz", "wb")
+                try:
+                    shutil.copyfileobj(inFile, gzFile)
+                finally:
+                    gzFile.close()
+            os.remove(filePath)
+        except Exception as e:
+            self.writeLine(self._formatLine(time.time(), "Could not compress log file %s: %s" % (filePath, e)))
+
+
+class AsyncLogHandler(logging.Handler):
+    """!Python logging handler that queues formatted records on an AsyncLogWriter
+    """
+    def __init__(self, writer):
+        logging.Handler.__init__(self)
+        self.writer = writer
+
+    def emit(self, record):
+        try:
+            text = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        self.writer.writeLine(self.writer._formatLine(record.created, text))
+
+
+def startAsyncFileLogging(basePath, rotate=None, **kwargs):
+    """!Start logging to files written by a background thread
+
+    Installs the writer as the twisted log observer (stdout and stderr are redirected to the log,
+    as with twistedActor's startFileLogging) and as a handler on the root python logger.
+    The writer is stopped, and the queue drained, when the reactor shuts down.
+
+    @param[in] basePath  path and file name prefix of log files
+    @param[in] rotate  local time of day (a datetime.time) at which to start a new file; None for never
+    @param[in] kwargs  additional keyword arguments for AsyncLogWriter
+    @return the AsyncLogWriter
+    """
+    global _asyncLogWriter
+    writer = AsyncLogWriter(basePath, rotate=rotate, **kwargs)
+    writer.start()
+    rootLogger = logging.getLogger()
+    rootLogger.addHandler(AsyncLogHandler(writer))
+    rootLogger.setLevel(logging.INFO)
+    twistedLog.startLoggingWithObserver(writer.twistedObserver, setStdout=True)
+    reactor.addSystemEventTrigger("after", "shutdown", writer.stop)
+    _asyncLogWriter = writer
+    return writer
+
+def getAsyncLogWriter():
+    """!Return the AsyncLogWriter started by startAsyncFileLogging, or None
+    """
+    return _asyncLogWriter
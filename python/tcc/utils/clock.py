@@ -0,0 +1,197 @@
+from __future__ import division, absolute_import
+"""A replaceable clock for the device layer and the fake controllers
+
+Code in tcc.dev reads the time with getClock().time(), schedules calls with
+getClock().callLater and uses the Timer defined here (a drop-in replacement for
+RO.Comm.TwistedTimer.Timer). Normally the clock is a RealClock: wall-clock time
+and the twisted reactor.
+
+For tests, install a VirtualClock with setClock. Virtual time only moves when it is
+advanced, either explicitly (advance, runFor) or automatically: startAutoAdvance
+jumps straight to the next scheduled call whenever no busy check reports activity
+(e.g. a device waiting for a reply over a real socket). Multi-minute scenarios then
+run in a fraction of a second, and the order of timed events is deterministic.
+
+Note: time limits on twistedActor commands (setTimeLimit) still use real time.
+"""
+import time
+
+from twisted.internet import reactor, task
+
+__all__ = ["RealClock", "VirtualClock", "Timer", "getClock", "setClock", "deviceIsBusy"]
+
+class RealClock(object):
+    """!Wall-clock time and the twisted reactor
+    """
+    def time(self):
+        """!Return the current time (unix sec)
+        """
+        return time.time()
+
+    def callLater(self, delay, callFunc, *args, **kwargs):
+        """!Call callFunc(*args, **kwargs) after delay sec; return an IDelayedCall
+        """
+        return reactor.callLater(delay, callFunc, *args, **kwargs)
+
+
+class VirtualClock(task.Clock):
+    """!Time that only moves when advanced
+    """
+    def __init__(self, startTime=None):
+        """!Construct a VirtualClock
+
+        @param[in] startTime  initial time (unix sec); if None then use the current wall-clock time
+        """
+        task.Clock.__init__(self)
+        self.rightNow = time.time() if startTime is None else float(startTime)
+        self.busyFuncList = []
+        self._autoAdvanceCall = None
+        self._pollInterval = None
+
+    def time(self):
+        """!Return the current virtual time (unix sec)
+        """
+        return self.seconds()
+
+    def addBusyCheck(self, busyFunc):
+        """!Add a function that returns True while time should not be auto-advanced
+        """
+        self.busyFuncList.append(busyFunc)
+
+    def removeBusyCheck(self, busyFunc):
+        """!Remove a function added with addBusyCheck; ignored if not present
+        """
+        if busyFunc in self.busyFuncList:
+            self.busyFuncList.remove(busyFunc)
+
+    @property
+    def isBusy(self):
+        return any(busyFunc() for busyFunc in self.busyFuncList)
+
+    @property
+    def nextCallTime(self):
+        """Time of the next scheduled call, or None if there are none
+        """
+        callTimeList = [call.getTime() for call in self.getDelayedCalls()]
+        if not callTimeList:
+            return None
+        return min(callTimeList)
+
+    def advanceToNext(self):
+        """!Advance to the next scheduled call and run all calls due then
+
+        @return True if a call was run, False if none were scheduled
+        """
+        nextCallTime = self.nextCallTime
+        if nextCallTime is None:
+            return False
+        self.advance(max(0, nextCallTime - self.seconds()))
+        return True
+
+    def runFor(self, duration):
+        """!Advance by duration sec, running every scheduled call in order (including calls they schedule)
+        """
+        endTime = self.seconds() + duration
+        while True:
+            nextCallTime = self.nextCallTime
+            if nextCallTime is None or nextCallTime > endTime:
+                break
+            self.advance(max(0, nextCallTime - self.seconds()))
+        self.advance(max(0, endTime - self.seconds()))
+
+    @property
+    def isAutoAdvancing(self):
+        return self._autoAdvanceCall is not None
+
+    def startAutoAdvance(self, pollInterval=0.001):
+        """!Advance to the next scheduled call whenever nothing is busy
+
+        Runs on the real reactor, checking every pollInterval (real) sec.
+
+        @param[in] pollInterval  real time (sec) between checks
+        """
+        self.stopAutoAdvance()
+        self._pollInterval = float(pollInterval)
+        self._autoAdvanceCall = reactor.callLater(0, self._autoAdvance)
+
+    def stopAutoAdvance(self):
+        """!Stop auto-advancing
+        """
+        if self._autoAdvanceCall is not None and self._autoAdvanceCall.active():
+            self._autoAdvanceCall.cancel()
+        self._autoAdvanceCall = None
+
+    def _autoAdvance(self):
+        # schedule the next check first, so a call run now can stop auto-advancing
+        self._autoAdvanceCall = reactor.callLater(self._pollInterval, self._autoAdvance)
+        if not self.isBusy:
+            self.advanceToNext()
+
+
+_clock = RealClock()
+
+def getClock():
+    """!Return the clock used by the device layer and fakes
+    """
+    return _clock
+
+def setClock(clock=None):
+    """!Set the clock used by the device layer and fakes
+
+    @param[in] clock  a RealClock or VirtualClock; if None then use a new RealClock
+    @return the clock
+    """
+    global _clock
+    _clock = RealClock() if clock is None else clock
+    return _clock
+
+def deviceIsBusy(device):
+    """!Return True if a device has a command running or queued (e.g. is waiting for a reply)
+
+    Suitable (via functools.partial) as a VirtualClock busy check.
+    """
+    cmdQueue = device.devCmdQueue
+    return bool(cmdQueue.cmdQueue) or not cmdQueue.currExeCmd.cmd.isDone
+
+
+class Timer(object):
+    """!A one-shot timer using the current clock; the same interface as RO.Comm.TwistedTimer.Timer
+    """
+    def __init__(self, sec=None, callFunc=None, *args, **kwargs):
+        """!Construct a Timer; if sec and callFunc are specified, start it
+
+        @param[in] sec  interval (sec)
+        @param[in] callFunc  function to call when the timer fires
+        @param[in] args, kwargs  arguments for callFunc
+        """
+        self._delayedCall = None
+        if sec is not None and callFunc is not None:
+            self.start(sec, callFunc, *args, **kwargs)
+
+    def start(self, sec, callFunc, *args, **kwargs):
+        """!Start or restart the timer, cancelling a pending call
+        """
+        self.cancel()
+        self._delayedCall = getClock().callLater(max(0, sec), self._fire, callFunc, *args, **kwargs)
+
+    def cancel(self):
+        """!Cancel the timer
+
+        @return True if the timer was active, False otherwise
+        """
+        if self.isActive:
+            self._delayedCall.cancel()
+            self._delayedCall = None
+            return True
+        self._delayedCall = None
+        return False
+
+    @property
+    def isActive(self):
+        """True if the timer is pending
+        """
+        return self._delayedCall is not None and self._delayedCall.active()
+
+    def _fire(self, callFunc, *args, **kwargs):
+        self._delayedCall = None
+        callFunc(*args, **kwargs)
@@ -0,0 +1,178 @@
+from __future__ import division, absolute_import
+"""Span style tracing of user commands and the device commands they fan out into.
+
+Every user command dispatched by the actor is given a trace ID. Each device command
+queued while tracing is enabled becomes a span on its device's lane; when it finishes
+the trace ID of its eldest parent command is looked up, so the spans of one user command
+can be found across all devices.
+
+Spans are written in the Chrome trace event format (the "JSON array" flavor),
+one event per line, so a trace can be loaded into chrome://tracing or Perfetto.
+The file is a valid JSON document once tracing is stopped; an unterminated file
+(e.g. if the actor died) is still accepted by both viewers.
+"""
+import json
+import os
+
+from .clock import getClock
+
+__all__ = ["CmdTracer", "cmdTracer"]
+
+UserLane = "user"
+
+def _traceTime(tsec):
+    """Convert unix time (sec) to trace time (integer microseconds)
+    """
+    return int(round(tsec * 1e6))
+
+class CmdTracer(object):
+    """!Record user commands and device commands as spans
+    """
+    def __init__(self):
+        self.filePath = None
+        self._traceFile = None
+        self._nextTraceID = 1
+        self._laneDict = {} # lane name: tid
+        self.nEvents = 0
+        # functions to call with each event dict (in addition to writing the file)
+        self.sinkList = []
+
+    @property
+    def isEnabled(self):
+        """Return True if spans are being recorded
+        """
+        return self._traceFile is not None or bool(self.sinkList)
+
+    def start(self, filePath):
+        """!Start writing spans to a new file
+
+        @param[in] filePath  path of trace file; any existing file is overwritten
+        """
+        self.stop()
+        traceDir = os.path.dirname(filePath)
+        if traceDir and not os.path.exists(traceDir):
+            os.makedirs(traceDir)
+        self._traceFile = open(filePath, "w")
+        self._traceFile.write("[\n")
+        self.filePath = filePath
+        self._laneDict = {}
+        self.nEvents = 0
+
+    def stop(self):
+        """!Stop tracing and close the trace file (if open)
+        """
+        if self._traceFile is None:
+            return
+        self._traceFile.write("\n]\n")
+        self._traceFile.close()
+        self._traceFile = None
+
+    def addSink(self, sinkFunc):
+        """!Add a function to be called with each trace event (a dict)
+        """
+        self.sinkList.append(sinkFunc)
+
+    def removeSink(self, sinkFunc):
+        """!Remove a function added with addSink; ignored if not present
+        """
+        if sinkFunc in self.sinkList:
+            self.sinkList.remove(sinkFunc)
+
+    def getTraceID(self, cmd):
+        """!Return the trace ID for a command: that of its eldest parent, else None
+        """
+        return getattr(cmd.eldestParentCmd, "traceID", None)
+
+    def traceUserCmd(self, userCmd):
+        """!Assign a trace ID to a user command and record it as a span when it finishes
+
+        @param[in,out] userCmd  user command; a traceID attribute is added
+        """
+        if not self.isEnabled:
+            return
+        userCmd.traceID = self._nextTraceID
+        self._nextTraceID += 1
+        startTime = getClock().time()
+        def userCmdCallback(cmd):
+            if not cmd.isDone:
+                return
+            self._addSpan(
+                name = cmd.cmdBody,
+                lane = UserLane,
+                startTime = startTime,
+                args = dict(traceID=cmd.traceID, state=cmd.state, textMsg=cmd.textMsg),
+            )
+        userCmd.addCallback(userCmdCallback)
+
+    def traceDevCmd(self, devCmd, lane):
+        """!Record a device command as a span on the lane of its device
+
+        The span runs from when the command starts running to when it finishes;
+        time spent waiting in the device's command queue is reported as an argument.
+
+        @param[in,out] devCmd  device command, just queued; a traceID attribute is added when done
+        @param[in] lane  name of trace lane (typically the device name)
+        """
+        if not self.isEnabled:
+            return
+        queueTime = getClock().time()
+        runTimeList = []
+        def devCmdCallback(cmd):
+            if cmd.isActive and not runTimeList:
+                runTimeList.append(getClock().time())
+            elif cmd.isDone:
+                startTime = runTimeList[0] if runTimeList else queueTime
+                cmd.traceID = self.getTraceID(cmd)
+                self._addSpan(
+                    name = cmd.cmdStr,
+                    lane = lane,
+                    startTime = startTime,
+                    args = dict(
+                        traceID = cmd.traceID,
+                        state = cmd.state,
+                        queueWaitMs = (startTime - queueTime) * 1000,
+                    ),
+                )
+        devCmd.addCallback(devCmdCallback)
+
+    def _getTID(self, lane):
+        """Return the thread ID for a lane, emitting a lane name event the first time
+        """
+        tid = self._laneDict.get(lane)
+        if tid is None:
+            tid = len(self._laneDict) + 1
+            self._laneDict[lane] = tid
+            self._writeEvent(dict(name="thread_name", ph="M", pid=os.getpid(), tid=tid, args=dict(name=lane)))
+        return tid
+
+    def _addSpan(self, name, lane, startTime, args):
+        """Add a complete span ending now
+        """
+        endTime = getClock().time()
+        ts = _traceTime(startTime)
+        self._writeEvent(dict(
+            name = name,
+            cat = lane,
+            ph = "X",
+            ts = ts,
+            dur = max(0, _traceTime(endTime) - ts),
+            pid = os.getpid(),
+            tid = self._getTID(lane),
+            args = args,
+        ))
+
+    def _writeEvent(self, eventDict):
+        """Write one event to the trace file and pass it to all sinks
+        """
+        if self._traceFile is not None:
+            if self.nEvents > 0:
+                self._traceFile.write(",\n")
+            self._traceFile.write(json.dumps(eventDict))
+            self._traceFile.flush()
+        self.nEvents += 1
+        for sinkFunc in self.sinkList:
+            sinkFunc(eventDict)
+
+
+# the tracer shared by the actor and all devices
+cmdTracer = CmdTracer()
@@ -0,0 +1,108 @@
+from __future__ import division, absolute_import
+"""Level-gated, lazily formatted logging for devices and the actor
+
+Each source (e.g. "tcs", "sec", "scale") has its own verbosity level, which may be
+changed at runtime with the "verbosity" command. Messages are given as a format
+string plus arguments; formatting only happens if the message's level is enabled,
+so a disabled message costs one comparison. Callers that must do real work to build
+an argument can test the isDebug or isVerbose attributes first.
+"""
+from twistedActor import log
+
+__all__ = ["DevLog", "getDevLog", "devLogNames", "levelFromName", "nameFromLevel",
+    "Quiet", "Info", "Debug", "Verbose"]
+
+Quiet = 0 # warnings and errors only
+Info = 1 # commands and state changes (default)
+Debug = 2 # every line written to and read from the device
+Verbose = 3 # parsing details and other chatter
+
+LevelNames = ("quiet", "info", "debug", "verbose")
+
+def levelFromName(levelStr):
+    """!Return a verbosity level from a level name (case blind, unique abbreviations allowed) or integer string
+
+    @raise ValueError if the level is not recognized
+    """
+    levelStr = levelStr.strip().lower()
+    if levelStr.isdigit():
+        level = int(levelStr)
+        if not Quiet <= level <= Verbose:
+            raise ValueError("Verbosity level %i not in range [%i, %i]" % (level, Quiet, Verbose))
+        return level
+    matchList = [ind for ind, name in enumerate(LevelNames) if name.startswith(levelStr)]
+    if len(matchList) != 1:
+        raise ValueError("Unknown verbosity level %r; use one of %s" % (levelStr, ", ".join(LevelNames)))
+    return matchList[0]
+
+def nameFromLevel(level):
+    """!Return the name of a verbosity level
+    """
+    return LevelNames[level]
+
+
+class DevLog(object):
+    """!Log for one source, with a verbosity level
+    """
+    def __init__(self, name, level=Info):
+        """!Construct a DevLog; use getDevLog instead to get a shared instance
+
+        @param[in] name  name of source, e.g. "tcs"
+        @param[in] level  initial verbosity level
+        """
+        self.name = name
+        self.setLevel(level)
+
+    def setLevel(self, level):
+        """!Set verbosity level
+        """
+        self.level = int(level)
+        self.isInfo = self.level >= Info
+        self.isDebug = self.level >= Debug
+        self.isVerbose = self.level >= Verbose
+
+    def info(self, msgFmt, *args):
+        """!Log a message at Info level; msgFmt % args is only evaluated if the level is enabled
+        """
+        if self.isInfo:
+            log.info(msgFmt % args if args else msgFmt)
+
+    def debug(self, msgFmt, *args):
+        """!Log a message at Debug level; msgFmt % args is only evaluated if the level is enabled
+        """
+        if self.isDebug:
+            log.info(msgFmt % args if args else msgFmt)
+
+    def verbose(self, msgFmt, *args):
+        """!Log a message at Verbose level; msgFmt % args is only evaluated if the level is enabled
+        """
+        if self.isVerbose:
+            log.info(msgFmt % args if args else msgFmt)
+
+    def warn(self, msgFmt, *args):
+        """!Log a warning (at every level)
+        """
+        log.warn(msgFmt % args if args else msgFmt)
+
+    def error(self, msgFmt, *args):
+        """!Log an error (at every level)
+        """
+        log.error(msgFmt % args if args else msgFmt)
+
+
+_devLogDict = {}
+
+def getDevLog(name):
+    """!Return the shared DevLog for a named source, creating it if necessary
+    """
+    name = name.lower()
+    devLog = _devLogDict.get(name)
+    if devLog is None:
+        devLog = DevLog(name)
+        _devLogDict[name] = devLog
+    return devLog
+
+def devLogNames():
+    """!Return a sorted list of the names of all sources
+    """
+    return sorted(_devLogDict.keys())
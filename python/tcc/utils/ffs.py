@@ -272,6 +272,18 @@ def get_ffs_altitude(tel_altitude):
         out += tel_altitude**ii*coeff
     return out, False
 
+def get_ffs_altitudes(tel_altitudes):
+    """Vectorized get_ffs_altitude.
+
+    Returns a tuple with an array of FFS altitudes and a boolean array indicating
+    which are at the minimum altitude.
+
+    """
+    tel_altitudes = numpy.asarray(tel_altitudes, dtype=float)
+    is_ffs_at_minimum = tel_altitudes < telescope_alt_limit
+    ffs_altitudes = numpy.where(is_ffs_at_minimum, ffs_alt_limit, numpy.polyval(pfitAll, tel_altitudes))
+    return ffs_altitudes, is_ffs_at_minimum
+
 # x = numpy.arange(min(allTelAlt), max(allTelAlt), 1)
 # y = applyFit(x)
 
@@ -0,0 +1,120 @@
+from __future__ import division, absolute_import
+"""Record and read back the raw line traffic of device connections
+
+A session file is gzipped text. After a short header, each line is one event:
+
+    <time> <source> <direction> <line>
+
+where time is seconds since the start of the session, source identifies the device
+(e.g. "tcs", "scale", "sec"), direction is "w" (written to the device) or "r" (read from
+the device) and line is the raw line without its terminator. Lines are recorded exactly
+as written and read, so a session can be replayed (see tcc.dev.fakeReplay) to reproduce
+a night's reply sequence.
+
+Recording is opt-in: a device records its traffic if its sessionLog attribute is set to
+a function(direction, line), e.g. SessionRecorder.getRecordFunc("tcs").
+"""
+import collections
+import gzip
+import os
+import time
+
+from .clock import getClock
+
+__all__ = ["SessionRecorder", "SessionEvent", "readSession", "sessionFileName"]
+
+SessionFormat = "tcc session 1"
+
+SessionEvent = collections.namedtuple("SessionEvent", ["time", "source", "direction", "line"])
+
+def sessionFileName(tsec=None):
+    """!Return a session file name for a unix time (now if None)
+    """
+    if tsec is None:
+        tsec = time.time()
+    return "session_%s.gz" % (time.strftime("%Y-%m-%dT%H%M%S", time.gmtime(tsec)),)
+
+
+class SessionRecorder(object):
+    """!Write device traffic to a gzipped session file
+    """
+    def __init__(self, filePath, flushInterval=1000):
+        """!Construct a SessionRecorder; the file is created immediately
+
+        @param[in] filePath  path of session file; the directory is created if necessary
+        @param[in] flushInterval  flush the file after this many events
+        """
+        dirPath = os.path.dirname(filePath)
+        if dirPath and not os.path.isdir(dirPath):
+            os.makedirs(dirPath)
+        self.filePath = filePath
+        self.flushInterval = int(flushInterval)
+        self.startTime = getClock().time()
+        self.nEvents = 0
+        self._file = gzip.open(filePath, "wb")
+        self._file.write("# %s\n# start %.6f\n" % (SessionFormat, self.startTime))
+
+    @property
+    def isOpen(self):
+        return self._file is not None
+
+    def record(self, source, direction, line):
+        """!Record one line of traffic
+
+        @param[in] source  device identifier, e.g. "tcs"; must not contain whitespace
+        @param[in] direction  "w" for a line written to the device, "r" for a line read from it
+        @param[in] line  the line, without terminator
+        """
+        if self._file is None:
+            return
+        self._file.write("%.6f %s %s %s\n" % (getClock().time() - self.startTime, source, direction, line.rstrip("\r\n")))
+        self.nEvents += 1
+        if self.nEvents % self.flushInterval == 0:
+            self._file.flush()
+
+    def getRecordFunc(self, source):
+        """!Return a function(direction, line) that records traffic for one source; use as device.sessionLog
+        """
+        def recordFunc(direction, line):
+            self.record(source, direction, line)
+        return recordFunc
+
+    def close(self):
+        """!Flush and close the file; later events are ignored
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def readSession(filePath):
+    """!Read a session file
+
+    A truncated file (e.g. the TCC was killed) is read up to the last complete event.
+
+    @param[in] filePath  path of session file
+    @return two items:
+    - start time of session (unix sec)
+    - a list of SessionEvent, in the order recorded
+
+    @raise RuntimeError if the file is not a session file
+    """
+    startTime = None
+    eventList = []
+    with gzip.open(filePath, "rb") as f:
+        try:
+            header = f.readline().strip()
+            if header != "# %s" % (SessionFormat,):
+                raise RuntimeError("%s is not a session file: header=%r" % (filePath, header))
+            startTime = float(f.readline().split()[-1])
+            for fileLine in f:
+                if not fileLine.endswith("\n"):
+                    break # incomplete last line
+                fieldList = fileLine[:-1].split(" ", 3)
+                if len(fieldList) == 3:
+                    fieldList.append("") # an empty line
+                eventList.append(SessionEvent(float(fieldList[0]), fieldList[1], fieldList[2], fieldList[3]))
+        except (IOError, EOFError, ValueError):
+            if startTime is None:
+                raise RuntimeError("Could not read session file %s" % (filePath,))
+    return startTime, eventList
@@ -0,0 +1,48 @@
+from __future__ import division, absolute_import
+"""Publish device status snapshots to passive subscribers
+
+A device owns a StatusTap and publishes its status object each time a fresh status has
+been parsed. Subscribers (e.g. the telemetry recorder or the TCS error logger) are
+called synchronously with that object; they must be quick and must not modify it.
+A subscriber that raises is logged and otherwise ignored, so it cannot break the
+device's polling loop.
+"""
+import traceback
+
+from twistedActor import log
+
+__all__ = ["StatusTap"]
+
+class StatusTap(object):
+    """!Publish status snapshots to subscribers
+    """
+    def __init__(self, name):
+        """!Construct a StatusTap
+
+        @param[in] name  name of source, for error messages (e.g. "tcs")
+        """
+        self.name = name
+        self.subscriberList = []
+        self.nPublished = 0
+
+    def addSubscriber(self, subscriberFunc):
+        """!Add a function to be called with each published status; ignored if already present
+        """
+        if subscriberFunc not in self.subscriberList:
+            self.subscriberList.append(subscriberFunc)
+
+    def removeSubscriber(self, subscriberFunc):
+        """!Remove a function added with addSubscriber; ignored if not present
+        """
+        if subscriberFunc in self.subscriberList:
+            self.subscriberList.remove(subscriberFunc)
+
+    def publish(self, status):
+        """!Call every subscriber with a status snapshot
+        """
+        self.nPublished += 1
+        for subscriberFunc in self.subscriberList[:]:
+            try:
+                subscriberFunc(status)
+            except Exception:
+                log.error("%s status subscriber %s failed:\n%s" % (self.name, subscriberFunc, traceback.format_exc()))
@@ -0,0 +1,75 @@
+from __future__ import division, absolute_import
+"""Log TCS tracking errors from the TCS status tap
+
+Replaces the standalone bin/tcsErrLogger.py, which opened its own telnet connection
+to the TCS. The file has the same columns: a header line, then one line per status
+sample taken while tracking:
+    <ISO timestamp> <RERR> <DERR> <STATE> <HA> <DEC>
+Each value is the TCS reply text, as the old logger wrote it, with one exception:
+while local astrometry is in use (see tcc.dev.tcsDevice.Status.useLocalAstrometry) HA and DEC
+are not polled, so they are computed locally (HA from POS, DEC the mean DEC from MPOS)
+and written in the TCS's sexagesimal format (hours:min:sec and deg:min:sec).
+Samples arrive at the actor's poll rate, so the file is kept open (line buffered)
+rather than opened for each sample; call close when done.
+"""
+import datetime
+import os
+
+from RO.StringUtil import dmsStrFromDeg
+
+__all__ = ["TCSErrLogger"]
+
+TrackingStateEnum = 2
+Header = "Timestamp RERR DERR STATE HA DEC\n"
+
+def _fmtField(statusField, fmtFunc=str):
+    """Return the TCS reply text of a status field, else its value formatted by fmtFunc, else "?"
+    """
+    if statusField.replyStr is not None:
+        return statusField.replyStr.strip() or "?"
+    if statusField.value is None:
+        return "?"
+    return fmtFunc(statusField.value)
+
+class TCSErrLogger(object):
+    """!TCS status subscriber that appends tracking errors to a text file
+    """
+    def __init__(self, filePath):
+        """!Construct a TCSErrLogger
+
+        @param[in] filePath  path of log file; appended to if it exists
+        """
+        self.filePath = filePath
+        logDir = os.path.dirname(filePath)
+        if logDir and not os.path.exists(logDir):
+            os.makedirs(logDir)
+        isNew = not os.path.exists(filePath)
+        self._logFile = open(filePath, "a", 1)
+        if isNew:
+            self._logFile.write(Header)
+
+    def close(self):
+        """!Close the log file; later samples are ignored
+        """
+        if self._logFile is None:
+            return
+        self._logFile.close()
+        self._logFile = None
+
+    def __call__(self, status):
+        """!Append one line if the telescope is tracking
+
+        @param[in] status  a tcsDevice.Status
+        """
+        fieldDict = status.statusFieldDict
+        if self._logFile is None or fieldDict["state"].value != "Tracking":
+            return
+        line = "%s %s %s %s %s %s\n" % (
+            datetime.datetime.now().isoformat(),
+            _fmtField(fieldDict["rerr"]),
+            _fmtField(fieldDict["derr"]),
+            _fmtField(fieldDict["state"], lambda val: "%i" % (TrackingStateEnum,)),
+            _fmtField(fieldDict["ha"], lambda val: dmsStrFromDeg(val / 15.)),
+            _fmtField(fieldDict["dec"], dmsStrFromDeg),
+        )
+        self._logFile.write(line)
@@ -0,0 +1,242 @@
+from __future__ import division, absolute_import
+"""Night-long telemetry recorder using a compact, memory-mappable columnar format
+
+Status samples from the TCS, M2 (sec) and scaling ring (scale) are buffered in memory
+and appended to disk in chunks. Each night (local noon to local noon) has three files
+in the telemetry directory:
+- <night>.tlm: the data; a sequence of chunks, each a float64 array of shape (nColumns, nRows)
+  stored column-major, so every column of a chunk is contiguous and can be memory mapped.
+- <night>.tlmidx: the time index; one float64 record per chunk:
+  stream number, byte offset in the data file, number of rows, min time, max time.
+  A chunk is only listed once its data has been written.
+- <night>.json: the column names of each stream.
+
+All values are float64; None becomes NaN, booleans 0/1 and states are small integer codes.
+Time is unix time (sec). Use TelemetryReader.query to load a time range of one stream
+as numpy arrays; only chunks that overlap the time range are read.
+"""
+import collections
+import json
+import os
+import time
+
+import numpy
+
+__all__ = ["TelemetryRecorder", "TelemetryReader", "StreamColumnDict", "nightFromTime"]
+
+# stream name: list of column names; time is always first
+StreamColumnDict = collections.OrderedDict((
+    ("tcs", [
+        "time", "state", "rerr", "derr", "ha", "dec", "meanRA", "meanDec", "inpRA", "inpDec",
+        "st", "telAz", "telEl", "rotPos", "airmass", "zd", "clamped", "rotMoving",
+        "trussTemp", "screenPos",
+    ]),
+    ("sec", [
+        "time", "state", "focus", "tiltX", "tiltY", "transX", "transY",
+        "desFocus", "desTiltX", "desTiltY", "desTransX", "desTransY", "speed", "galil",
+    ]),
+    ("scale", [
+        "time", "state", "position", "desPosition", "speed", "cartID", "locked", "loaded",
+    ]),
+))
+
+# codes for state strings
+StateCodeDict = {
+    "Halted": 1, "Tracking": 2, "Slewing": 3, # TCS
+    "Done": 0, "Moving": 1, "Failed": 2, "Homing": 3, "NotHomed": 4, # sec and scale
+}
+
+IndexRecordLen = 5 # stream number, offset, number of rows, min time, max time
+
+NightOffset = 12 * 3600 # nights roll over at local noon
+
+def nightFromTime(tsec):
+    """!Return the night label (local date at the start of the night) for a unix time
+    """
+    return time.strftime("%Y-%m-%d", time.localtime(tsec - NightOffset))
+
+def _floatOrNaN(value):
+    if value is None:
+        return numpy.nan
+    return float(value)
+
+def _stateCode(state):
+    if state is None:
+        return numpy.nan
+    return StateCodeDict.get(state, -1)
+
+def _onOffCode(value):
+    if value is None:
+        return numpy.nan
+    return 1. if value.lower() == "on" else 0.
+
+def tcsSample(status, tsec):
+    """!Return a tcs telemetry row from a tcsDevice.Status
+    """
+    fieldDict = status.statusFieldDict
+    def value(verb):
+        return fieldDict[verb].value
+    haDec = value("pos") or [None, None]
+    meanRADec = value("mpos") or [None, None]
+    axisDict = value("axisstatus")
+    rotMoving = None if axisDict is None else axisDict["rot"].isMoving
+    return [tsec, _stateCode(value("state"))] + [_floatOrNaN(val) for val in (
+        value("rerr"), value("derr"), haDec[0], haDec[1], meanRADec[0], meanRADec[1],
+        value("inpra"), value("inpdc"), value("st"), value("telaz"), value("telel"),
+        value("rawpos"), value("airmass"), value("zd"), value("mrp"), rotMoving,
+        value("ttruss"), value("lplc"),
+    )]
+
+def secSample(status, tsec):
+    """!Return a sec telemetry row from an m2Device.Status
+    """
+    return [tsec, _stateCode(status.state)] \
+        + [_floatOrNaN(val) for val in status.orientation] \
+        + [_floatOrNaN(val) for val in status.desOrientation] \
+        + [_floatOrNaN(status.speed), _onOffCode(status.galil)]
+
+def scaleSample(status, tsec):
+    """!Return a scale telemetry row from a scaleDevice.Status
+    """
+    return [tsec, _stateCode(status._state)] + [_floatOrNaN(val) for val in (
+        status.position, status.desPosition, status.speed, status.cartID, status.locked, status.loaded,
+    )]
+
+
+class TelemetryRecorder(object):
+    """!Buffer status samples and append them to per-night column files
+    """
+    def __init__(self, telemetryDir, chunkSize=256, maxChunkAge=60.):
+        """!Construct a TelemetryRecorder
+
+        @param[in] telemetryDir  directory for telemetry files (created if necessary)
+        @param[in] chunkSize  maximum number of samples per chunk
+        @param[in] maxChunkAge  maximum time (sec) a sample is buffered before its chunk is written
+        """
+        self.telemetryDir = telemetryDir
+        self.chunkSize = int(chunkSize)
+        self.maxChunkAge = float(maxChunkAge)
+        if not os.path.exists(telemetryDir):
+            os.makedirs(telemetryDir)
+        self.streamNames = list(StreamColumnDict.keys())
+        self._bufferDict = dict((name, []) for name in self.streamNames)
+
+    def recordTCS(self, status):
+        """!Record a sample from a tcsDevice.Status
+        """
+        self.record("tcs", tcsSample(status, time.time()))
+
+    def recordSec(self, status):
+        """!Record a sample from an m2Device.Status
+        """
+        self.record("sec", secSample(status, time.time()))
+
+    def recordScale(self, status):
+        """!Record a sample from a scaleDevice.Status
+        """
+        self.record("scale", scaleSample(status, time.time()))
+
+    def record(self, streamName, row):
+        """!Record one sample
+
+        @param[in] streamName  name of stream; one of StreamColumnDict.keys()
+        @param[in] row  list of values, one per column of the stream (time first)
+        """
+        buffer = self._bufferDict[streamName]
+        buffer.append(row)
+        if len(buffer) >= self.chunkSize or row[0] - buffer[0][0] > self.maxChunkAge:
+            self.flushStream(streamName)
+
+    def flush(self):
+        """!Write all buffered samples
+        """
+        for streamName in self.streamNames:
+            self.flushStream(streamName)
+
+    close = flush
+
+    def flushStream(self, streamName):
+        """!Write the buffered samples of one stream as a chunk
+        """
+        buffer = self._bufferDict[streamName]
+        if not buffer:
+            return
+        self._bufferDict[streamName] = []
+        chunk = numpy.array(buffer, dtype=numpy.float64).T # shape (nColumns, nRows)
+        times = chunk[0]
+        basePath = os.path.join(self.telemetryDir, nightFromTime(times[0]))
+        if not os.path.exists(basePath + ".json"):
+            with open(basePath + ".json", "w") as f:
+                json.dump(StreamColumnDict, f)
+        with open(basePath + ".tlm", "ab") as dataFile:
+            dataFile.seek(0, os.SEEK_END)
+            offset = dataFile.tell()
+            numpy.ascontiguousarray(chunk).tofile(dataFile)
+        indexRecord = numpy.array([
+            self.streamNames.index(streamName), offset, chunk.shape[1], times.min(), times.max(),
+        ], dtype=numpy.float64)
+        with open(basePath + ".tlmidx", "ab") as indexFile:
+            indexRecord.tofile(indexFile)
+
+
+class TelemetryReader(object):
+    """!Query telemetry written by a TelemetryRecorder
+    """
+    def __init__(self, telemetryDir):
+        """!Construct a TelemetryReader
+
+        @param[in] telemetryDir  directory containing telemetry files
+        """
+        self.telemetryDir = telemetryDir
+
+    def nights(self):
+        """!Return a sorted list of nights (labels) for which there is data
+        """
+        return sorted(fileName[:-len(".tlmidx")] for fileName in os.listdir(self.telemetryDir)
+            if fileName.endswith(".tlmidx"))
+
+    def readIndex(self, night):
+        """!Return the time index of a night as an array of shape (nChunks, 5)
+        """
+        indexPath = os.path.join(self.telemetryDir, night + ".tlmidx")
+        return numpy.fromfile(indexPath, dtype=numpy.float64).reshape(-1, IndexRecordLen)
+
+    def query(self, streamName, startTime, endTime, columns=None):
+        """!Return samples of one stream with startTime <= time <= endTime
+
+        @param[in] streamName  name of stream, e.g. "tcs"
+        @param[in] startTime  start of time range (unix sec)
+        @param[in] endTime  end of time range (unix sec)
+        @param[in] columns  list of column names to return; if None return all columns
+        @return a dict of column name: 1-d numpy array, sorted by time
+        """
+        if streamName not in StreamColumnDict:
+            raise RuntimeError("Unknown telemetry stream %r" % (streamName,))
+        allColumns = StreamColumnDict[streamName]
+        if columns is None:
+            columns = allColumns
+        colIndList = [allColumns.index(col) for col in columns]
+        streamNum = list(StreamColumnDict.keys()).index(streamName)
+        # chunks may start before the night of their first sample; allow for one night of slop
+        firstNight = nightFromTime(startTime - 86400)
+        lastNight = nightFromTime(endTime + 86400)
+        timeList = []
+        valueLists = [[] for col in columns]
+        for night in self.nights():
+            if not firstNight <= night <= lastNight:
+                continue
+            index = self.readIndex(night)
+            useChunk = (index[:, 0] == streamNum) & (index[:, 4] >= startTime) & (index[:, 3] <= endTime)
+            dataPath = os.path.join(self.telemetryDir, night + ".tlm")
+            for streamInd, offset, nRows, tMin, tMax in index[useChunk]:
+                chunk = numpy.memmap(dataPath, dtype=numpy.float64, mode="r",
+                    offset=int(offset), shape=(len(allColumns), int(nRows)))
+                times = chunk[0]
+                inRange = (times >= startTime) & (times <= endTime)
+                timeList.append(numpy.array(times[inRange]))
+                for valueList, colInd in zip(valueLists, colIndList):
+                    valueList.append(numpy.array(chunk[colInd][inRange]))
+        if not timeList:
+            return dict((col, numpy.zeros(0)) for col in columns)
+        sortInds = numpy.argsort(numpy.concatenate(timeList), kind="mergesort")
+        return dict((col, numpy.concatenate(valueList)[sortInds]) for col, valueList in zip(columns, valueLists))
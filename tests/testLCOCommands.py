@@ -3,6 +3,10 @@ from __future__ import division, absolute_import
 
 import functools
 import itertools
+import json
+import os
+import tempfile
+import time
 
 import numpy
 
@@ -11,8 +15,11 @@ from twisted.internet.defer import gatherResults, Deferred
 from twisted.internet import reactor
 
 from tcc.actor import TCCLCODispatcherWrapper
+from tcc.dev.fakeLCODevs import RotUnclampDelay
+from tcc.utils import devLog
+from tcc.utils.clock import VirtualClock, getClock
 
-from twistedActor import testUtils
+from twistedActor import UserCmd, testUtils
 
 testUtils.init(__file__)
 
@@ -60,7 +67,7 @@ class TestLCOCommands(TestCase):
     def setUp(self):
         """!Set up a test
         """
-        self.dw = TCCLCODispatcherWrapper()
+        self.dw = TCCLCODispatcherWrapper(loopback=True)
         # reset the global threadring position
         return self.dw.readyDeferred
 
@@ -274,6 +281,28 @@ class TestLCOCommands(TestCase):
             callFunc = functools.partial(self.checkScale, scaleVal=scaleVal)
             )
 
+    def testScaleWhileM2Moving(self):
+        """!A scale change while M2 is moving is merged into the next M2 move, rather than rejected
+        """
+        scaleVal = 1.00006
+        secDev = self.actor.secDev
+        focusCmd = secDev.focus(100., offset=True)
+        returnD = Deferred()
+        def setScaleWhenMoving():
+            if not secDev.isBusy:
+                if focusCmd.isDone:
+                    returnD.errback(AssertionError("M2 was never seen moving"))
+                else:
+                    reactor.callLater(0.05, setScaleWhenMoving)
+                return
+            scaleD = self.queueCmd(
+                cmdStr = "set scale=%.6f"%scaleVal,
+                callFunc = functools.partial(self.checkScale, scaleVal=scaleVal)
+            )
+            scaleD.chainDeferred(returnD)
+        setScaleWhenMoving()
+        return returnD
+
     def testShowScale(self):
         def cb(cmdVar):
             self.assertTrue(cmdVar.isDone and not cmdVar.didFail)
@@ -418,6 +447,40 @@ class TestLCOCommands(TestCase):
                 self.assertEqual(x1, x2)
         return self.queueCmd("sec move %.4f, %.2f"%(position,tipx), cb)
 
+    def testCollimationOneMove(self):
+        """!A flexure update and a thermal focus update due at once go to M2 as a single move
+        """
+        model = self.actor.collimationModel
+        secDev = self.actor.secDev
+        model.doCollimate = False # no timed updates
+        model.addTrussTemp(10., getClock().time())
+        startFocus = secDev.status.secFocus
+        # a baseline 1 C warmer than now is a thermal correction of about 70 um
+        model.setFocus(startFocus, model.smoothTrussTemp + 1)
+        moveLineList = []
+        def recordWrite(direction, line):
+            if direction == "w" and line.split()[0].lower() in ("move", "offset"):
+                moveLineList.append(line)
+        secDev.sessionLog = recordWrite
+        returnD = Deferred()
+        def cb(cmd):
+            if not cmd.isDone:
+                return
+            try:
+                self.assertFalse(cmd.didFail)
+                self.assertEqual(len(moveLineList), 1)
+                # the thermal correction was applied on top of the starting focus
+                self.assertGreater(model.appliedFocus - startFocus, model.minFocus)
+                self.assertAlmostEqual(secDev.status.secFocus, model.appliedFocus, places=1)
+            except Exception as e:
+                returnD.errback(e)
+            else:
+                returnD.callback(None)
+        userCmd = UserCmd()
+        userCmd.addCallback(cb)
+        self.actor.updateCollimation(userCmd, force=True)
+        return returnD
+
     def testTarget(self):
         ra = 5
         dec = 6
@@ -480,6 +543,46 @@ class TestLCOCommands(TestCase):
             self.assertTrue(cmdVar.isDone and not cmdVar.didFail)
         return self.queueCmd("guideoffset %.8f, %.8f, %.8f, %.8f, %.8f"%tuple(offsets), cb)
 
+    def testTrace(self):
+        returnD = Deferred()
+        tracePath = os.path.join(tempfile.mkdtemp(), "trace.json")
+        def checkTrace(cmdVar):
+            if not cmdVar.isDone:
+                return
+            self.assertFalse(cmdVar.didFail)
+            with open(tracePath, "r") as f:
+                eventList = json.load(f)
+            spanList = [event for event in eventList if event["ph"] == "X"]
+            targetSpans = [span for span in spanList if span["name"].startswith("target")]
+            self.assertEqual(len(targetSpans), 1)
+            traceID = targetSpans[0]["args"]["traceID"]
+            tcsVerbs = [span["name"].split()[0].upper() for span in spanList
+                if span["args"]["traceID"] == traceID and span["cat"] != "user"]
+            for verb in ["RAD", "DECD", "MP"]:
+                self.assertTrue(verb in tcsVerbs)
+            returnD.callback(None)
+        def traceOff(cmdVar):
+            if cmdVar.isDone:
+                self.assertFalse(cmdVar.didFail)
+                self.queueCmd("trace off", checkTrace)
+        def startTarget(cmdVar):
+            if cmdVar.isDone:
+                self.assertFalse(cmdVar.didFail)
+                self.queueCmd("target 5, 6 icrs", traceOff)
+        self.queueCmd("trace on /file=\"%s\"" % (tracePath,), startTarget)
+        return returnD
+
+
+    def testVerbosity(self):
+        tcsLog = devLog.getDevLog("tcs")
+        initLevel = tcsLog.level
+        def cb(cmdVar):
+            if cmdVar.isDone:
+                self.assertFalse(cmdVar.didFail)
+                self.assertEqual(tcsLog.level, devLog.Debug)
+                self.assertTrue(tcsLog.isDebug)
+                tcsLog.setLevel(initLevel)
+        return self.queueCmd("verbosity tcs=debug, sec", cb)
 
     # def testOffsetGuideFail(self):
     #     offset = 0.001
@@ -500,6 +603,74 @@ class TestLCOCommands(TestCase):
     #         self.assertTrue(cmdVar.isDone and not cmdVar.didFail)
     #     return self.queueCmd("target %.4f, %.2f icrs"%(5,6), cb)
 
+
+class TestLCOCommandsVirtual(TestLCOCommands):
+    """!Run the same scenarios with the devices and fake controllers on a virtual clock
+
+    Time jumps ahead whenever no device is waiting for a reply, so slews and moves
+    take almost no real time, and timed events happen in a deterministic order.
+    """
+    def setUp(self):
+        """!Set up a test
+        """
+        self.dw = TCCLCODispatcherWrapper(loopback=True, clock=VirtualClock())
+        return self.dw.readyDeferred
+
+    def testLongSlew(self):
+        """!A slew of over two minutes completes on virtual time, in a small fraction of that in real time
+        """
+        ra, dec = 170, -70 # from ra=0, dec=0 at 1.25 deg/sec this is a 136 second slew
+        startTime = getClock().time()
+        realStartTime = time.time()
+        def cb(cmdVar):
+            if not cmdVar.isDone:
+                return
+            self.assertFalse(cmdVar.didFail)
+            self.assertGreater(getClock().time() - startTime, 120)
+            self.assertLess(time.time() - realStartTime, 60)
+            # MPOS is reported to 0.0001 radians
+            fieldDict = self.actor.tcsDev.status.statusFieldDict
+            self.assertAlmostEqual(fieldDict["ra"].value, ra, delta=0.01)
+            self.assertAlmostEqual(fieldDict["dec"].value, dec, delta=0.01)
+        return self.queueCmd("target %.4f, %.2f icrs"%(ra, dec), cb)
+
+    def testRotOffsetWaitsForUnclamp(self):
+        """!A rotator offset is not done until the rotator has unclamped, moved and clamped again
+
+        The clamp reads engaged for RotUnclampDelay after APGCIR, so it must not be taken as the end of the move
+        """
+        tcsDev = self.actor.tcsDev
+        fakeTCS = self.dw.actorWrapper.tcsWrapper.controller
+        startTime = getClock().time()
+        returnD = Deferred()
+        def cb(userCmd):
+            if not userCmd.isDone:
+                return
+            try:
+                self.assertFalse(userCmd.didFail)
+                self.assertTrue(tcsDev.rotSawUnclamp)
+                self.assertGreater(getClock().time() - startTime, RotUnclampDelay)
+                self.assertEqual((fakeTCS.isClamped, fakeTCS.imoving), (1, 0))
+                self.assertAlmostEqual(fakeTCS.rotMove.position(), fakeTCS.targRot)
+            except Exception as e:
+                returnD.errback(e)
+            else:
+                returnD.callback(None)
+        tcsDev.rotOffset(0.01).addCallback(cb)
+        return returnD
+
+def _makeSkippedTest(reason):
+    def skippedTest(self):
+        pass
+    skippedTest.skip = reason
+    return skippedTest
+
+# these check intermediate state (e.g. still slewing) after a fixed real-time delay,
+# by which time virtual time has usually run past the end of the move
+for _testName in ("testOffset", "testOffset2", "testDoubleOffset", "testDoubleOffset2", "testThreadRingMoveStopWithDelay",
+        "testScaleWhileM2Moving"):
+    setattr(TestLCOCommandsVirtual, _testName, _makeSkippedTest("checks state after a real-time delay"))
+
 if __name__ == '__main__':
     from unittest import main
     main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python2
+from __future__ import division, absolute_import
+
+import RO.Comm.Generic
+RO.Comm.Generic.setFramework("twisted")
+from twisted.trial.unittest import TestCase
+from twisted.internet.defer import Deferred, gatherResults
+from twisted.internet import reactor
+
+from tcc.dev.loopback import LoopbackServer, LoopbackConnection
+from tcc.dev.fakeLCODevs import FakeScaleCtrl
+
+
+def stateDeferred(obj, isDoneFunc):
+    """Return a Deferred that fires when isDoneFunc(obj) is True
+    """
+    d = Deferred()
+    def stateCallback(ignored=None):
+        if not d.called and isDoneFunc(obj):
+            d.callback(obj)
+    obj.addStateCallback(stateCallback)
+    stateCallback()
+    return d
+
+
+class TestLoopback(TestCase):
+
+    def setUp(self):
+        self.readLineList = []
+        self.closeList = []
+
+    def tearDown(self):
+        for obj in self.closeList:
+            obj.close()
+        return gatherResults([stateDeferred(obj, lambda o: o.isDone) for obj in self.closeList])
+
+    def makeConn(self, server):
+        conn = LoopbackConnection(
+            server = server,
+            readLines = True,
+            readCallback = lambda sock, line: self.readLineList.append(line),
+            name = "testConn",
+        )
+        conn.connect()
+        return conn
+
+    def testEcho(self):
+        """Lines are framed and delivered in order in both directions
+        """
+        def sockReadCallback(sock):
+            line = sock.readLine()
+            if line is not None:
+                sock.writeLine(line.upper())
+        server = LoopbackServer(sockReadCallback=sockReadCallback, name="echo")
+        self.closeList.append(server)
+        self.assertTrue(server.port > 0)
+        conn = self.makeConn(server)
+        def checkConnected(conn):
+            self.assertFalse(conn.didFail)
+            # several lines in one write are read one at a time
+            conn.write("one\r\ntwo\nthree")
+            conn.write("\rfour\r\n")
+            return self.waitForLines(4)
+        def checkLines(ignored):
+            self.assertEqual(self.readLineList, ["ONE", "TWO", "THREE", "FOUR"])
+            conn.disconnect()
+            return stateDeferred(conn, lambda c: c.isDisconnected)
+        d = stateDeferred(conn, lambda c: c.isDone)
+        d.addCallback(checkConnected)
+        d.addCallback(checkLines)
+        return d
+
+    def testFakeCtrl(self):
+        """A fake controller serves a loopback connection
+        """
+        fakeScale = FakeScaleCtrl(name="fakeScale", port=0, loopback=True)
+        fakeScale.positionMove.stop()
+        self.closeList.append(fakeScale)
+        def checkReady(ignored):
+            conn = self.makeConn(fakeScale.server)
+            d = stateDeferred(conn, lambda c: c.isDone)
+            d.addCallback(lambda conn: conn.writeLine("status"))
+            d.addCallback(lambda ignored: self.waitForLines(0, lastLine="OK"))
+            d.addCallback(lambda ignored: conn.disconnect())
+            return d
+        def checkLines(ignored):
+            self.assertEqual(self.readLineList[0], "status") # the fake scale echoes commands
+            self.assertTrue(any(line.startswith("THREAD_RING_AXIS") for line in self.readLineList))
+        d = stateDeferred(fakeScale, lambda f: f.isReady)
+        d.addCallback(checkReady)
+        d.addCallback(checkLines)
+        return d
+
+    def testNotListening(self):
+        """Connecting to a closed server fails
+        """
+        server = LoopbackServer(name="closed")
+        server.close()
+        conn = self.makeConn(server)
+        d = stateDeferred(conn, lambda c: c.isDone)
+        d.addCallback(lambda conn: self.assertTrue(conn.didFail))
+        return d
+
+    def waitForLines(self, nLines, lastLine=None):
+        """Return a Deferred that fires when nLines lines (or a line equal to lastLine) have been read
+        """
+        d = Deferred()
+        def check():
+            if lastLine in self.readLineList or (lastLine is None and len(self.readLineList) >= nLines):
+                d.callback(None)
+            else:
+                reactor.callLater(0.001, check)
+        check()
+        return d
+
+
+if __name__ == '__main__':
+    from unittest import main
+    main()
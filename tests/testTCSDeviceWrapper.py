@@ -0,0 +1,192 @@
+#!/usr/bin/env python2
+from __future__ import division, absolute_import
+
+from twisted.trial.unittest import TestCase
+from twisted.internet.defer import Deferred, gatherResults
+from twisted.internet import reactor
+
+from twistedActor import DevCmd, expandCommand, testUtils
+
+from tcc.dev import TCSDeviceWrapper
+
+testUtils.init(__file__)
+
+class TestTCSDeviceWrapper(TestCase):
+    """Test the TCS device against its fake controller
+    """
+    def setUp(self):
+        self.dw = TCSDeviceWrapper(name="tcsWrapper", loopback=True)
+        return self.dw.readyDeferred
+
+    def tearDown(self):
+        delayedCalls = reactor.getDelayedCalls()
+        for call in delayedCalls:
+            call.cancel()
+        return self.dw.close()
+
+    @property
+    def device(self):
+        return self.dw.device
+
+    @property
+    def fakeTCS(self):
+        return self.dw.controller
+
+    def waitCmd(self, cmd, checkFunc):
+        """Return a Deferred that fires when cmd is done, after calling checkFunc(cmd)
+        """
+        d = Deferred()
+        def callback(cmd):
+            if not cmd.isDone or d.called:
+                return
+            try:
+                checkFunc(cmd)
+            except Exception as e:
+                d.errback(e)
+            else:
+                d.callback(None)
+        cmd.addCallback(callback)
+        return d
+
+    def queueBatch(self, cmdStrList):
+        """Queue a batch of device commands; return the list of DevCmds and the batch command
+        """
+        devCmdList = [DevCmd(cmdStr=cmdStr) for cmdStr in cmdStrList]
+        return devCmdList, self.device.queueDevCmdBatch(devCmdList)
+
+    def testBatchAbort(self):
+        """A failed command aborts the rest of a batch, but replies to commands already written still match
+        """
+        self.fakeTCS.errorVerbSet.add("OFRA")
+        (ofraCmd, ofdcCmd, offpCmd), batchCmd = self.queueBatch(["OFRA 3600", "OFDC 7200", "OFFP"])
+        def checkResult(batchCmd):
+            self.assertTrue(batchCmd.didFail)
+            self.assertIn("OFRA", batchCmd.textMsg)
+            self.assertTrue(ofraCmd.didFail)
+            # OFDC was written with OFRA, and is matched to its own reply
+            self.assertTrue(ofdcCmd.isDone and not ofdcCmd.didFail)
+            self.assertEqual(self.fakeTCS.offDec, 2.)
+            # OFFP is a barrier, so was held and then cancelled
+            self.assertEqual(offpCmd.state, offpCmd.Cancelled)
+            self.assertEqual(self.fakeTCS.targDec, 0.)
+        return self.waitCmd(batchCmd, checkResult)
+
+    def testBatchCancelUnwritten(self):
+        """Commands held behind a failed barrier are cancelled without being written
+        """
+        self.fakeTCS.errorVerbSet.add("MP")
+        devCmdList, batchCmd = self.queueBatch(["OFRA 0", "OFDC 0", "MP 2000", "INPS 10"])
+        def checkResult(batchCmd):
+            self.assertTrue(batchCmd.didFail)
+            self.assertEqual([devCmd.didFail for devCmd in devCmdList], [False, False, True, True])
+            self.assertEqual(devCmdList[-1].state, devCmdList[-1].Cancelled)
+            self.assertEqual(self.fakeTCS.inpScreen, 0.)
+        return self.waitCmd(batchCmd, checkResult)
+
+    def testBatchMPNoReply(self):
+        """MP is set done if it gets no reply, and the next command is not written until then,
+        so its reply is not taken for the reply to MP
+        """
+        self.fakeTCS.silentVerbSet.add("MP")
+        devCmdList, batchCmd = self.queueBatch(["OFRA 0", "OFDC 0", "MP 2000", "INPS 10"])
+        def checkResult(batchCmd):
+            self.assertFalse(batchCmd.didFail)
+            self.assertFalse(any(devCmd.didFail for devCmd in devCmdList))
+            self.assertEqual(self.fakeTCS.inpScreen, 10.)
+        return self.waitCmd(batchCmd, checkResult)
+
+    def testGuideOffset(self):
+        """A guide correction moves the telescope and rotator
+        """
+        startRot = self.fakeTCS.targRot
+        userCmd = self.device.guideOffset(1 / 3600., -2 / 3600., 0.01)
+        def checkResult(userCmd):
+            self.assertFalse(userCmd.didFail)
+            self.assertAlmostEqual(self.fakeTCS.targRA, 1 / 3600.)
+            self.assertAlmostEqual(self.fakeTCS.targDec, -2 / 3600.)
+            self.assertAlmostEqual(self.fakeTCS.targRot, startRot - 0.01, places=3)
+        return self.waitCmd(userCmd, checkResult)
+
+    def testGuideOffsetRawPosFails(self):
+        """If the rotator position cannot be read, nothing is written and both moves fail
+        """
+        self.fakeTCS.errorVerbSet.add("RAWPOS")
+        startRot = self.fakeTCS.targRot
+        userCmd = self.device.guideOffset(1 / 3600., 0, 0.01)
+        waitCmdList = [self.device.waitOffsetCmd, self.device.waitRotCmd]
+        def checkResult(userCmd):
+            self.assertTrue(userCmd.didFail)
+            for waitCmd in waitCmdList:
+                self.assertTrue(waitCmd.didFail)
+                self.assertIn("Could not read rotator position", waitCmd.textMsg)
+            self.assertEqual((self.fakeTCS.offRA, self.fakeTCS.targRA), (0., 0.))
+            self.assertEqual(self.fakeTCS.targRot, startRot)
+        return self.waitCmd(userCmd, checkResult)
+
+    def testGuideOffsetAPGCIRFails(self):
+        """A rejected APGCIR fails only the rotator move; the ra/dec offset is still made
+        """
+        self.fakeTCS.errorVerbSet.add("APGCIR")
+        self.device.guideOffset(1 / 3600., 0, 0.01)
+        waitOffsetCmd, waitRotCmd = self.device.waitOffsetCmd, self.device.waitRotCmd
+        def checkResult(waitOffsetCmd):
+            self.assertFalse(waitOffsetCmd.didFail)
+            self.assertTrue(waitRotCmd.didFail)
+            self.assertAlmostEqual(self.fakeTCS.targRA, 1 / 3600.)
+        return self.waitCmd(waitOffsetCmd, checkResult)
+
+    def testGuideOffsetOFRAFails(self):
+        """A rejected OFRA fails only the ra/dec offset: OFFP is not written, and the rotator still moves
+        """
+        self.fakeTCS.errorVerbSet.add("OFRA")
+        startRot = self.fakeTCS.targRot
+        userCmd = self.device.guideOffset(1 / 3600., 0, 0.01)
+        waitOffsetCmd, waitRotCmd = self.device.waitOffsetCmd, self.device.waitRotCmd
+        def checkRot(waitRotCmd):
+            self.assertFalse(waitRotCmd.didFail)
+            self.assertTrue(waitOffsetCmd.didFail)
+            self.assertEqual(self.fakeTCS.targRA, 0.)
+            self.assertAlmostEqual(self.fakeTCS.targRot, startRot - 0.01, places=3)
+        def checkUserCmd(userCmd):
+            self.assertTrue(userCmd.didFail)
+        return gatherResults([self.waitCmd(waitRotCmd, checkRot), self.waitCmd(userCmd, checkUserCmd)])
+
+    def testStatusDuringRotPoll(self):
+        """A fast rotator poll queued with a full status poll does not cancel it
+        """
+        self.device.waitRotCmd = expandCommand()
+        self.device.waitRotCmd.setState(self.device.waitRotCmd.Running)
+        statusCmd = self.device.getStatus()
+        self.device.getRotStatus()
+        def checkResult(statusCmd):
+            self.device.waitRotCmd.setState(self.device.waitRotCmd.Done)
+            self.assertFalse(statusCmd.didFail)
+            self.assertEqual(statusCmd.state, statusCmd.Done)
+        return self.waitCmd(statusCmd, checkResult)
+
+    def testRotPollDuringStatus(self):
+        """A full status poll queued behind a fast rotator poll does not cancel it
+        """
+        self.device.waitRotCmd = expandCommand()
+        self.device.waitRotCmd.setState(self.device.waitRotCmd.Running)
+        rotDevCmdList = []
+        queueDevCmd = self.device.queueDevCmd
+        def recordQueueDevCmd(devCmd, cmdVerb=None):
+            if cmdVerb is not None:
+                rotDevCmdList.append(devCmd)
+            queueDevCmd(devCmd, cmdVerb=cmdVerb)
+        self.device.queueDevCmd = recordQueueDevCmd
+        self.device.getRotStatus()
+        statusCmd = self.device.getStatus()
+        def checkResult(statusCmd):
+            self.device.waitRotCmd.setState(self.device.waitRotCmd.Done)
+            self.assertFalse(statusCmd.didFail)
+            self.assertEqual(len(rotDevCmdList), 3)
+            for devCmd in rotDevCmdList:
+                self.assertEqual(devCmd.state, devCmd.Done)
+        return self.waitCmd(statusCmd, checkResult)
+
+
+if __name__ == '__main__':
+    from unittest import main
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python2
+from __future__ import division, absolute_import
+
+from twisted.trial.unittest import TestCase
+from twisted.internet.defer import Deferred
+from twisted.internet import reactor
+
+from tcc.utils.clock import VirtualClock, RealClock, Timer, getClock, setClock
+from tcc.dev.fakeLCODevs import LinearMove
+
+
+class TestVirtualClock(TestCase):
+
+    def setUp(self):
+        self.clock = setClock(VirtualClock(startTime=1000.))
+
+    def tearDown(self):
+        self.clock.stopAutoAdvance()
+        setClock(None)
+
+    def testTimer(self):
+        callList = []
+        timer1 = Timer()
+        timer2 = Timer()
+        timer1.start(120, callList.append, "slow")
+        timer2.start(2, callList.append, "fast")
+        self.assertTrue(timer1.isActive)
+        self.clock.runFor(10)
+        self.assertEqual(callList, ["fast"])
+        self.assertEqual(getClock().time(), 1010.)
+        self.assertFalse(timer2.isActive)
+        # restarting a timer cancels the pending call
+        timer1.start(5, callList.append, "restarted")
+        self.clock.runFor(300)
+        self.assertEqual(callList, ["fast", "restarted"])
+        timer1.start(5, callList.append, "cancelled")
+        self.assertTrue(timer1.cancel())
+        self.assertFalse(timer1.cancel())
+        self.clock.runFor(10)
+        self.assertEqual(callList, ["fast", "restarted"])
+
+    def testRunForRunsChainedCalls(self):
+        # a timer that re-arms itself, as the device status loops do
+        callTimeList = []
+        timer = Timer()
+        def poll():
+            callTimeList.append(getClock().time())
+            timer.start(5, poll)
+        timer.start(0, poll)
+        self.clock.runFor(60)
+        self.assertEqual(len(callTimeList), 13)
+        self.assertEqual(callTimeList[-1], 1060.)
+        timer.cancel()
+
+    def testLinearMove(self):
+        linearMove = LinearMove(position=0, speed=2)
+        moveTime = linearMove.moveTo(100)
+        self.assertEqual(moveTime, 50)
+        self.clock.advance(10)
+        self.assertAlmostEqual(linearMove.position(), 20)
+        self.assertTrue(linearMove.isMoving)
+        linearMove.stop()
+        self.clock.advance(10)
+        self.assertAlmostEqual(linearMove.position(), 20)
+        self.assertFalse(linearMove.isMoving)
+        self.assertEqual(linearMove.moveTo(10, speed=5), 2)
+        self.clock.advance(100)
+        self.assertEqual(linearMove.position(), 10)
+
+    def testAutoAdvance(self):
+        """A ten minute wait runs almost instantly, but not while a busy check is True
+        """
+        busyList = [True]
+        self.clock.addBusyCheck(lambda: busyList[0])
+        d = Deferred()
+        def setNotBusy():
+            self.assertEqual(getClock().time(), 1000.)
+            busyList[0] = False
+        def checkDone():
+            self.assertEqual(getClock().time(), 1600.)
+            d.callback(None)
+        Timer(600, checkDone)
+        reactor.callLater(0.05, setNotBusy)
+        self.clock.startAutoAdvance()
+        return d
+
+    def testSetClock(self):
+        setClock(None)
+        self.assertTrue(isinstance(getClock(), RealClock))
+
+
+if __name__ == '__main__':
+    from unittest import main
+    main()
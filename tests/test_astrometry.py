@@ -0,0 +1,50 @@
+#!/usr/bin/env python2
+from __future__ import division, absolute_import
+
+import unittest
+
+import numpy
+
+from RO.Astro.Sph.AzAltFromHADec import azAltFromHADec as roAzAltFromHADec
+from RO.Astro.Sph.Airmass import airmass as roAirmass
+from RO.Astro.Tm.LASTFromUT1 import lastFromUT1
+
+from tcc.utils.astrometry import LCO_LATITUDE, LCO_LONGITUDE, azAltFromHADec, airmassFromAlt, \
+    lastFromPySec, mjdFromPySec, deriveTCSFields
+
+
+class TestAstrometry(unittest.TestCase):
+
+    def testLAST(self):
+        for pySec in (0., 1.5e9, 1.8e9):
+            self.assertAlmostEqual(lastFromPySec(pySec), lastFromUT1(mjdFromPySec(pySec), LCO_LONGITUDE), places=4)
+
+    def testAzAlt(self):
+        haArr = numpy.array([-62.08, 30., -100., 170., 0.])
+        decArr = numpy.array([-36.85, -10., -80., 20., -29.])
+        azArr, altArr = azAltFromHADec(haArr, decArr)
+        for ha, dec, az, alt in zip(haArr, decArr, azArr, altArr):
+            (roAz, roAlt), atPole = roAzAltFromHADec((ha, dec), LCO_LATITUDE)
+            self.assertAlmostEqual(alt, roAlt)
+            if not atPole:
+                self.assertAlmostEqual(az, roAz)
+
+    def testAirmass(self):
+        altArr = numpy.array([90., 60., 30., 10., 1.])
+        for alt, airmass in zip(altArr, airmassFromAlt(altArr)):
+            self.assertAlmostEqual(airmass, roAirmass(alt))
+
+    def testDeriveTCSFields(self):
+        # on the meridian, north of the zenith
+        fieldDict = deriveTCSFields((0., -19.0146), 1.5e9)
+        self.assertAlmostEqual(fieldDict["telel"], 80.)
+        self.assertAlmostEqual(fieldDict["zd"], 10.)
+        self.assertAlmostEqual(fieldDict["telaz"], 0.)
+        self.assertEqual(fieldDict["ha"], 0.)
+        # mean or apparent: not derived (see deriveTCSFields)
+        self.assertNotIn("ra", fieldDict)
+        self.assertAlmostEqual(fieldDict["airmass"], roAirmass(80.))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python2
+from __future__ import division, absolute_import
+
+import datetime
+import gzip
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from tcc.utils.asyncLog import AsyncLogWriter
+
+
+class TestAsyncLogWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.logDir = tempfile.mkdtemp()
+        self.basePath = os.path.join(self.logDir, "tcc")
+
+    def tearDown(self):
+        shutil.rmtree(self.logDir)
+
+    def readLines(self, filePath):
+        with open(filePath, "r") as f:
+            return f.read().splitlines()
+
+    def testWriteAndStop(self):
+        writer = AsyncLogWriter(self.basePath, batchSize=7)
+        writer.start()
+        for ind in range(100):
+            writer.writeLine(writer._formatLine(time.time(), "line %i" % ind))
+        writer.stop()
+        self.assertFalse(writer.isRunning)
+        self.assertEqual(writer.nWritten, 100)
+        self.assertEqual(writer.nDropped, 0)
+        lineList = self.readLines(writer.filePath)
+        self.assertEqual(len(lineList), 100)
+        self.assertTrue(lineList[-1].endswith("line 99"))
+
+    def testOverflowIsCounted(self):
+        # writer thread not started, so the queue fills up
+        writer = AsyncLogWriter(self.basePath, maxQueueSize=10)
+        for ind in range(25):
+            writer.writeLine("line %i\n" % ind)
+        self.assertEqual(writer.nDropped, 15)
+
+    def testRotationCompresses(self):
+        writer = AsyncLogWriter(self.basePath, rotate=datetime.time(0, 0, 0), flushInterval=0.05)
+        writer.start()
+        firstPath = writer.filePath
+        writer.writeLine("before rotation\n")
+        time.sleep(1.1) # file names have 1 second resolution
+        # force a rollover
+        writer._nextRollover = datetime.datetime.now()
+        time.sleep(0.2)
+        writer.writeLine("after rotation\n")
+        writer.stop()
+        self.assertNotEqual(firstPath, writer.filePath)
+        self.assertFalse(os.path.exists(firstPath))
+        gzFile = gzip.open(firstPath + ".gz", "rb")
+        try:
+            self.assertEqual(gzFile.read(), "before rotation\n")
+        finally:
+            gzFile.close()
+        self.assertEqual(self.readLines(writer.filePath), ["after rotation"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python2
+from __future__ import division, absolute_import
+
+import unittest
+
+import RO.Comm.Generic
+RO.Comm.Generic.setFramework("twisted")
+
+from tcc.bench.actorClient import ClientCmd
+from tcc.bench.benchUtils import TraceCollector, summarize
+from tcc.utils.clock import VirtualClock, setClock
+
+
+def makeSpan(lane, name, startTime, dur, traceID=None, queueWaitMs=0):
+    return dict(cat=lane, name=name, ph="X", ts=int(startTime * 1e6), dur=int(dur * 1e6),
+        args=dict(traceID=traceID, queueWaitMs=queueWaitMs))
+
+
+class TestBenchUtils(unittest.TestCase):
+
+    def tearDown(self):
+        setClock(None)
+
+    def testSummarize(self):
+        summary = summarize([4, 1, None, 3, 2])
+        self.assertEqual(summary["n"], 4)
+        self.assertEqual(summary["min"], 1)
+        self.assertEqual(summary["max"], 4)
+        self.assertAlmostEqual(summary["p50"], 2.5)
+        self.assertEqual(summarize([])["p99"], None)
+
+    def testDescribeCmd(self):
+        clock = setClock(VirtualClock(startTime=100.))
+        clientCmd = ClientCmd(1, "target 10.0000, -30.0000 icrs")
+        clock.advance(30)
+        clientCmd._handleReply(":", "")
+        self.assertEqual(clientCmd.latency, 30)
+
+        traceCollector = TraceCollector()
+        for span in [
+            makeSpan("user", clientCmd.cmdStr, 100.01, 29.99, traceID=7),
+            makeSpan("tcs", "RAD 10.00000000", 100.02, 0.01, traceID=7),
+            makeSpan("tcs", "DECD -30.00000000", 100.03, 0.01, traceID=7, queueWaitMs=10),
+            makeSpan("tcs", "MP 2000.00", 100.04, 1.96, traceID=7, queueWaitMs=20),
+            makeSpan("m2", "lamp off", 100.02, 0.5, traceID=7),
+            makeSpan("tcs", "STATE", 101., 0.01),
+            makeSpan("tcs", "STATE", 102., 0.01),
+            makeSpan("tcs", "STATE", 200., 0.01), # after the command finished
+            makeSpan("tcs", "RAD 5", 100.5, 0.01, traceID=8), # another command
+        ]:
+            traceCollector.addEvent(span)
+        descr = traceCollector.describeCmd(clientCmd)
+        self.assertEqual(descr["devCmds"], dict(tcs=3, m2=1))
+        self.assertEqual(descr["pollCmds"], dict(tcs=2))
+        self.assertAlmostEqual(descr["dispatchDelay"], 0.01)
+        self.assertAlmostEqual(descr["queueWait"], 0.03)
+        self.assertAlmostEqual(descr["verbTime"]["MP"], 1.96)
+        self.assertAlmostEqual(descr["motionWait"], 28.)
+
+
+if __name__ == '__main__':
+    unittest.main()
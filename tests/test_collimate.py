@@ -0,0 +1,47 @@
+#!/usr/bin/env python2
+from __future__ import division, absolute_import
+
+import unittest
+
+from tcc.cmd.collimate import CollimationModel
+
+
+class TestCollimationModel(unittest.TestCase):
+
+    def testTrussTempHistory(self):
+        model = CollimationModel()
+        self.assertEqual(model.smoothTrussTemp, None)
+        model.addTrussTemp(None, 0.)
+        self.assertEqual(model.smoothTrussTemp, None)
+        for pySec, trussTemp in ((0., 10.), (100., 12.), (200., 14.)):
+            model.addTrussTemp(trussTemp, pySec)
+        self.assertAlmostEqual(model.smoothTrussTemp, 12.)
+        # samples older than the window are dropped
+        model.addTrussTemp(14., model.trussTempWindow + 50.)
+        self.assertEqual(len(model.trussTempHistory), 3)
+        self.assertAlmostEqual(model.smoothTrussTemp, 40. / 3.)
+
+    def testThermalFocus(self):
+        model = CollimationModel()
+        model.addTrussTemp(10., 0.)
+        # the first call sets the baseline from the current focus
+        self.assertEqual(model.getThermalFocusOffset(100., doFlex=False), None)
+        self.assertEqual((model.baseFocus, model.baseTrussTemp), (100., 10.))
+        # a 0.1 C drop is a 7 um change: inside the hysteresis band, unless the mirror moves anyway
+        model.trussTempHistory.clear()
+        model.addTrussTemp(9.9, 0.)
+        self.assertEqual(model.getThermalFocusOffset(100., doFlex=False), None)
+        self.assertAlmostEqual(model.getThermalFocusOffset(105., doFlex=True), 7.)
+        # a further 0.2 C drop (14 um) is applied on its own
+        model.trussTempHistory.clear()
+        model.addTrussTemp(9.7, 0.)
+        self.assertAlmostEqual(model.getThermalFocusOffset(112., doFlex=False), 14.)
+        self.assertEqual(model.getThermalFocusOffset(126., doFlex=False), None)
+        model.doThermalFocus = False
+        model.trussTempHistory.clear()
+        model.addTrussTemp(5., 0.)
+        self.assertEqual(model.getThermalFocusOffset(126., doFlex=True), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
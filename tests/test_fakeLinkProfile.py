@@ -0,0 +1,76 @@
+#!/usr/bin/env python2
+from __future__ import division, absolute_import
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from tcc.dev.fakeLinkProfile import LinkProfile, loadLinkProfiles
+
+
+class TestLinkProfile(unittest.TestCase):
+
+    def testIdeal(self):
+        linkProfile = LinkProfile()
+        self.assertTrue(linkProfile.isIdeal)
+        self.assertEqual(linkProfile.replyDelay("STATE"), 0)
+        self.assertEqual(linkProfile.mangle("1.234"), ["1.234"])
+        self.assertFalse(linkProfile.doDisconnect())
+
+    def testDelays(self):
+        linkProfile = LinkProfile(
+            delay = dict(dist="uniform", min=0.01, max=0.02),
+            verbDelay = dict(mp=dict(dist="constant", value=3)),
+            seed = 5,
+        )
+        self.assertFalse(linkProfile.isIdeal)
+        self.assertEqual(linkProfile.replyDelay("MP 2000"), 3)
+        for i in range(100):
+            self.assertTrue(0.01 <= linkProfile.replyDelay("RERR") <= 0.02)
+            self.assertTrue(0.01 <= linkProfile.replyDelay() <= 0.02)
+        # normal delays are never negative
+        linkProfile = LinkProfile(delay=dict(dist="normal", mean=0, sigma=1), seed=1)
+        self.assertTrue(min(linkProfile.replyDelay() for i in range(100)) >= 0)
+        self.assertRaises(RuntimeError, LinkProfile, delay=dict(dist="foo"))
+        self.assertRaises(RuntimeError, LinkProfile, delay=dict(dist="uniform", min=0))
+
+    def testFaultsAreReproducible(self):
+        def getReplies(seed):
+            linkProfile = LinkProfile(dropProb=0.1, dupProb=0.1, errorProb=0.1, mungeProb=0.1, seed=seed)
+            replyList = []
+            for ind in range(500):
+                replyList += linkProfile.mangle("__ACTUAL_POSITION %i" % ind)
+            return linkProfile, replyList
+        linkProfile, replyList = getReplies(seed=3)
+        self.assertEqual(getReplies(seed=3)[1], replyList)
+        self.assertNotEqual(getReplies(seed=4)[1], replyList)
+        self.assertTrue(linkProfile.nDropped > 0)
+        self.assertTrue(linkProfile.nDuplicated > 0)
+        self.assertTrue(linkProfile.nErrors > 0)
+        self.assertTrue("-1" in replyList)
+        self.assertTrue("__ACTUAL_POSITION MUNGED" in replyList)
+        self.assertEqual(len(replyList), 500 - linkProfile.nDropped + linkProfile.nDuplicated)
+
+    def testLoad(self):
+        tempDir = tempfile.mkdtemp()
+        try:
+            filePath = os.path.join(tempDir, "profiles.json")
+            with open(filePath, "w") as f:
+                json.dump(dict(
+                    tcs = dict(delay=dict(dist="lognormal", median=0.02, sigma=0.5), dropProb=0.01),
+                    scale = dict(mungeProb=0.1, errorReply="ERROR", seed=9),
+                ), f)
+            profileDict = loadLinkProfiles(filePath, seed=1)
+            self.assertEqual(sorted(profileDict.keys()), ["scale", "tcs"])
+            self.assertEqual(profileDict["tcs"].name, "tcs")
+            self.assertEqual(profileDict["scale"].seed, 9)
+            self.assertEqual(profileDict["scale"].errorReply, "ERROR")
+            self.assertEqual(profileDict["tcs"].dropProb, 0.01)
+        finally:
+            shutil.rmtree(tempDir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python2
+from __future__ import division, absolute_import
+
+import unittest
+
+import RO.Comm.Generic
+RO.Comm.Generic.setFramework("twisted")
+
+from tcc.bench.guideBench import GuideBench
+
+
+class TestGuideBench(unittest.TestCase):
+    """Test the synthetic guider's corrections (the emulator is not needed for these)
+    """
+    def makeBench(self, **kwargs):
+        return GuideBench(emulator=object(), **kwargs)
+
+    def testCycleCmds(self):
+        guideBench = self.makeBench(offsetScales=dict(ra=1., dec=0, rot=0, focus=0, scale=0, guideRot=3.6))
+        guideoffsetStr, guideRotStr = guideBench.makeCycleCmds()
+        valueList = [float(val) for val in guideoffsetStr.split(None, 1)[1].split(",")]
+        self.assertNotEqual(valueList[0], 0)
+        self.assertEqual(valueList[1:4], [0, 0, 0])
+        self.assertEqual(valueList[4], 1)
+        self.assertTrue(guideRotStr.startswith("offset guide 0.0, 0.0, "))
+
+        guideBench = self.makeBench(offsetScales=dict(guideRot=0))
+        self.assertEqual(len(guideBench.makeCycleCmds()), 1)
+
+    def testDistribution(self):
+        offsetScales = dict(ra=2., dec=2., rot=2., focus=2., scale=2., guideRot=2.)
+        guideBench = self.makeBench(offsetScales=offsetScales, distribution="uniform", seed=5)
+        for i in range(100):
+            for term in offsetScales:
+                self.assertTrue(-2. <= guideBench.drawOffset(term) <= 2.)
+        # the same seed gives the same corrections
+        self.assertEqual(self.makeBench(seed=3).makeCycleCmds(), self.makeBench(seed=3).makeCycleCmds())
+        self.assertRaises(RuntimeError, self.makeBench, distribution="lognormal")
+        self.assertRaises(RuntimeError, self.makeBench, offsetScales=dict(az=1.))
+
+
+if __name__ == '__main__':
+    unittest.main()
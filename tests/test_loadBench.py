@@ -0,0 +1,65 @@
+#!/usr/bin/env python2
+from __future__ import division, absolute_import
+
+import unittest
+
+import RO.Comm.Generic
+RO.Comm.Generic.setFramework("twisted")
+
+from tcc.bench.actorClient import ClientCmd
+from tcc.bench.loadBench import LoadBench
+from tcc.utils.clock import VirtualClock, setClock
+
+
+class FakeClient(object):
+    def __init__(self, nBytesRead):
+        self.nBytesRead = nBytesRead
+        self.nLinesRead = nBytesRead // 10
+        self.nUnsolicited = 0
+
+
+class TestLoadBench(unittest.TestCase):
+    """Test the load generator's command mix and results (the emulator is not needed for these)
+    """
+    def tearDown(self):
+        setClock(None)
+
+    def testCmdMix(self):
+        loadBench = LoadBench(cmdMix={"ping": 3, "show time": 1, "show status": 0}, emulator=object())
+        cmdStrList = [loadBench.drawCmdStr() for i in range(2000)]
+        self.assertEqual(cmdStrList.count("show status"), 0)
+        self.assertAlmostEqual(cmdStrList.count("ping") / len(cmdStrList), 0.75, delta=0.05)
+        self.assertRaises(RuntimeError, LoadBench, nClient=0, emulator=object())
+
+    def testResults(self):
+        clock = setClock(VirtualClock(startTime=0.))
+        loadBench = LoadBench(nClient=2, cmdMix={"ping": 1, "show time": 1}, emulator=object())
+        loadBench.clientList = [FakeClient(1000), FakeClient(3000)]
+        loadBench.startTime = 0.
+        # commands are all sent at time 0 and listed in order of finishing
+        for clientInd, cmdStr, doneTime, msgCode in (
+            (0, "ping", 1., ":"),
+            (1, "show time", 2., "f"),
+            (1, "ping", 3., ":"),
+            (0, "show time", None, None), # never finished
+        ):
+            clientCmd = ClientCmd(1, cmdStr)
+            clientCmd.sendTime = 0.
+            if doneTime is not None:
+                clock.advance(doneTime - clock.seconds())
+                clientCmd._handleReply(msgCode, "")
+            loadBench.clientCmdList.append((clientInd, clientCmd))
+        loadBench.stopTime = 2.
+        resultDict = loadBench.getResults()
+        self.assertEqual((resultDict["nSent"], resultDict["nDone"], resultDict["nFailed"], resultDict["nUnfinished"]),
+            (4, 2, 1, 1))
+        self.assertEqual(resultDict["elapsed"], 3.)
+        self.assertEqual(resultDict["throughput"], 1.)
+        self.assertEqual(resultDict["cmds"]["ping"]["latency"]["max"], 3.)
+        self.assertEqual(resultDict["clients"][1]["nSent"], 2)
+        self.assertEqual(resultDict["clients"][1]["nBytesRead"], 3000)
+        self.assertEqual(resultDict["bytesRead"]["mean"], 2000.)
+
+
+if __name__ == '__main__':
+    unittest.main()
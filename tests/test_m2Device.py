@@ -0,0 +1,68 @@
+#!/usr/bin/env python2
+from __future__ import division, absolute_import
+
+import unittest
+
+from twistedActor import UserCmd
+
+from tcc.dev.m2Device import PendingMove
+
+
+def makeRunningCmd():
+    userCmd = UserCmd()
+    userCmd.setState(userCmd.Running)
+    return userCmd
+
+
+class TestM2Device(unittest.TestCase):
+
+    def testMergeOffsets(self):
+        pendingMove = PendingMove()
+        self.assertTrue(pendingMove.isEmpty)
+        pendingMove.add([5.], True, makeRunningCmd())
+        pendingMove.add([-2., 1.], True, makeRunningCmd())
+        valueList, offset, mergedCmd = pendingMove.pop([100., 0., 0., 0., 0.])
+        self.assertTrue(offset)
+        self.assertEqual(valueList, [3., 1.])
+        self.assertTrue(pendingMove.isEmpty)
+
+    def testMergeAbsolute(self):
+        pendingMove = PendingMove()
+        userCmdList = [makeRunningCmd() for i in range(3)]
+        # a focus offset, then a collimation move that leaves focus alone, then another focus offset
+        pendingMove.add([5.], True, userCmdList[0])
+        pendingMove.add([None, 1., 2., 3., 4.], False, userCmdList[1])
+        pendingMove.add([-1.], True, userCmdList[2])
+        valueList, offset, mergedCmd = pendingMove.pop([100., 0., 0., 0., 0.])
+        self.assertFalse(offset)
+        self.assertEqual(valueList, [104., 1., 2., 3., 4.])
+        # an absolute request replaces earlier requests for its axes
+        pendingMove.add([5., 1.], True, makeRunningCmd())
+        pendingMove.add([200.], False, makeRunningCmd())
+        valueList, offset, mergedCmd2 = pendingMove.pop([100., 0., 0., 0., 0.])
+        self.assertEqual((valueList, offset), ([200., 1.], False))
+        self.assertEqual((pendingMove.nRequests, pendingMove.nMoves), (5, 2))
+        # the contributing commands finish with the merged move
+        mergedCmd.setState(mergedCmd.Done)
+        self.assertTrue(all(userCmd.isDone and not userCmd.didFail for userCmd in userCmdList))
+
+    def testMergeAbsoluteAndOffset(self):
+        pendingMove = PendingMove()
+        # a focus offset, then a collimation move with a thermal focus offset, merged into one move
+        pendingMove.add([5.], True, makeRunningCmd())
+        pendingMove.add([None, 1., 2., 3., 4.], False, makeRunningCmd(), offsetList=[7.])
+        valueList, offset, mergedCmd = pendingMove.pop([100., 0., 0., 0., 0.])
+        self.assertEqual((valueList, offset), ([112., 1., 2., 3., 4.], False))
+        self.assertEqual(pendingMove.nMoves, 1)
+
+    def testCancel(self):
+        pendingMove = PendingMove()
+        userCmd = makeRunningCmd()
+        pendingMove.add([5.], True, userCmd)
+        pendingMove.cancel("Stop commanded")
+        self.assertTrue(pendingMove.isEmpty)
+        self.assertTrue(userCmd.didFail)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python2
+from __future__ import division, absolute_import
+
+import unittest
+
+import RO.Comm.Generic
+RO.Comm.Generic.setFramework("twisted")
+
+from tcc.bench.protoBench import ProtoBench, compareToBaseline
+
+
+def makeScenarioResult(p50, p99, cpuPerMsg, msgRate):
+    return dict(roundTrip=dict(p50=p50, p99=p99), cpuPerMsg=cpuPerMsg, msgRate=msgRate)
+
+
+class TestProtoBench(unittest.TestCase):
+
+    def testCompareToBaseline(self):
+        baselineDict = dict(
+            tcsStatus = makeScenarioResult(0.010, 0.020, 1e-4, 1000.),
+            m2Status = makeScenarioResult(0.001, 0.002, 1e-4, 1000.),
+        )
+        resultDict = dict(
+            tcsStatus = makeScenarioResult(0.011, 0.030, 1e-4, 700.),
+            scaleStatus = makeScenarioResult(0.001, 0.002, 1e-4, 1000.), # not in the baseline
+        )
+        comparisonDict = compareToBaseline(resultDict, baselineDict, tolerance=0.2)
+        self.assertEqual(list(comparisonDict), ["tcsStatus"])
+        tcsComparison = comparisonDict["tcsStatus"]
+        self.assertAlmostEqual(tcsComparison["roundTripP50"]["ratio"], 1.1)
+        self.assertFalse(tcsComparison["roundTripP50"]["isRegression"])
+        self.assertTrue(tcsComparison["roundTripP99"]["isRegression"])
+        self.assertFalse(tcsComparison["cpuPerMsg"]["isRegression"])
+        self.assertTrue(tcsComparison["msgRate"]["isRegression"])
+
+    def testUnknownScenario(self):
+        self.assertRaises(RuntimeError, ProtoBench, scenarioNames=["tcsStatus", "ffStatus"])
+
+
+if __name__ == '__main__':
+    unittest.main()
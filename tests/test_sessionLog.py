@@ -0,0 +1,85 @@
+#!/usr/bin/env python2
+from __future__ import division, absolute_import
+
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+from tcc.utils.clock import VirtualClock, setClock
+from tcc.utils.sessionLog import SessionRecorder, readSession
+from tcc.dev.fakeReplay import makeExchangeList
+
+
+class TestSessionLog(unittest.TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.filePath = os.path.join(self.tempDir, "sessions", "session.gz")
+        self.clock = setClock(VirtualClock(startTime=5000.))
+
+    def tearDown(self):
+        setClock(None)
+        shutil.rmtree(self.tempDir)
+
+    def recordSession(self):
+        recorder = SessionRecorder(self.filePath)
+        tcsRecord = recorder.getRecordFunc("tcs")
+        scaleRecord = recorder.getRecordFunc("scale")
+        scaleRecord("r", "boot message\r\n")
+        self.clock.advance(1)
+        tcsRecord("w", "RA")
+        scaleRecord("w", "status")
+        self.clock.advance(0.25)
+        tcsRecord("r", "12.5")
+        scaleRecord("r", "status")
+        scaleRecord("r", "")
+        scaleRecord("r", "OK")
+        self.clock.advance(1)
+        tcsRecord("w", "DEC")
+        tcsRecord("r", "-30 0 0")
+        recorder.close()
+        recorder.record("tcs", "r", "ignored after close")
+        return recorder
+
+    def testRoundTrip(self):
+        recorder = self.recordSession()
+        self.assertEqual(recorder.nEvents, 9)
+        startTime, eventList = readSession(self.filePath)
+        self.assertEqual(startTime, 5000.)
+        self.assertEqual(len(eventList), 9)
+        self.assertEqual(eventList[0], (0., "scale", "r", "boot message"))
+        self.assertEqual(eventList[4].time, 1.25)
+        self.assertEqual(eventList[5].line, "")
+
+        preambleList, exchangeList = makeExchangeList(eventList, "scale")
+        self.assertEqual(preambleList, [(0., "boot message")])
+        self.assertEqual(len(exchangeList), 1)
+        self.assertEqual(exchangeList[0].cmdStr, "status")
+        self.assertEqual([line for delay, line in exchangeList[0].replyList], ["status", "", "OK"])
+        self.assertAlmostEqual(exchangeList[0].replyList[0][0], 0.25)
+
+        preambleList, exchangeList = makeExchangeList(eventList, "tcs")
+        self.assertEqual(preambleList, [])
+        self.assertEqual([exchange.cmdStr for exchange in exchangeList], ["RA", "DEC"])
+        self.assertEqual(exchangeList[1].replyList, [(0., "-30 0 0")])
+
+    def testTruncated(self):
+        self.recordSession()
+        with gzip.open(self.filePath, "rb") as f:
+            data = f.read()
+        with gzip.open(self.filePath, "wb") as f:
+            f.write(data[:-5])
+        startTime, eventList = readSession(self.filePath)
+        self.assertEqual(len(eventList), 8)
+
+    def testNotSession(self):
+        badPath = os.path.join(self.tempDir, "bad.gz")
+        with gzip.open(badPath, "wb") as f:
+            f.write("some log\n")
+        self.assertRaises(RuntimeError, readSession, badPath)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+#!/usr/bin/env python2
+from __future__ import division, absolute_import
+
+import unittest
+
+import RO.Comm.Generic
+RO.Comm.Generic.setFramework("twisted")
+
+from tcc.bench.soakBench import findGrowth, getRSS
+
+
+class TestSoakBench(unittest.TestCase):
+
+    def testFindGrowth(self):
+        # a warmup ramp that levels off is bounded
+        self.assertIsNone(findGrowth([0, 500, 900, 1000, 1000, 1010, 1000, 1005, 1000], 0.1, 50))
+        # steady growth is not
+        growth = findGrowth(range(0, 9000, 1000), 0.1, 50)
+        self.assertEqual(growth, (4000, 7000))
+        # small increases are ignored, both relative and absolute
+        self.assertIsNone(findGrowth([1000] * 6 + [1050] * 3, 0.1, 10))
+        self.assertIsNone(findGrowth([0, 0, 1, 1, 2, 2], 10, 5))
+        # too few samples to tell
+        self.assertIsNone(findGrowth([1, 1000], 0.1, 1))
+
+    def testGetRSS(self):
+        self.assertGreater(getRSS(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python2
+from __future__ import division, absolute_import
+
+import unittest
+
+from twistedActor import UserCmd
+
+from tcc.cmd.syncScaleMove import SyncScaleMove
+from tcc.utils.statusTap import StatusTap
+
+
+def makeRunningCmd():
+    userCmd = UserCmd()
+    userCmd.setState(userCmd.Running)
+    return userCmd
+
+
+class FakeScaleStatus(object):
+    moveRange = (0., 100.)
+    def __init__(self, position):
+        self.position = position
+
+
+class FakeScaleDev(object):
+    """Scaling ring that moves when told to finish, streaming positions on the way
+    """
+    def __init__(self, position):
+        self.status = FakeScaleStatus(position)
+        self.positionTap = StatusTap("scalePosition")
+        self.isMoving = False
+        self.moveList = [] # list of (target position, move command)
+        self.statusCmdList = []
+
+    @property
+    def motorPos(self):
+        return self.status.position
+
+    def move(self, position):
+        moveCmd = makeRunningCmd()
+        self.moveList.append((position, moveCmd))
+        return moveCmd
+
+    def finishMove(self, overshoot=0.):
+        position, moveCmd = self.moveList[-1]
+        startPos = self.status.position
+        for frac in (0.25, 0.5, 0.75, 1.):
+            self.status.position = startPos + frac * (position + overshoot - startPos)
+            self.positionTap.publish(self.status)
+        moveCmd.setState(moveCmd.Done)
+
+    def getStatus(self):
+        statusCmd = makeRunningCmd()
+        self.statusCmdList.append(statusCmd)
+        return statusCmd
+
+
+class FakeSecDev(object):
+    def __init__(self):
+        self.focusList = [] # list of (focus offset, focus command)
+
+    def focus(self, focusValue, offset=False):
+        focusCmd = makeRunningCmd()
+        self.focusList.append((focusValue, focusCmd))
+        return focusCmd
+
+    def finishFocus(self):
+        self.focusList[-1][1].setState(UserCmd.Done)
+
+
+class FakeActor(object):
+    SCALE_RATIO = 1/7.
+    def __init__(self, position):
+        self.scaleDev = FakeScaleDev(position)
+        self.secDev = FakeSecDev()
+        self.msgList = []
+
+    def writeToUsers(self, msgCode, msgStr, cmd=None):
+        self.msgList.append(msgStr)
+
+
+class TestSyncScaleMove(unittest.TestCase):
+
+    def testSteps(self):
+        actor = FakeActor(position=20.)
+        # 0.3 mm is 42.9 um of focus, so a 20 um bound needs 3 steps
+        syncMove = SyncScaleMove(actor, 20.3, maxFocusErr=20., userCmd=makeRunningCmd())
+        userCmd = syncMove.start()
+        self.assertEqual(syncMove.nSteps, 3)
+        for stepInd in range(3):
+            self.assertEqual(len(actor.scaleDev.moveList), stepInd + 1)
+            focusOffset = actor.secDev.focusList[-1][0]
+            self.assertAlmostEqual(focusOffset, -0.1 * 1000. / 7.)
+            actor.scaleDev.finishMove()
+            actor.secDev.finishFocus()
+        self.assertAlmostEqual(actor.scaleDev.moveList[-1][0], 20.3)
+        # the ring reached its target, so no focus trim is needed
+        actor.scaleDev.statusCmdList[-1].setState(UserCmd.Done)
+        self.assertEqual(len(actor.secDev.focusList), 3)
+        self.assertTrue(userCmd.isDone and not userCmd.didFail)
+        self.assertLessEqual(syncMove.worstFocusErr, 20. + 1e-6)
+        self.assertTrue(actor.msgList[-1].startswith("scaleSyncFocusErr="))
+        self.assertEqual(actor.scaleDev.positionTap.subscriberList, [])
+
+    def testTrimAndFailure(self):
+        actor = FakeActor(position=20.)
+        syncMove = SyncScaleMove(actor, 20.05, maxFocusErr=20., userCmd=makeRunningCmd())
+        userCmd = syncMove.start()
+        self.assertEqual(syncMove.nSteps, 1)
+        # the ring overshoots by 0.02 mm (2.9 um of focus), which is trimmed
+        actor.scaleDev.finishMove(overshoot=0.02)
+        actor.secDev.finishFocus()
+        actor.scaleDev.statusCmdList[-1].setState(UserCmd.Done)
+        self.assertAlmostEqual(actor.secDev.focusList[-1][0], -0.02 * 1000. / 7.)
+        self.assertFalse(userCmd.isDone)
+        actor.secDev.finishFocus()
+        self.assertTrue(userCmd.isDone and not userCmd.didFail)
+
+        actor = FakeActor(position=20.)
+        userCmd = SyncScaleMove(actor, 21., maxFocusErr=50., userCmd=makeRunningCmd()).start()
+        actor.scaleDev.moveList[-1][1].setState(UserCmd.Failed, "Killed by stop")
+        actor.secDev.finishFocus()
+        self.assertTrue(userCmd.didFail)
+        self.assertEqual(len(actor.scaleDev.moveList), 1)
+
+    def testRunawayCorrected(self):
+        actor = FakeActor(position=20.)
+        syncMove = SyncScaleMove(actor, 20.05, maxFocusErr=20., userCmd=makeRunningCmd())
+        userCmd = syncMove.start()
+        # the ring overshoots by 0.3 mm (42.9 um of focus); focus is corrected once the error passes the bound
+        actor.scaleDev.finishMove(overshoot=0.3)
+        self.assertEqual(len(actor.secDev.focusList), 2)
+        self.assertAlmostEqual(actor.secDev.focusList[1][0], -(0.2625 - 0.05) * 1000. / 7.)
+        self.assertTrue(actor.msgList[-1].startswith("text=\"Scaling ring"))
+        # the step waits for the correction before trimming
+        actor.secDev.focusList[0][1].setState(UserCmd.Done)
+        self.assertEqual(actor.scaleDev.statusCmdList, [])
+        actor.secDev.finishFocus()
+        actor.scaleDev.statusCmdList[-1].setState(UserCmd.Done)
+        # the trim matches focus to the final position, measured from where focus was corrected to
+        self.assertAlmostEqual(actor.secDev.focusList[-1][0], -(20.35 - 20.2625) * 1000. / 7.)
+        actor.secDev.finishFocus()
+        self.assertTrue(userCmd.isDone and not userCmd.didFail)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python2
+from __future__ import division, absolute_import
+
+import unittest
+
+import numpy
+
+from tcc.cmd.collimate import CollimationModel
+from tcc.cmd.target import checkTargets, LimitOK, LimitHorizon, LimitScreen
+from tcc.utils.astrometry import LCO_LATITUDE, lastFromPySec
+from tcc.utils.ffs import get_ffs_altitude
+
+
+class TestTargetCheck(unittest.TestCase):
+
+    def testCheckTargets(self):
+        collimationModel = CollimationModel()
+        pySecArr = numpy.array([1.5e9, 1.5e9 + 3600., 1.5e9 + 7200.])
+        lst = lastFromPySec(pySecArr[0])
+        # zenith, low in the east (screen limit), below the horizon
+        raArr = numpy.array([lst, lst + 60., lst])
+        decArr = numpy.array([LCO_LATITUDE, LCO_LATITUDE, 80.])
+        checkDict = checkTargets(raArr, decArr, pySecArr, doHA=False, doScreen=True,
+            collimationModel=collimationModel)
+        for name in ("ha", "az", "alt", "airmass", "screenAlt", "tiltX", "transY", "limit"):
+            self.assertEqual(checkDict[name].shape, (3, 3))
+        self.assertAlmostEqual(checkDict["ha"][0, 0], 0., places=6)
+        self.assertAlmostEqual(checkDict["alt"][0, 0], 90., places=4)
+        # the sky turns 15 degrees per hour
+        self.assertAlmostEqual(checkDict["ha"][0, 1], 15.041, places=2)
+        self.assertEqual(list(checkDict["limit"][:, 0]), [LimitOK, LimitScreen, LimitHorizon])
+        self.assertAlmostEqual(checkDict["screenAlt"][0, 0], get_ffs_altitude(checkDict["alt"][0, 0])[0])
+        # collimation is the same as computed one target at a time
+        orient = collimationModel.getOrientation(checkDict["ha"][1, 2], decArr[1])
+        self.assertAlmostEqual(checkDict["tiltX"][1, 2], orient[1])
+        self.assertAlmostEqual(checkDict["transY"][1, 2], orient[4])
+
+    def testHA(self):
+        checkDict = checkTargets([30.], [-30.], [0., 1e9], doHA=True, doScreen=False,
+            collimationModel=CollimationModel())
+        self.assertEqual(list(checkDict["ha"][0]), [30., 30.])
+        self.assertTrue(numpy.all(numpy.isnan(checkDict["screenAlt"])))
+
+
+if __name__ == '__main__':
+    unittest.main()
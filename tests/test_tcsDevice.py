@@ -0,0 +1,128 @@
+#!/usr/bin/env python2
+from __future__ import division, absolute_import
+
+import unittest
+
+from twistedActor import UserCmd
+
+from tcc.dev.tcsDevice import rotMoveTime, predictSlewTime, wrapDeltaAngle, SlewTimeRA, SlewTimeDec, \
+    IRAC, IRDC, IRFASTSP, IRSCALE, ScreenSpeed, SlewSettleTime, PendingCorrection, Status, \
+    DerivedVerbTolDict, CrossCheckInterval, CrossCheckMaxMismatches, RotStatusVerbs, Tracking, Slewing
+from tcc.utils.clock import VirtualClock, setClock
+
+
+class TestTCSDevice(unittest.TestCase):
+
+    def tearDown(self):
+        setClock(None)
+
+    def testRotMoveTime(self):
+        self.assertEqual(rotMoveTime(0), 0)
+        self.assertEqual(rotMoveTime(-0.5), rotMoveTime(0.5))
+        # a move that just reaches full speed is the same in both profiles
+        rampDeg = abs(IRSCALE) * 0.5 * IRFASTSP * (IRFASTSP / IRAC + IRFASTSP / IRDC)
+        rampTime = IRFASTSP / IRAC + IRFASTSP / IRDC
+        self.assertAlmostEqual(rotMoveTime(rampDeg * 0.999999), rampTime, places=4)
+        self.assertAlmostEqual(rotMoveTime(rampDeg * 1.000001), rampTime, places=4)
+        # beyond that, time grows at full speed
+        self.assertAlmostEqual(rotMoveTime(rampDeg + 1) - rotMoveTime(rampDeg), 1 / abs(IRSCALE) / IRFASTSP)
+        # a typical guide correction (a few arcsec) is a fraction of a second
+        self.assertLess(rotMoveTime(5 / 3600.), 0.5)
+
+    def testPredictSlewTime(self):
+        self.assertEqual(predictSlewTime(0, 0), SlewSettleTime)
+        # the axes move at once, so the slower one sets the time, whatever the direction
+        self.assertAlmostEqual(predictSlewTime(-30, 10), abs(SlewTimeRA(30)) + SlewSettleTime)
+        self.assertAlmostEqual(predictSlewTime(1, -60), abs(SlewTimeDec(60)) + SlewSettleTime)
+        # a long screen move can take longer than the telescope
+        self.assertAlmostEqual(predictSlewTime(1, 1, dScreen=-40), 40 / ScreenSpeed + SlewSettleTime)
+
+    def testWrapDeltaAngle(self):
+        self.assertEqual(wrapDeltaAngle(350), -10)
+        self.assertEqual(wrapDeltaAngle(-190), 170)
+        self.assertEqual(wrapDeltaAngle(45), 45)
+
+    def testPendingCorrection(self):
+        pending = PendingCorrection("offset", nAxes=2)
+        self.assertTrue(pending.isEmpty)
+        userCmdList = [UserCmd(), UserCmd()]
+        for userCmd in userCmdList:
+            userCmd.setState(userCmd.Running)
+        pending.add([1., -2.], userCmdList[0])
+        pending.add([0.5, 0.5], userCmdList[1])
+        self.assertRaises(RuntimeError, pending.add, [1.], UserCmd())
+        self.assertFalse(pending.isEmpty)
+        valueList, mergedCmd = pending.pop()
+        self.assertEqual(valueList, [1.5, -1.5])
+        self.assertTrue(pending.isEmpty)
+        self.assertEqual((pending.nMerged, pending.nMoves), (2, 1))
+        # the contributing commands finish with the merged move
+        self.assertFalse(any(userCmd.isDone for userCmd in userCmdList))
+        mergedCmd.setState(mergedCmd.Failed, textMsg="move failed")
+        for userCmd in userCmdList:
+            self.assertTrue(userCmd.didFail)
+            self.assertEqual(userCmd.textMsg, "move failed")
+
+    def testRotStatusOrder(self):
+        # the clamp reading can end a rotator move and start a pending offset from the rotator position,
+        # so the position must be read first in both the fast clamp poll and the full status poll
+        for verbList in (list(RotStatusVerbs), Status(tcsDevice=None).getPollVerbs()[0]):
+            self.assertLess(verbList.index("rawpos"), verbList.index("mrp"))
+
+    def testLocalAstrometry(self):
+        clock = setClock(VirtualClock(startTime=1.5e9))
+        status = Status(tcsDevice=None)
+        stateField = status.statusFieldDict["state"]
+        # a cross check waits until the telescope is tracking
+        stateField.value = Slewing
+        verbList, crossCheck = status.getPollVerbs()
+        self.assertFalse(crossCheck)
+        self.assertFalse(set(verbList) & set(DerivedVerbTolDict))
+        stateField.value = Tracking
+        verbList, crossCheck = status.getPollVerbs()
+        self.assertTrue(crossCheck)
+        self.assertEqual(set(verbList), set(status.statusFieldDict))
+        status.statusFieldDict["pos"].value = [10., -40.]
+        status.deriveAstrometry()
+        for verb in DerivedVerbTolDict:
+            status.statusFieldDict[verb].value += DerivedVerbTolDict[verb] * 0.5
+        self.assertEqual(status.crossCheckAstrometry(), [])
+        verbList, crossCheck = status.getPollVerbs()
+        self.assertFalse(crossCheck)
+        self.assertFalse(set(verbList) & set(DerivedVerbTolDict))
+        # ra and dec are always polled
+        self.assertTrue({"ra", "dec"} <= set(verbList))
+        # the next cross check finds the TCS disagrees; it is checked again on each poll,
+        # and all status is polled once CrossCheckMaxMismatches checks in a row disagree
+        clock.advance(CrossCheckInterval)
+        status.deriveAstrometry() # stands in for the values read by the cross check
+        status.statusFieldDict["telel"].value += 1
+        for checkInd in range(CrossCheckMaxMismatches):
+            self.assertTrue(status.useLocalAstrometry)
+            self.assertTrue(status.getPollVerbs()[1])
+            self.assertEqual(len(status.crossCheckAstrometry()), 1)
+        self.assertFalse(status.useLocalAstrometry)
+        self.assertEqual(set(status.getPollVerbs()[0]), set(status.statusFieldDict))
+
+    def testCrossCheckPostponed(self):
+        clock = setClock(VirtualClock(startTime=1.5e9))
+        status = Status(tcsDevice=None)
+        status.statusFieldDict["state"].value = Tracking
+        status.statusFieldDict["pos"].value = [10., -40.]
+        status.deriveAstrometry()
+        # one disagreement, then agreement, starts the count again
+        status.statusFieldDict["ha"].value += 1
+        self.assertEqual(len(status.crossCheckAstrometry()), 1)
+        status.statusFieldDict["ha"].value -= 1
+        self.assertEqual(status.crossCheckAstrometry(), [])
+        self.assertEqual(status.nCrossCheckMismatches, 0)
+        # values read during a slew are not compared
+        clock.advance(CrossCheckInterval)
+        status.statusFieldDict["state"].value = Slewing
+        status.statusFieldDict["ha"].value += 1
+        for checkInd in range(CrossCheckMaxMismatches):
+            self.assertEqual(status.crossCheckAstrometry(), [])
+        self.assertTrue(status.useLocalAstrometry)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python2
+from __future__ import division, absolute_import
+
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+from tcc.utils.statusTap import StatusTap
+from tcc.utils.tcsErrLog import TCSErrLogger, Header
+
+
+class FakeStatusField(object):
+    def __init__(self, value, replyStr=None):
+        self.value = value
+        self.replyStr = replyStr
+
+
+class FakeStatus(object):
+    def __init__(self, state, stateReply, haReply="1:02:03.4"):
+        self.statusFieldDict = dict(
+            state = FakeStatusField(state, stateReply),
+            rerr = FakeStatusField(0.125, "0.125"),
+            derr = FakeStatusField(-0.5, "-0.5"),
+            ha = FakeStatusField(15.5125, haReply),
+            dec = FakeStatusField(-30.5, None), # computed locally
+        )
+
+
+class TestStatusTap(unittest.TestCase):
+
+    def testSubscribers(self):
+        statusTap = StatusTap("test")
+        receivedList = []
+        def badSubscriber(status):
+            raise RuntimeError("subscriber failed")
+        statusTap.addSubscriber(badSubscriber)
+        statusTap.addSubscriber(receivedList.append)
+        statusTap.addSubscriber(receivedList.append) # ignored
+        # a failing subscriber does not stop the others, nor the publisher
+        statusTap.publish("status1")
+        self.assertEqual(receivedList, ["status1"])
+        statusTap.removeSubscriber(badSubscriber)
+        statusTap.removeSubscriber(badSubscriber) # ignored
+        statusTap.publish("status2")
+        self.assertEqual(receivedList, ["status1", "status2"])
+        self.assertEqual(statusTap.nPublished, 2)
+
+
+class TestTCSErrLogger(unittest.TestCase):
+
+    def setUp(self):
+        self.logDir = tempfile.mkdtemp()
+        self.filePath = os.path.join(self.logDir, "sub", "tcsErrLog.txt")
+        self.loggerList = []
+
+    def tearDown(self):
+        for logger in self.loggerList:
+            logger.close()
+        shutil.rmtree(self.logDir)
+
+    def makeLogger(self):
+        logger = TCSErrLogger(self.filePath)
+        self.loggerList.append(logger)
+        return logger
+
+    def readLines(self):
+        with open(self.filePath, "r") as f:
+            return f.readlines()
+
+    def testTrackingOnly(self):
+        logger = self.makeLogger()
+        logger(FakeStatus("Slewing", "3"))
+        logger(FakeStatus("Halted", "1"))
+        self.assertEqual(self.readLines(), [Header])
+        logger(FakeStatus("Tracking", "2"))
+        self.assertEqual(len(self.readLines()), 2)
+        # an existing file is appended to, without a second header
+        logger.close()
+        logger(FakeStatus("Tracking", "2")) # ignored once closed
+        logger = self.makeLogger()
+        logger(FakeStatus("Tracking", "2"))
+        lineList = self.readLines()
+        self.assertEqual(len(lineList), 3)
+        self.assertEqual(lineList[0], Header)
+
+    def testLineFormat(self):
+        logger = self.makeLogger()
+        logger(FakeStatus("Tracking", "2"))
+        line = self.readLines()[1]
+        self.assertTrue(line.endswith("\n"))
+        timestamp, rest = line.rstrip("\n").split(" ", 1)
+        self.assertTrue(re.match(r"^\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d(\.\d+)?$", timestamp))
+        # TCS reply text where there is one; DEC was computed locally so is written sexagesimal
+        self.assertEqual(rest, "0.125 -0.5 2 1:02:03.4 -30:30:00.0")
+
+
+if __name__ == '__main__':
+    unittest.main()
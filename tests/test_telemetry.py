@@ -0,0 +1,77 @@
+#!/usr/bin/env python2
+from __future__ import division, absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+from tcc.utils.telemetry import TelemetryRecorder, TelemetryReader, StreamColumnDict, nightFromTime
+
+
+class TestTelemetry(unittest.TestCase):
+
+    def setUp(self):
+        self.telemetryDir = tempfile.mkdtemp()
+        # early in the night, so all samples fall in one night
+        self.startTime = 1450000000 - (1450000000 % 86400) + 3 * 3600
+
+    def tearDown(self):
+        shutil.rmtree(self.telemetryDir)
+
+    def scaleRow(self, tsec):
+        return [tsec, 0, tsec - self.startTime, 20., 0.1, 3, 1, 1]
+
+    def testRecordAndQuery(self):
+        recorder = TelemetryRecorder(self.telemetryDir, chunkSize=10, maxChunkAge=1e6)
+        timeArr = self.startTime + numpy.arange(95) * 2.
+        for tsec in timeArr:
+            recorder.record("scale", self.scaleRow(tsec))
+            recorder.record("sec", [tsec] + [numpy.nan] * (len(StreamColumnDict["sec"]) - 1))
+        recorder.close()
+
+        reader = TelemetryReader(self.telemetryDir)
+        night = nightFromTime(self.startTime)
+        self.assertEqual(reader.nights(), [night])
+        index = reader.readIndex(night)
+        self.assertEqual(len(index), 20) # 10 chunks per stream
+        self.assertEqual(index[:, 2].sum(), 2 * len(timeArr))
+
+        startTime = self.startTime + 31
+        endTime = self.startTime + 101
+        result = reader.query("scale", startTime, endTime, columns=["time", "position"])
+        self.assertEqual(sorted(result.keys()), ["position", "time"])
+        expectedTimes = timeArr[(timeArr >= startTime) & (timeArr <= endTime)]
+        self.assertTrue(numpy.array_equal(result["time"], expectedTimes))
+        self.assertTrue(numpy.allclose(result["position"], expectedTimes - self.startTime))
+
+        allData = reader.query("scale", 0, self.startTime * 2)
+        self.assertEqual(set(allData.keys()), set(StreamColumnDict["scale"]))
+        self.assertEqual(len(allData["time"]), len(timeArr))
+        self.assertTrue(numpy.all(allData["cartID"] == 3))
+
+    def testOldChunkIsFlushed(self):
+        recorder = TelemetryRecorder(self.telemetryDir, chunkSize=1000, maxChunkAge=60)
+        for tsec in self.startTime + numpy.arange(0, 100, 5.):
+            recorder.record("scale", self.scaleRow(tsec))
+        # first chunk is written once a sample is more than 60 seconds newer than the oldest
+        reader = TelemetryReader(self.telemetryDir)
+        index = reader.readIndex(nightFromTime(self.startTime))
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index[0, 2], 14)
+
+    def testEmptyQuery(self):
+        recorder = TelemetryRecorder(self.telemetryDir)
+        recorder.record("scale", self.scaleRow(self.startTime))
+        recorder.flush()
+        reader = TelemetryReader(self.telemetryDir)
+        result = reader.query("scale", self.startTime + 10, self.startTime + 20)
+        self.assertEqual(len(result["time"]), 0)
+        self.assertRaises(RuntimeError, reader.query, "foo", 0, 1)
+        self.assertTrue(os.path.exists(os.path.join(self.telemetryDir, nightFromTime(self.startTime) + ".json")))
+
+
+if __name__ == '__main__':
+    unittest.main()